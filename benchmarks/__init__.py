@@ -0,0 +1,7 @@
+"""Performance benchmarks for the golfball simulation.
+
+Each ``bench_*.py`` module holds asv-style classes: optional ``setup`` and
+``teardown`` methods plus ``time_*`` methods that are timed by ``python -m
+benchmarks``, and ``track_*`` methods that return their own measurement in
+seconds.  A case with a ``budget`` attribute fails the run if it takes longer.
+"""
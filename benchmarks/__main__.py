@@ -0,0 +1,199 @@
+"""Run the benchmark suite: ``python -m benchmarks [PATTERN]``.
+
+``--save`` stores the times in the baseline file of this machine,
+``benchmarks/baselines/<machine>.json``, and ``--compare`` flags the cases
+slower than their baseline by more than ``--threshold``.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import importlib
+import inspect
+import pkgutil
+import timeit
+
+import benchmarks
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'baselines')
+
+# relative slowdown flagged as a regression by --compare
+DEFAULT_THRESHOLD = 0.25
+
+
+def iter_cases(pattern=''):
+    """Yield (name, instance, method name) for every benchmark case."""
+    for module_info in pkgutil.iter_modules(benchmarks.__path__):
+        if not module_info.name.startswith('bench_'):
+            continue
+        module = importlib.import_module(f'benchmarks.{module_info.name}')
+        for cls_name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            for method_name in sorted(vars(cls)):
+                name = f'{module_info.name}.{cls_name}.{method_name}'
+                if (method_name.startswith(('time_', 'track_'))
+                        and pattern in name):
+                    yield name, cls, method_name
+
+
+def time_case(cls, method_name, repeat=3):
+    """Return the best wall time [s] of one call to a benchmark method.
+
+    ``track_*`` methods measure themselves: the best of their returned
+    values is reported instead.  A method's ``repeat`` attribute overrides
+    repeat.
+    """
+    repeat = getattr(getattr(cls, method_name), 'repeat', repeat)
+    bench = cls()
+    if hasattr(bench, 'setup'):
+        bench.setup()
+    try:
+        if method_name.startswith('track_'):
+            method = getattr(bench, method_name)
+            return min(method() for _ in range(repeat))
+        timer = timeit.Timer(getattr(bench, method_name))
+        number, _ = timer.autorange()
+        return min(timer.repeat(repeat=repeat, number=number)) / number
+    finally:
+        if hasattr(bench, 'teardown'):
+            bench.teardown()
+
+
+def machine_info(machine):
+    """Return what identifies the machine and software of a run."""
+    import numpy
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(BASELINE_DIR)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'machine': machine,
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'commit': commit,
+            'date': datetime.date.today().isoformat()}
+
+
+def default_machine():
+    """Return the default machine tag, e.g. ``linux-x86_64-8cpu``."""
+    return (f'{platform.system().lower()}-{platform.machine()}'
+            f'-{os.cpu_count()}cpu')
+
+
+def baseline_filename(machine):
+    """Return the baseline file of a machine."""
+    return os.path.join(BASELINE_DIR, f'{machine}.json')
+
+
+def read_baseline(filename):
+    """Return the saved run of a baseline file, or an empty one."""
+    if not os.path.isfile(filename):
+        return {'results': {}}
+    with open(filename, 'r', encoding='utf8') as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(filename, info, results):
+    """Merge results into a baseline file; other cases keep their times."""
+    baseline = read_baseline(filename)
+    baseline = {**info, 'results': {**baseline['results'], **results}}
+    baseline['results'] = dict(sorted(baseline['results'].items()))
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    with open(filename, 'w', encoding='utf8') as baseline_file:
+        json.dump(baseline, baseline_file, indent=2)
+        baseline_file.write('\n')
+
+
+def compare(seconds, baseline, threshold):
+    """Return the comparison note of a time against its baseline time."""
+    if baseline is None:
+        return 'no baseline'
+    change = seconds / baseline - 1.0
+    note = f'{change:+7.1%} vs {baseline:.6g} s'
+    if change > threshold:
+        return note + '  REGRESSION'
+    return note
+
+
+def main(arg_list=None):
+    """Time every benchmark case matching the optional pattern."""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('pattern', nargs='?', default='',
+                        help="only run cases whose name contains PATTERN")
+    parser.add_argument('--machine', default=default_machine(),
+                        help="tag of the baseline file.  default:"
+                        f" {default_machine()}, from the OS, architecture"
+                        " and CPU count")
+    parser.add_argument('--save', nargs='?', const='', default=None,
+                        metavar='FILE',
+                        help="save the times to FILE.  default: the"
+                        " machine's baseline file")
+    parser.add_argument('--compare', nargs='?', const='', default=None,
+                        metavar='FILE',
+                        help="compare the times with FILE.  default: the"
+                        " machine's baseline file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown flagged as a regression."
+                        f"  default: {DEFAULT_THRESHOLD}")
+    args = parser.parse_args(arg_list)
+
+    baseline = {}
+    if args.compare is not None:
+        compare_file = args.compare or baseline_filename(args.machine)
+        if not os.path.isfile(compare_file):
+            sys.exit(f'{compare_file}: no such baseline file')
+        baseline = read_baseline(compare_file)['results']
+        if not baseline:
+            sys.exit(f'{compare_file}: the baseline has no results')
+        print(f'comparing with {compare_file}')
+
+    results = {}
+    over_budget = []
+    regressions = []
+    for name, cls, method_name in iter_cases(args.pattern):
+        try:
+            seconds = time_case(cls, method_name)
+        except NotImplementedError:
+            print(f'{name:60s} {"skipped":>12s}')
+            continue
+        results[name] = seconds
+        line = f'{name:60s} {seconds:12.6g} s'
+        budget = getattr(getattr(cls, method_name), 'budget', None)
+        if budget is not None and seconds > budget:
+            over_budget.append(name)
+            line += f'  OVER BUDGET ({budget} s)'
+        if args.compare is not None:
+            note = compare(seconds, baseline.get(name), args.threshold)
+            if note.endswith('REGRESSION'):
+                regressions.append(name)
+            line += f'  {note}'
+        print(line)
+
+    if args.save is not None:
+        save_baseline(args.save or baseline_filename(args.machine),
+                      machine_info(args.machine), results)
+
+    errors = []
+    if args.compare is not None and not set(results) & set(baseline):
+        errors.append('no case run has a baseline to compare with')
+    if over_budget:
+        errors.append(f'{len(over_budget)} case(s) over budget')
+    if regressions:
+        errors.append(f'{len(regressions)} case(s) slower than the baseline'
+                      f' by more than {args.threshold:.0%}')
+    if errors:
+        sys.exit(', '.join(errors))
+
+
+if __name__ == '__main__':
+    main()
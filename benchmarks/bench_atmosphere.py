@@ -0,0 +1,77 @@
+"""Per-call cost of the standard atmosphere: stdAtm76 versus lookup tables.
+
+Each case does what one x_dot evaluation needs: the density plus the
+temperature-dependent viscosity at one altitude.
+"""
+import numpy as np
+
+from golfball.atmosphere import AtmosphereTable
+from golfball.stdAtm76 import getStandardDensity, getStandardTemperature
+from golfball.stdAtm76 import getGeopotential, getDynViscosity
+from golfball.stdAtm76 import getReynoldsNumber
+from golfball.stdAtm76 import getStandardAtmosphereArray
+from golfball.sim import Sim, get_args
+
+ALTITUDE = np.float64(23.4)
+
+
+class AtmosphereScalar():
+    """One RHS worth of atmosphere evaluations at a single altitude."""
+
+    def setup(self):
+        self.linear = AtmosphereTable(kind='linear')
+        self.cubic = AtmosphereTable(kind='cubic')
+
+    def time_exact(self):
+        getStandardDensity(ALTITUDE, units='m')
+        getDynViscosity(getStandardTemperature(getGeopotential(ALTITUDE,
+                                                               units='m')))
+
+    def time_table_linear(self):
+        self.linear.density(ALTITUDE)
+        self.linear.viscosity(ALTITUDE)
+
+    def time_table_cubic(self):
+        self.cubic.density(ALTITUDE)
+        self.cubic.viscosity(ALTITUDE)
+
+
+class StdAtm76Scalar():
+    """The stdAtm76 functions x_dot calls, one at a time."""
+
+    def time_standard_density(self):
+        getStandardDensity(ALTITUDE, units='m')
+
+    def time_reynolds_number(self):
+        getReynoldsNumber(70.0, 1.225, 0.04222, 288.15)
+
+
+class AtmosphereArray():
+    """Density and viscosity for 10k altitudes at once."""
+
+    def setup(self):
+        self.altitudes = np.linspace(0.0, 3000.0, 10000)
+        self.cubic = AtmosphereTable(kind='cubic')
+
+    def time_exact_array(self):
+        temp, _, _ = getStandardAtmosphereArray(self.altitudes, units='m')
+        getDynViscosity(temp)
+
+    def time_table_cubic_array(self):
+        self.cubic.density(self.altitudes)
+        self.cubic.viscosity(self.altitudes)
+
+
+class SimRunAtmosphere():
+    """Default Sim.run with the exact and tabulated atmosphere."""
+
+    def setup(self):
+        inputs = 'tests/sim/inputs/projectile_inputs_default.yml'
+        self.exact = Sim(get_args(['-i', inputs, '--atmosphere', 'exact']))
+        self.table = Sim(get_args(['-i', inputs, '--atmosphere', 'table']))
+
+    def time_sim_run_exact(self):
+        self.exact.run()
+
+    def time_sim_run_table(self):
+        self.table.run()
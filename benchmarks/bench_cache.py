@@ -0,0 +1,29 @@
+"""Sim.run answered from the result cache, versus integrating."""
+import os
+import shutil
+import tempfile
+
+from golfball.sim import Sim, get_args
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+class CachedRun():
+    """Repeated runs of the same inputs, with a warm cache."""
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+        args = ['-i', INPUTS, '--cache_filename',
+                os.path.join(self.workdir, 'cache.db')]
+        self.sim = Sim(get_args(args))
+        self.sim.run()
+        self.qoi_sim = Sim(get_args(args))
+
+    def teardown(self):
+        shutil.rmtree(self.workdir)
+
+    def time_cached_run(self):
+        self.sim.run()
+
+    def time_cached_qoi_only(self):
+        self.qoi_sim.run(qoi_only=True)
@@ -0,0 +1,32 @@
+"""Cd lookups through the DragModel cache and through the Cd DataFrame."""
+import numpy as np
+
+from golfball.drag import DragModel
+from golfball.sim import calc_drag_coeff, get_cd_table
+
+DIMPLE_SIZE = 0.0125
+REYNOLDS_NO = 1.2e5
+
+
+class CdLookup():
+    """One Cd lookup, and a vectorized batch over mixed dimple sizes."""
+
+    def setup(self):
+        self.drag_model = DragModel()
+        self.drag_model.column(DIMPLE_SIZE)
+        self.cd_df = get_cd_table()
+        self.reynolds_no = np.geomspace(2e4, 5e5, 10000)
+        self.dimple_size = np.resize([0.0, 0.0015, 0.005, 0.0125], 10000)
+
+    def time_cd_dataframe_lookup(self):
+        np.interp(REYNOLDS_NO, self.cd_df.index.values,
+                  self.cd_df.loc[:, DIMPLE_SIZE].values)
+
+    def time_cd_drag_model(self):
+        self.drag_model.cd(REYNOLDS_NO, DIMPLE_SIZE)
+
+    def time_calc_drag_coeff(self):
+        calc_drag_coeff(30.0, 50.0, 0.04222, 1.2, DIMPLE_SIZE)
+
+    def time_cd_drag_model_batch(self):
+        self.drag_model.cd(self.reynolds_no, self.dimple_size)
@@ -0,0 +1,36 @@
+"""Shots per second of the ensemble engine versus one Sim.run per shot."""
+import numpy as np
+
+from golfball.ensemble import initial_states, run_ensemble
+from golfball.sim import Sim, get_args
+
+
+class EnsembleThroughput():
+    """Integrate N randomized shots; compare time per shot with SingleRun."""
+
+    n_members = 10000
+
+    def setup(self):
+        rng = np.random.default_rng(0)
+        n_members = self.n_members
+        self.x0 = initial_states(rng.uniform(5.0, 45.0, n_members),
+                                 rng.uniform(-5.0, 5.0, n_members),
+                                 rng.uniform(50.0, 80.0, n_members),
+                                 w_LL_B_LL=[0.0, -200.0, 0.0])
+        self.dimple_sizes = rng.choice([0.0, 1.5e-3, 5e-3, 1.25e-2],
+                                       n_members)
+
+    def time_ensemble_10k(self):
+        run_ensemble(self.x0, m=0.0459, D=0.04222, eD=self.dimple_sizes,
+                     S=0.000005)
+
+
+class SingleRun():
+    """One default trajectory through Sim.run."""
+
+    def setup(self):
+        self.sim = Sim(get_args(
+            ['-i', 'tests/sim/inputs/projectile_inputs_default.yml']))
+
+    def time_sim_run(self):
+        self.sim.run()
@@ -0,0 +1,76 @@
+"""Sim.run with each integrator method, tolerance and step."""
+from golfball.sim import Sim, get_args
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+INPUTS_0DEG = 'tests/sim/inputs/projectile_inputs_0deg.yml'
+
+
+class SimRunInputs():
+    """Sim.run of the regression test inputs."""
+
+    def setup(self):
+        self.default = Sim(get_args(['-i', INPUTS]))
+        self.zero_deg = Sim(get_args(['-i', INPUTS_0DEG]))
+
+    def time_sim_run_default(self):
+        self.default.run()
+
+    def time_sim_run_0deg(self):
+        self.zero_deg.run()
+
+
+class SimRunMethod():
+    """Default Sim.run with each integrator method."""
+
+    def setup(self):
+        self.odeint = Sim(get_args(['-i', INPUTS, '--method', 'odeint']))
+        self.lsoda = Sim(get_args(['-i', INPUTS, '--method', 'LSODA']))
+        self.dop853 = Sim(get_args(['-i', INPUTS, '--method', 'DOP853']))
+
+    def time_sim_run_odeint(self):
+        self.odeint.run()
+
+    def time_sim_run_lsoda(self):
+        self.lsoda.run()
+
+    def time_sim_run_dop853(self):
+        self.dop853.run()
+
+    def time_sim_run_odeint_qoi_only(self):
+        self.odeint.run(qoi_only=True)
+
+    def time_sim_run_lsoda_qoi_only(self):
+        self.lsoda.run(qoi_only=True)
+
+    def time_sim_run_lsoda_traj(self):
+        self.lsoda.run()
+        self.lsoda.traj  # pylint: disable=W0104
+
+    def time_iter_trajectory_odeint(self):
+        for _ in self.odeint.iter_trajectory(block_size=64):
+            pass
+
+    def time_iter_trajectory_lsoda(self):
+        for _ in self.lsoda.iter_trajectory(block_size=64):
+            pass
+
+
+class SimRunTolerance():
+    """QoI-only Sim.run at looser tolerances, and with fixed step RK4."""
+
+    def setup(self):
+        self.rk45 = Sim(get_args(['-i', INPUTS, '--method', 'RK45',
+                                  '--rtol', '1e-6', '--atol', '1e-6']))
+        self.odeint = Sim(get_args(['-i', INPUTS, '--rtol', '1e-6',
+                                    '--atol', '1e-6']))
+        self.rk4 = Sim(get_args(['-i', INPUTS, '--method', 'RK4',
+                                 '--step', '0.2']))
+
+    def time_sim_run_rk45_1e6(self):
+        self.rk45.run(qoi_only=True)
+
+    def time_sim_run_odeint_1e6(self):
+        self.odeint.run(qoi_only=True)
+
+    def time_sim_run_rk4(self):
+        self.rk4.run(qoi_only=True)
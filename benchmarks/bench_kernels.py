@@ -0,0 +1,45 @@
+"""Cost of one RHS evaluation and of Sim.run for each kernel engine."""
+import numpy as np
+
+from golfball.kernels import RHSKernel
+from golfball.sim import CD_TABLE, Sim, get_args
+
+PARAMS = {'m': 0.0459, 'D': 0.04222, 'eD': 0.0125, 'S': 0.000005,
+          'g_LL': [0.0, 0.0, -9.81], 'rho_scale': 1.0,
+          'wind': [0.0, 0.0, 0.0]}
+
+STATE = np.array([40.0, 0.0, 30.0, 50.0, 0.0, 20.0,
+                  0.0, 0.0, 0.0, 0.0, -200.0, 0.0])
+
+
+class RHSEvaluation():
+    """One call of the right-hand side."""
+
+    def setup(self):
+        re_grid = CD_TABLE.index.values
+        cd_column = CD_TABLE.loc[:, PARAMS['eD']].values
+        self.numpy = RHSKernel(PARAMS, re_grid, cd_column, engine='numpy')
+        self.numba = RHSKernel(PARAMS, re_grid, cd_column, engine='numba')
+        self.numba(STATE)  # compile outside of the timing
+
+    def time_rhs_numpy(self):
+        self.numpy(STATE)
+
+    def time_rhs_numba(self):
+        self.numba(STATE)
+
+
+class SimRunEngine():
+    """Default Sim.run with each engine."""
+
+    def setup(self):
+        inputs = 'tests/sim/inputs/projectile_inputs_default.yml'
+        self.numpy = Sim(get_args(['-i', inputs, '--engine', 'numpy']))
+        self.numba = Sim(get_args(['-i', inputs, '--engine', 'numba']))
+        self.numba.run()  # compile outside of the timing
+
+    def time_sim_run_numpy(self):
+        self.numpy.run()
+
+    def time_sim_run_numba(self):
+        self.numba.run()
@@ -0,0 +1,37 @@
+"""Samples per second of a dispersion analysis, and of its statistics alone."""
+import numpy as np
+
+from golfball.montecarlo import DispersionStats, run_montecarlo
+
+INPUTS = {'integrator': {'method': 'RK45'}}
+DISTRIBUTIONS = {'vel_mag': {'dist': 'normal', 'std': 1.5},
+                 'angle': {'dist': 'uniform', 'low': 30.0, 'high': 40.0},
+                 'wind[1]': {'dist': 'normal', 'std': 3.0}}
+
+
+class Dispersion():
+    """256 samples in chunks of 64; the pool should scale with the CPUs."""
+
+    def time_serial(self):
+        run_montecarlo(INPUTS, DISTRIBUTIONS, 256, seed=0, chunk_size=64,
+                       max_workers=1)
+
+    def time_pool(self):
+        run_montecarlo(INPUTS, DISTRIBUTIONS, 256, seed=0, chunk_size=64)
+
+
+class StreamingStats():
+    """Reduce and merge 10 chunks of 10000 samples of 8 columns."""
+
+    def setup(self):
+        self.names = ['x_0', 'x_1', 'x_2', 'x_3', 'x_4', 'x_5', 'impact_x',
+                      'impact_y']
+        self.chunks = np.random.default_rng(0).normal(size=(10, 10000, 8))
+        self.edges = (np.linspace(-3.0, 3.0, 101), np.linspace(-3.0, 3.0, 101))
+
+    def time_update_merge(self):
+        stats = DispersionStats(self.names, self.edges)
+        for chunk in self.chunks:
+            chunk_stats = DispersionStats(self.names, self.edges)
+            chunk_stats.update(chunk)
+            stats.merge(chunk_stats)
@@ -0,0 +1,22 @@
+"""CPU time of a multilevel estimate against plain Monte Carlo.
+
+Both estimate the mean carry of the default ``odeint`` shot under dispersed
+launch conditions to the same standard error.
+"""
+from golfball.multilevel import run_multilevel
+
+DISTRIBUTIONS = {'vel_mag': {'dist': 'normal', 'std': 1.5},
+                 'angle': {'dist': 'uniform', 'low': 30.0, 'high': 40.0},
+                 'wind[1]': {'dist': 'normal', 'std': 3.0}}
+TARGET_STD = 0.2
+
+
+class MeanCarry():
+    """Mean max_range to a standard error of 0.2 m, in one process."""
+
+    def time_multilevel(self):
+        run_multilevel(None, DISTRIBUTIONS, TARGET_STD, seed=0, max_workers=1)
+
+    def time_plain(self):
+        run_multilevel(None, DISTRIBUTIONS, TARGET_STD, levels=[], seed=0,
+                       max_workers=1)
@@ -0,0 +1,25 @@
+"""Batches of optimizer candidates, run in this process."""
+import numpy as np
+
+from golfball.optimize import BatchObjective
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+class CandidateBatch():
+    """One generation of 16 launch angles, new and memoized."""
+
+    def setup(self):
+        self.objective = BatchObjective(INPUTS, ['angle'], max_workers=1)
+        self.angles = np.linspace(10.0, 50.0, 16)[None, :]
+        self.objective(self.angles)
+
+    def teardown(self):
+        self.objective.close()
+
+    def time_new_candidates(self):
+        self.objective.memo.clear()
+        self.objective(self.angles)
+
+    def time_memoized_candidates(self):
+        self.objective(self.angles)
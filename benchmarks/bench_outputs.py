@@ -0,0 +1,52 @@
+"""Writing the outputs of one run in each output format."""
+import os
+import shutil
+import tempfile
+
+from golfball.sim import Sim, get_args
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+class WriteOutputs():
+    """QoIs and trajectory of the default run; parquet needs pyarrow."""
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+        self.sims = {}
+        for output_format in ('yaml', 'npz', 'parquet'):
+            self.sims[output_format] = Sim(get_args([
+                '-i', INPUTS, '--write_traj', '--output_format',
+                output_format, '-o',
+                os.path.join(self.workdir, 'projectile_outputs.yml'),
+                '--traj_filename', os.path.join(self.workdir, 'traj.h5')]))
+            self.sims[output_format].run()
+
+    def teardown(self):
+        shutil.rmtree(self.workdir)
+
+    def time_write_qoi_yaml(self):
+        self.sims['yaml'].write_qoi()
+
+    def time_write_qoi_npz(self):
+        self.sims['npz'].write_qoi()
+
+    def time_write_qoi_parquet(self):
+        self.sims['parquet'].write_qoi()
+
+    def time_write_outputs_yaml(self):
+        self.sims['yaml'].write_outputs()
+
+    def time_write_outputs_npz(self):
+        self.sims['npz'].write_outputs()
+
+    def time_write_outputs_parquet(self):
+        self.sims['parquet'].write_outputs()
+
+    def time_write_trajectories_hdf5(self):
+        self.sims['yaml'].write_trajectories(
+            os.path.join(self.workdir, 'traj.h5'))
+
+    def time_write_trajectories_parquet(self):
+        self.sims['parquet'].write_trajectories(
+            os.path.join(self.workdir, 'traj.h5'))
@@ -0,0 +1,55 @@
+"""Scaling of run_many from 1 to 8 threads, and against processes.
+
+The compiled RK4 runs of the numba engine release the GIL, so their thread
+times should drop with the number of threads up to the number of cores; the
+numpy engine's runs take turns on the GIL and shouldn't.
+"""
+import numpy as np
+
+from golfball import run_many
+
+N_RUNS = 256
+
+
+def _inputs(engine):
+    """Return N_RUNS RK4 shots over a range of launch angles."""
+    return [{'state': {'angle': float(angle)},
+             'integrator': {'method': 'RK4', 'step': 0.01},
+             'config': {'engine': engine}}
+            for angle in np.linspace(10.0, 50.0, N_RUNS)]
+
+
+class ThreadScaling():
+    """256 compiled RK4 shots over 1, 2, 4 and 8 threads."""
+
+    def setup(self):
+        self.inputs = _inputs('numba')
+        run_many(self.inputs[:1])
+
+    def time_threads_1(self):
+        run_many(self.inputs, max_workers=1)
+
+    def time_threads_2(self):
+        run_many(self.inputs, max_workers=2)
+
+    def time_threads_4(self):
+        run_many(self.inputs, max_workers=4)
+
+    def time_threads_8(self):
+        run_many(self.inputs, max_workers=8)
+
+    def time_processes_4(self):
+        run_many(self.inputs, executor='process', max_workers=4)
+
+
+class ThreadScalingNumpy():
+    """The same shots with the numpy engine, which holds the GIL."""
+
+    def setup(self):
+        self.inputs = _inputs('numpy')[:64]
+
+    def time_threads_1(self):
+        run_many(self.inputs, max_workers=1)
+
+    def time_threads_4(self):
+        run_many(self.inputs, max_workers=4)
@@ -0,0 +1,44 @@
+"""QoI gradients: one forward sensitivity run vs central differences."""
+import copy
+
+from golfball.sensitivity import SENSITIVITY_PARAMS
+from golfball.sim import Sim, get_args
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+ARGS = ['-i', INPUTS, '--method', 'LSODA', '--rtol', '1e-8', '--atol', '1e-8',
+        '--w_LL_B_LL', '0', '-200', '0']
+
+
+def _moved(inputs, param, delta):
+    """Return inputs with one sensitivity parameter moved by delta."""
+    inputs = copy.deepcopy(inputs)
+    if param.endswith(']'):
+        name, index = param[:-3], int(param[-2])
+        group = 'state' if name == 'w_LL_B_LL' else 'params'
+        inputs[group][name] = list(inputs[group][name])
+        inputs[group][name][index] += delta
+    elif param in inputs['state']:
+        inputs['state'][param] += delta
+    else:
+        inputs['params'][param] += delta
+    return inputs
+
+
+class QoIGradients():
+    """All 13 x 3 QoI gradients of one shot."""
+
+    def setup(self):
+        self.inputs = Sim(get_args(ARGS)).inputs
+        self.moved = [_moved(self.inputs, param, sign * 1e-4)
+                      for param in SENSITIVITY_PARAMS for sign in (1, -1)]
+
+    def time_sensitivities(self):
+        inputs = copy.deepcopy(self.inputs)
+        inputs['config']['sensitivities'] = True
+        Sim(inputs=inputs).run(qoi_only=True)
+
+    def time_central_differences(self):
+        Sim(inputs=self.inputs).run(qoi_only=True)
+        for inputs in self.moved:
+            Sim(inputs=inputs).run(qoi_only=True)
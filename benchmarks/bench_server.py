@@ -0,0 +1,40 @@
+"""Evaluations through a ``gball serve`` socket, versus a fresh ``gball``.
+
+Compare with ``bench_startup.Startup.time_gball_default_run``, which is what
+each sample costs when Dakota forks ``gball``.
+"""
+import os
+import shutil
+import tempfile
+import threading
+
+from golfball.server import EvaluationServer, request
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+class ServerRequest():
+    """Requests to a warm server on a Unix socket."""
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'gball.sock')
+        self.server = EvaluationServer(INPUTS)
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self.server.serve_socket,
+                                       args=(self.path, ready))
+        self.thread.start()
+        ready.wait(10.0)
+
+    def teardown(self):
+        request({'command': 'shutdown'}, self.path)
+        self.thread.join()
+        self.server.close()
+        shutil.rmtree(self.workdir)
+
+    def time_single_evaluation(self):
+        request({'params': {'angle': 24.0}}, self.path)
+
+    def time_batch_of_10(self):
+        request({'batch': [{'angle': 5.0 + 4.0 * i} for i in range(10)]},
+                self.path)
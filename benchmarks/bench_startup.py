@@ -0,0 +1,68 @@
+"""Startup cost of the ``gball`` command line tool.
+
+Every case starts a fresh interpreter, so it includes the imports and file
+reads that each short ``gball`` call, e.g. from Dakota, pays.  A case's
+``budget`` attribute is the most it may take [s]; ``python -m benchmarks``
+flags the cases over budget and exits with an error.
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INPUTS = os.path.join(ROOT, 'tests', 'sim', 'inputs',
+                      'projectile_inputs_default.yml')
+
+
+def _python(code, cwd=None, options=()):
+    """Run python code in a fresh interpreter, and return its stderr."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT] + [
+        path for path in [env.get('PYTHONPATH')] if path])
+    result = subprocess.run([sys.executable, *options, '-c', code], cwd=cwd,
+                            env=env, check=True, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True)
+    return result.stderr
+
+
+def run_gball(arg_list, cwd=None):
+    """Run ``gball`` with arg_list in a fresh interpreter."""
+    _python(f'from golfball.sim import main; main({arg_list!r})', cwd=cwd)
+
+
+def import_time(module):
+    """Return the cumulative import time [s] of a module in a fresh interpreter.
+
+    The time is taken from the ``python -X importtime`` report.
+    """
+    report = _python(f'import {module}', options=('-X', 'importtime'))
+    for line in report.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\S+)$', line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) * 1e-6
+    raise ValueError(f'{module} is not in the importtime report')
+
+
+class Startup():
+    """Fresh ``gball`` processes."""
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.workdir)
+
+    def time_gball_help(self):
+        run_gball(['--help'])
+    time_gball_help.budget = 0.5
+
+    def time_gball_default_run(self):
+        run_gball(['-i', INPUTS], cwd=self.workdir)
+    time_gball_default_run.budget = 1.5
+
+    def track_import_golfball(self):
+        return import_time('golfball')
+    track_import_golfball.budget = 0.3
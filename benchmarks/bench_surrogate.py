@@ -0,0 +1,40 @@
+"""Surrogate.predict over many points, versus running the sim."""
+import numpy as np
+import pandas as pd
+
+from golfball.surrogate import Surrogate, sample_box
+
+# the seven inputs of a typical design study
+BOX = {'vel_mag': (50.0, 80.0), 'angle': (8.0, 40.0), 'azimuth': (-5.0, 5.0),
+       'w_LL_B_LL[1]': (-300.0, 0.0), 'eD': (0.005, 0.0125),
+       'rho_scale': (0.9, 1.1), 'wind[0]': (-5.0, 5.0)}
+
+N_POINTS = 100000
+
+
+class SurrogatePredict():
+    """Predict the three QoIs at N_POINTS points of the box."""
+
+    def setup(self):
+        design = sample_box(BOX, 1024, seed=0)
+        # smooth stand-in results; fitting doesn't depend on their values
+        results = pd.DataFrame({name: np.sin(design.sum(axis=1) / scale)
+                                for name, scale in (('max_height', 50.0),
+                                                    ('max_range', 80.0),
+                                                    ('time_of_flight', 30.0))})
+        self.poly_3 = Surrogate.fit(BOX, design, results, degree=3)
+        self.poly_4 = Surrogate.fit(BOX, design, results, degree=4)
+        self.rbf = Surrogate.fit(BOX, design, results, kind='rbf')
+        self.points = sample_box(BOX, N_POINTS, method='lhs',
+                                 seed=1).to_numpy()
+
+    def time_predict_poly_degree_3(self):
+        self.poly_3.predict(self.points)
+
+    def time_predict_poly_degree_4(self):
+        self.poly_4.predict(self.points)
+
+    def time_predict_rbf_1024(self):
+        # 1024 centers: a tenth of the points takes longer than all of them
+        # with a polynomial
+        self.rbf.predict(self.points[:N_POINTS // 10])
@@ -0,0 +1,53 @@
+"""Runs per second of a parameter sweep, in this process and over a pool."""
+import numpy as np
+import pandas as pd
+
+from golfball.sim import Sim, default_inputs
+from golfball.sweep import run_sweep
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+class SweepThroughput():
+    """Sweep 64 launch conditions; the pool should scale with the CPUs."""
+
+    n_runs = 64
+
+    def setup(self):
+        rng = np.random.default_rng(0)
+        self.design = pd.DataFrame({
+            'angle': rng.uniform(5.0, 45.0, self.n_runs),
+            'vel_mag': rng.uniform(50.0, 80.0, self.n_runs)})
+
+    def time_sweep_serial(self):
+        run_sweep(INPUTS, self.design, max_workers=1)
+
+    def time_sweep_pool(self):
+        run_sweep(INPUTS, self.design)
+
+
+class SweepThousand():
+    """A 1000-shot sweep of the default inputs over the pool."""
+
+    def setup(self):
+        rng = np.random.default_rng(1)
+        self.design = pd.DataFrame({
+            'angle': rng.uniform(5.0, 45.0, 1000),
+            'vel_mag': rng.uniform(50.0, 80.0, 1000)})
+
+    def time_sweep_1000(self):
+        run_sweep(INPUTS, self.design)
+    time_sweep_1000.repeat = 1
+
+
+class SimConstruction():
+    """Per-run overhead of a Sim built from inputs in memory."""
+
+    def setup(self):
+        self.inputs = default_inputs()
+
+    def time_sim_inputs(self):
+        Sim(inputs=self.inputs)
+
+    def time_from_dict(self):
+        Sim.from_dict(self.inputs)
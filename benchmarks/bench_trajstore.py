@@ -0,0 +1,50 @@
+"""Writing and reading many trajectories: one store versus one file per run."""
+import os
+import shutil
+import tempfile
+
+from golfball.sim import Sim, get_args, load_gball_h5
+from golfball.trajstore import TrajectoryWriter, load_ensemble_h5
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+class TrajectoryFiles():
+    """500 copies of the default trajectory."""
+
+    n_runs = 500
+
+    def setup(self):
+        self.workdir = tempfile.mkdtemp()
+        self.store_file = os.path.join(self.workdir, 'store.h5')
+        sim = Sim(get_args(['-i', INPUTS]))
+        sim.run()
+        self.traj = sim.traj
+        with TrajectoryWriter(self.store_file) as writer:
+            for run_id in range(self.n_runs):
+                writer.put(run_id, self.traj)
+        self.traj.to_hdf(os.path.join(self.workdir, 'one.h5'), key='/traj_df')
+
+    def teardown(self):
+        shutil.rmtree(self.workdir)
+
+    def time_write_store(self):
+        with TrajectoryWriter(os.path.join(self.workdir, 'new.h5'),
+                              mode='w') as writer:
+            for run_id in range(self.n_runs):
+                writer.put(run_id, self.traj)
+
+    def time_write_files(self):
+        for run_id in range(self.n_runs):
+            self.traj.to_hdf(os.path.join(self.workdir, f'{run_id}.h5'),
+                             key='/traj_df')
+
+    def time_read_member(self):
+        load_ensemble_h5(self.store_file, run_id=321)
+
+    def time_read_member_window(self):
+        load_ensemble_h5(self.store_file, run_id=321, t_range=(1.0, 2.0),
+                         columns=['p_LL_x', 'p_LL_z'])
+
+    def time_read_file(self):
+        load_gball_h5(os.path.join(self.workdir, 'one.h5'))
@@ -3,6 +3,8 @@
 import os
 import pandas as pd
 
+from golfball.drag import build_cd_surface, write_cd_table
+
 
 def main():
     eD0_df = pd.read_csv(os.path.join(os.path.dirname(__file__),
@@ -43,7 +45,19 @@ def main():
                                              limit_direction='forward').dropna()
 
     merged_filled_df.index.name = 'Re'
-    merged_filled_df.to_hdf('cd_table.h5', '/cd_table')
+    merged_filled_df.to_hdf('cd_table.h5', key='/cd_table')
+    # the same table in golfball's memory-mappable binary format
+    write_cd_table('cd_table.bin', merged_filled_df.index.values,
+                   merged_filled_df.columns.values,
+                   merged_filled_df.values.T)
+
+    # continuous eD surface over every measured curve, the golf ball included
+    curves = {df.columns[0]: (df.index.values, df.iloc[:, 0].values)
+              for df in [eD0_df, eD1p5Em3_df, eD5Em3_df, eD1p25Em2_df,
+                         eD1p04Em1_df]}
+    surface = build_cd_surface(curves)
+    write_cd_table('cd_surface.bin', surface.re_grid, surface.dimple_sizes,
+                   surface.cd)
 
 
 if __name__ == "__main__":
@@ -2,5 +2,6 @@
 
 from .__version__ import __version__
 from .sim import main, Sim, load_gball_h5
+from .runner import run_many
 
-__all__ = ['__version__', 'main', 'Sim', 'load_gball_h5']
\ No newline at end of file
+__all__ = ['__version__', 'main', 'Sim', 'load_gball_h5', 'run_many']
\ No newline at end of file
@@ -1,13 +1,26 @@
+from collections.abc import Iterator
+
+import numpy as np
 from matplotlib import pyplot as plt
 
 
-def plot_traj(data, ax=None, **kwargs):
+def plot_traj(data, ax=None, pause=None, **kwargs):
+    """Plot a trajectory in 3D.
+
+    ``data`` is a trajectory DataFrame, or the iterator returned by
+    :py:meth:`golfball.sim.Sim.iter_trajectory`.  A stream is drawn as it
+    comes in, extending one line per sample or block; with ``pause`` the
+    figure is redrawn for that many seconds after each one.
+    """
     if ax is None:
         fig = plt.figure()
         ax = fig.add_subplot(projection='3d')
     else:
         fig = ax.figure
-    ax.plot(data['p_LL_x'], data['p_LL_y'], data['p_LL_z'], **kwargs)
+    if isinstance(data, Iterator):
+        _plot_stream(ax, data, pause, **kwargs)
+    else:
+        ax.plot(data['p_LL_x'], data['p_LL_y'], data['p_LL_z'], **kwargs)
     ax.set_xlabel('x (m)')
     ax.set_ylabel('y (m)')
     ax.set_zlabel('z (m)')
@@ -15,6 +28,34 @@ def plot_traj(data, ax=None, **kwargs):
 
     return fig, ax
 
+
+def _plot_stream(ax, samples, pause=None, **kwargs):
+    """Extend one line with each (time, state) sample or (time, states) block.
+
+    Positions go into a buffer that doubles when full, and the axis limits
+    are extended by each new block only.  The line is redrawn per block
+    with ``pause``, else once at the end.
+    """
+    line, = ax.plot([], [], [], **kwargs)
+    positions = np.empty((256, 3))
+    count = 0
+    for _, states in samples:
+        block = np.atleast_2d(states)[:, 0:3]
+        if count + len(block) > len(positions):
+            grown = np.empty((max(2 * len(positions), count + len(block)), 3))
+            grown[:count] = positions[:count]
+            positions = grown
+        positions[count:count + len(block)] = block
+        ax.auto_scale_xyz(block[:, 0], block[:, 1], block[:, 2],
+                          had_data=count > 0)
+        count += len(block)
+        if pause is not None:
+            line.set_data_3d(*positions[:count].T)
+            plt.pause(pause)
+    line.set_data_3d(*positions[:count].T)
+    return line
+
+
 if __name__ == '__main__':
     from golfball import main
     from golfball import load_gball_h5
@@ -0,0 +1,165 @@
+"""Precomputed 1976 Standard Atmosphere lookup tables.
+
+Evaluating :py:mod:`golfball.stdAtm76` from scratch converts altitude to
+geopotential height and walks the layer if/elif chain for every quantity.
+:py:class:`AtmosphereTable` instead tabulates density, temperature, dynamic
+viscosity and speed of sound once on a uniform altitude grid and evaluates
+piecewise linear or cubic spline polynomials.  Coefficients are stored per
+grid cell, so a lookup is one index computation plus a Horner evaluation,
+and the cell found for the last scalar altitude is reused by the next
+quantity requested at that same altitude.
+
+Maximum relative error against :py:mod:`golfball.stdAtm76` over the default
+grid (-1 km to 11 km, 10 m spacing), checked by the test suite:
+
+==================  ============  ============
+quantity            ``linear``    ``cubic``
+==================  ============  ============
+``density``         2e-7          1e-13
+``temperature``     1e-9          1e-13
+``viscosity``       1e-8          1e-13
+``speed_of_sound``  1e-8          1e-13
+==================  ============  ============
+
+Outside the grid the table falls back to the exact stdAtm76 functions.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .stdAtm76 import getStandardAtmosphereArray, getDynViscosity
+
+QUANTITIES = ('density', 'temperature', 'viscosity', 'speed_of_sound')
+
+AtmosphereState = namedtuple('AtmosphereState', QUANTITIES)
+
+
+def _exact_properties(altitude):
+    """Return all tabulated quantities from stdAtm76 for altitudes in m."""
+    temp, pres, rho = getStandardAtmosphereArray(altitude, units='m')
+    return AtmosphereState(density=rho,
+                           temperature=temp,
+                           viscosity=getDynViscosity(temp),
+                           speed_of_sound=np.sqrt(1.4 * pres / rho))
+
+
+class AtmosphereTable():
+    """Standard atmosphere tabulated on a uniform altitude grid.
+
+    Parameters
+    ----------
+    z_min, z_max : float, optional
+        Altitude range of the table [m].  The default spans the whole
+        troposphere, where the temperature profile has no kinks.
+    dz : float, optional
+        Grid spacing [m].
+    kind : {'cubic', 'linear'}, optional
+        Interpolation between grid points: a not-a-knot cubic spline or
+        straight lines.
+
+    """
+
+    def __init__(self, z_min=-1000.0, z_max=11000.0, dz=10.0, kind='cubic'):
+        if kind not in ('cubic', 'linear'):
+            raise ValueError('kind must be specified as "cubic" or "linear".')
+
+        self.kind = kind
+        self.dz = float(dz)
+        self.n_cells = int(np.ceil((z_max - z_min) / dz))
+        self.z_min = float(z_min)
+        self.z_max = self.z_min + self.n_cells * self.dz
+
+        altitude = self.z_min + self.dz * np.arange(self.n_cells + 1)
+        exact = _exact_properties(altitude)
+
+        # coefficients c[i] of c0 + s*(c1 + s*(c2 + s*c3)), with
+        # s = (altitude - altitude[i]) / dz in [0, 1] on cell i
+        self.coeffs = {name: self._fit(altitude, getattr(exact, name))
+                       for name in QUANTITIES}
+        # plain Python rows make the scalar lookup much cheaper
+        self._rows = {name: coeffs.tolist()
+                      for name, coeffs in self.coeffs.items()}
+
+        self._last_cell = (None, 0, 0.0)
+
+    def _fit(self, altitude, values):
+        """Return the per-cell polynomial coefficients, shape (n_cells, 4)."""
+        coeffs = np.zeros((self.n_cells, 4))
+        if self.kind == 'linear':
+            coeffs[:, 0] = values[:-1]
+            coeffs[:, 1] = np.diff(values)
+        else:
+            from scipy.interpolate import CubicSpline  # pylint: disable=C0415
+            spline = CubicSpline(altitude, values)
+            # CubicSpline.c holds powers (3, 2, 1, 0) of (z - z_i); rescale
+            # them to the unit cell coordinate s
+            coeffs[:] = spline.c[::-1].T * self.dz ** np.arange(4)
+        return coeffs
+
+    def _locate(self, altitude):
+        """Return (cell index, cell coordinate) for a scalar altitude."""
+        last_altitude, i_cell, s = self._last_cell
+        if altitude != last_altitude:
+            pos = (altitude - self.z_min) / self.dz
+            i_cell = min(int(pos), self.n_cells - 1)
+            s = pos - i_cell
+            # one tuple, so concurrent callers never see a mismatched pair
+            self._last_cell = (altitude, i_cell, s)
+        return i_cell, s
+
+    def _evaluate(self, name, altitude):
+        """Evaluate one tabulated quantity at scalar or array altitudes."""
+        if isinstance(altitude, (float, int, np.number)):
+            if not self.z_min <= altitude <= self.z_max:
+                return getattr(_exact_properties(altitude), name)
+            i_cell, s = self._locate(altitude)
+            c_0, c_1, c_2, c_3 = self._rows[name][i_cell]
+            return c_0 + s * (c_1 + s * (c_2 + s * c_3))
+
+        altitude = np.asarray(altitude, dtype=float)
+        inside = (altitude >= self.z_min) & (altitude <= self.z_max)
+        pos = (altitude[inside] - self.z_min) / self.dz
+        i_cell = np.minimum(pos.astype(int), self.n_cells - 1)
+        s = pos - i_cell
+        coeffs = self.coeffs[name][i_cell]
+
+        values = np.empty(altitude.shape)
+        values[inside] = coeffs[:, 0] + s * (coeffs[:, 1] + s * (
+            coeffs[:, 2] + s * coeffs[:, 3]))
+        if not np.all(inside):
+            values[~inside] = getattr(_exact_properties(altitude[~inside]),
+                                      name)
+        return values
+
+    def density(self, altitude):
+        """Standard density [kg/m^3] at altitude(s) in meters."""
+        return self._evaluate('density', altitude)
+
+    def temperature(self, altitude):
+        """Standard temperature [K] at altitude(s) in meters."""
+        return self._evaluate('temperature', altitude)
+
+    def viscosity(self, altitude):
+        """Dynamic viscosity [Pa*s] at altitude(s) in meters."""
+        return self._evaluate('viscosity', altitude)
+
+    def speed_of_sound(self, altitude):
+        """Speed of sound [m/s] at altitude(s) in meters."""
+        return self._evaluate('speed_of_sound', altitude)
+
+    def properties(self, altitude):
+        """Return every tabulated quantity as an AtmosphereState."""
+        return AtmosphereState(*(self._evaluate(name, altitude)
+                                 for name in QUANTITIES))
+
+
+_DEFAULT_TABLE = None
+
+
+def get_atmosphere_table():
+    """Return the process-wide default AtmosphereTable, built on first use."""
+    global _DEFAULT_TABLE  # pylint: disable=W0603
+    if _DEFAULT_TABLE is None:
+        _DEFAULT_TABLE = AtmosphereTable()
+    return _DEFAULT_TABLE
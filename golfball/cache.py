@@ -0,0 +1,310 @@
+"""On-disk cache of run results, keyed by a hash of the merged inputs.
+
+A run is identified by :py:func:`cache_key`: the SHA-256 of the inputs that
+affect its results, after all overrides are merged, together with the
+golfball version and a checksum of the Cd data file of its drag model.
+Output settings (the output filenames and format, ``write_traj``,
+``qoi_only``, ``traj_dtype`` and ``traj_stride``) are left out, and integer
+inputs are hashed as floats, so ``angle: 38`` and ``angle: 38.0`` share an
+entry.
+
+:py:class:`ResultCache` keeps the QoIs and impact of each run, and its
+trajectory when one was stored, in an SQLite file in WAL mode.  Any number of
+processes and threads can read and write the same file; each process opens
+its own connection, and writers wait for each other instead of failing.  The
+file is bounded in size: adding an entry evicts the least recently used ones
+until the payloads fit in ``max_bytes``.  Hits and misses are counted both per
+cache object and in the file, for all processes together.
+
+Set the ``cache_filename`` config input (or pass ``--cache_filename``) to
+have :py:meth:`golfball.sim.Sim.run` use a cache.
+"""
+import os
+import io
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from . import drag
+from .__version__ import __version__
+
+# 256 MiB of stored results
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+# seconds to wait for other processes to release the cache file
+LOCK_TIMEOUT = 60.0
+
+# config inputs that don't change a run's results
+OUTPUT_INPUTS = ('out_filename', 'traj_filename', 'write_traj', 'qoi_only',
+                 'cache_filename', 'output_format', 'traj_dtype',
+                 'traj_stride')
+
+CD_MODEL_FILES = {'table': drag.CD_TABLE_FILE,
+                  'surface': drag.CD_SURFACE_FILE}
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'entries', 'size'])
+
+CachedRun = namedtuple('CachedRun', ['qoi', 'impact', 'traj'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    traj BLOB,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_last_used ON runs (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0);
+"""
+
+_CHECKSUMS = {}
+
+
+def data_checksum(cd_model):
+    """Return the SHA-256 of the Cd data file of a drag model, hashed once."""
+    if cd_model not in _CHECKSUMS:
+        with open(CD_MODEL_FILES[cd_model], 'rb') as data_file:
+            _CHECKSUMS[cd_model] = hashlib.sha256(data_file.read()).hexdigest()
+    return _CHECKSUMS[cd_model]
+
+
+def _canonical(value):
+    """Return value with ints as floats and tuples as lists, recursively."""
+    if isinstance(value, dict):
+        return {str(key): _canonical(val) for key, val in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(val) for val in value]
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    return value
+
+
+def cache_key(inputs):
+    """Return the cache key of a run from its merged input groups.
+
+    Parameters
+    ----------
+    inputs : dict
+        All input groups of the run, like :py:attr:`golfball.sim.Sim.inputs`.
+
+    Returns
+    -------
+    str
+        Hex SHA-256 digest.
+
+    """
+    inputs = _canonical(inputs)
+    for name in OUTPUT_INPUTS:
+        inputs.get('config', {}).pop(name, None)
+    identity = {'inputs': inputs,
+                'version': __version__,
+                'cd_data': data_checksum(inputs['config']['cd_model'])}
+    text = json.dumps(identity, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf8')).hexdigest()
+
+
+def _pack_traj(time_values, states):
+    """Return a trajectory as npz bytes."""
+    buffer = io.BytesIO()
+    np.savez(buffer, time=time_values, states=states)
+    return buffer.getvalue()
+
+
+def _unpack_traj(blob):
+    """Return the (time, states) arrays of npz bytes."""
+    with np.load(io.BytesIO(blob)) as arrays:
+        return arrays['time'], arrays['states']
+
+
+class ResultCache():
+    """Results of previous runs in an SQLite file shared between processes.
+
+    Parameters
+    ----------
+    filename : str
+        Cache file; created if it doesn't exist.
+    max_bytes : int, optional
+        Most bytes of stored results to keep.  Least recently used entries
+        are evicted beyond that.  The file itself is somewhat larger.
+
+    """
+
+    def __init__(self, filename, max_bytes=DEFAULT_MAX_BYTES):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+
+    def _connect(self):
+        """Return this process's connection, opening it on first use.
+
+        Connections are not carried over into forked processes.
+        """
+        if self._pid != os.getpid():
+            connection = sqlite3.connect(self.filename, timeout=LOCK_TIMEOUT,
+                                         isolation_level=None,
+                                         check_same_thread=False)
+            # switching to WAL doesn't wait for other connections setting up
+            # a new file, so retry it
+            deadline = time.monotonic() + LOCK_TIMEOUT
+            while True:
+                try:
+                    connection.execute('PRAGMA journal_mode=WAL')
+                    connection.executescript(_SCHEMA)
+                    break
+                except sqlite3.OperationalError:
+                    if time.monotonic() > deadline:
+                        connection.close()
+                        raise
+                    time.sleep(0.01)
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _count(self, connection, name):
+        """Add one to a counter, in the file and in this object."""
+        connection.execute('UPDATE counters SET value = value + 1'
+                           ' WHERE name = ?', (name,))
+        setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, key, traj=False):
+        """Return the cached run of a key, or None on a miss.
+
+        Parameters
+        ----------
+        key : str
+            Cache key, from :py:func:`cache_key`.
+        traj : bool, optional
+            Only count entries with a stored trajectory as hits.
+
+        Returns
+        -------
+        CachedRun or None
+            The QoI dict, impact dict (or None) and, if stored, the
+            trajectory as a (time, states) pair of arrays.
+
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                row = connection.execute(
+                    'SELECT result, traj FROM runs WHERE key = ?',
+                    (key,)).fetchone()
+                if row is None or (traj and row[1] is None):
+                    self._count(connection, 'misses')
+                    return None
+                connection.execute(
+                    'UPDATE runs SET last_used = ? WHERE key = ?',
+                    (time.time(), key))
+                self._count(connection, 'hits')
+
+        result = json.loads(row[0])
+        stored_traj = None if row[1] is None else _unpack_traj(row[1])
+        return CachedRun(result['qoi'], result['impact'], stored_traj)
+
+    def put(self, key, qoi, impact=None, traj=None):
+        """Store the results of a run, evicting old entries to make room.
+
+        Parameters
+        ----------
+        key : str
+            Cache key, from :py:func:`cache_key`.
+        qoi : dict
+            QoI dict of the run.
+        impact : dict, optional
+            Impact time and position of the run.
+        traj : tuple of numpy.ndarray, optional
+            Trajectory as (time, states).  An entry stored without one keeps
+            the trajectory of a previous entry of the same key.
+
+        """
+        result = json.dumps({'qoi': qoi, 'impact': impact})
+        blob = None if traj is None else _pack_traj(*traj)
+        size = len(result) + (0 if blob is None else len(blob))
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                if blob is None:
+                    row = connection.execute(
+                        'SELECT traj FROM runs WHERE key = ?',
+                        (key,)).fetchone()
+                    if row is not None and row[0] is not None:
+                        blob = row[0]
+                        size += len(blob)
+                connection.execute(
+                    'INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)',
+                    (key, result, blob, size, time.time()))
+                self._evict(connection)
+
+    def _evict(self, connection):
+        """Drop the least recently used entries beyond max_bytes."""
+        total, = connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM runs').fetchone()
+        if total <= self.max_bytes:
+            return
+        for key, size in connection.execute(
+                'SELECT key, size FROM runs ORDER BY last_used').fetchall():
+            connection.execute('DELETE FROM runs WHERE key = ?', (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def info(self):
+        """Return the hits and misses of all processes, entries and size."""
+        with self._lock:
+            connection = self._connect()
+            counters = dict(connection.execute(
+                'SELECT name, value FROM counters').fetchall())
+            entries, size = connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM runs'
+            ).fetchone()
+        return CacheInfo(counters['hits'], counters['misses'], entries, size)
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.execute('DELETE FROM runs')
+                connection.execute('UPDATE counters SET value = 0')
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        """Close this process's connection."""
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._pid = None
+
+
+_CACHES = {}
+
+
+def get_cache(filename):
+    """Return the process-wide ResultCache of a file, creating it once."""
+    filename = os.path.abspath(filename)
+    if filename not in _CACHES:
+        _CACHES[filename] = ResultCache(filename)
+    return _CACHES[filename]
@@ -0,0 +1,197 @@
+"""Dakota analysis driver that evaluates through a ``gball serve`` server.
+
+``gball-dakota PARAMS RESULTS`` reads a Dakota parameters file, sends all its
+evaluations to a running server as one batch, and writes the Dakota results
+file.  It stands in for the fork/exec, input file and output file cycle of
+running ``gball`` once per sample.
+
+Both the standard and the APREPRO parameters file formats are read.  With
+Dakota's ``batch`` evaluation scheduling the parameters file holds several
+evaluations one after the other; their results are written in the same order,
+separated by lines starting with ``#``.
+
+Variable descriptors name the Sim inputs they override, like the columns of a
+:py:mod:`golfball.sweep` design.  Response descriptors that name a QoI
+(``max_height``, ``max_range``, ``time_of_flight``) get that QoI; any other
+descriptor gets the QoI at its position in that list.  Only function values
+are available, not gradients or Hessians.  An evaluation that fails on the
+server is reported to Dakota as ``FAIL``.
+"""
+import os
+import sys
+import argparse
+import re
+
+from .server import DEFAULT_SOCKET, request
+
+QOI_NAMES = ('max_height', 'max_range', 'time_of_flight')
+
+# standard parameters file sections, by the tag of their count line
+_SECTIONS = ('variables', 'functions', 'derivative_variables',
+             'analysis_components', 'metadata')
+
+# APREPRO tags of the section counts
+_APREPRO_SECTIONS = {'DAKOTA_VARS': 'variables',
+                     'DAKOTA_FNS': 'functions',
+                     'DAKOTA_DER_VARS': 'derivative_variables',
+                     'DAKOTA_AN_COMPS': 'analysis_components',
+                     'DAKOTA_METADATA': 'metadata',
+                     'DAKOTA_EVAL_ID': 'eval_id'}
+
+_APREPRO_LINE = re.compile(r'^\{\s*(\S+)\s*=\s*(.*?)\s*\}$')
+
+
+def main(arg_list=None):
+    """Evaluate a Dakota parameters file through a server.
+
+    Parameters
+    ----------
+    arg_list : list of str, optional
+        List of individual commandline arguments to invoke main with. If
+        omitted, the actual commandline arguments will be used.
+
+    """
+    if arg_list is None:
+        arg_list = sys.argv[1:]
+    args = _make_parser().parse_args(arg_list)
+
+    evaluations = read_params_file(args.params_file)
+    response = request({'batch': [evaluation['variables']
+                                  for evaluation in evaluations]},
+                       args.socket)
+    if 'error' in response:
+        raise RuntimeError(response['error'])
+    write_results_file(args.results_file, evaluations, response['results'])
+
+
+def _make_parser():
+    """Define command line interface (CLI) argument parser."""
+    parser = argparse.ArgumentParser(
+        prog='gball-dakota',
+        description="Dakota analysis driver for a running gball serve")
+
+    parser.add_argument("params_file", help="Dakota parameters file")
+    parser.add_argument("results_file", help="Dakota results file to write")
+    parser.add_argument("--socket", '-s',
+                        default=os.environ.get('GBALL_SOCKET',
+                                               DEFAULT_SOCKET),
+                        metavar='PATH',
+                        help="Unix socket of the server.  default: the"
+                        f" GBALL_SOCKET variable, or {DEFAULT_SOCKET}")
+    return parser
+
+
+def _value(text):
+    """Return a variable value as a float, or as a string if it isn't one."""
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def _param_lines(lines):
+    """Yield (value, tag) pairs from standard or APREPRO format lines."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        match = _APREPRO_LINE.match(line)
+        if match:
+            tag, value = match.groups()
+            if tag in _APREPRO_SECTIONS:
+                tag = _APREPRO_SECTIONS[tag]
+            yield value.strip('"\''), tag
+        else:
+            value, tag = line.split(None, 1)
+            yield value, tag
+
+
+def read_params_file(filename):
+    """Read the evaluations of a Dakota parameters file.
+
+    Returns
+    -------
+    list of dict
+        One dict per evaluation, with ``variables`` (values by descriptor),
+        ``functions`` (a list of (descriptor, ASV) pairs) and ``eval_id``.
+
+    Raises
+    ------
+    ValueError :
+        Raised if the file isn't a Dakota parameters file.
+
+    """
+    with open(filename, 'r', encoding='utf8') as params_file:
+        pairs = list(_param_lines(params_file))
+
+    evaluations = []
+    evaluation = {'variables': {}, 'functions': []}
+    i_pair = 0
+    while i_pair < len(pairs):
+        value, tag = pairs[i_pair]
+        i_pair += 1
+        if tag == 'eval_id':
+            evaluation['eval_id'] = value
+            evaluations.append(evaluation)
+            evaluation = {'variables': {}, 'functions': []}
+        elif tag in _SECTIONS:
+            entries = pairs[i_pair:i_pair + int(value)]
+            i_pair += int(value)
+            if tag == 'variables':
+                evaluation['variables'] = {name: _value(val)
+                                           for val, name in entries}
+            elif tag == 'functions':
+                evaluation['functions'] = [(name.split(':', 1)[-1], int(asv))
+                                           for asv, name in entries]
+        else:
+            raise ValueError(f'{filename}: unexpected line "{value} {tag}"')
+    if not evaluations:
+        raise ValueError(f'{filename}: no evaluations found')
+    return evaluations
+
+
+def write_results_file(filename, evaluations, results):
+    """Write the results of the evaluations in a Dakota results file.
+
+    Parameters
+    ----------
+    filename : str
+        Results file name.
+    evaluations : list of dict
+        Evaluations, from :py:func:`read_params_file`.
+    results : list of dict
+        Server results, ``{'qoi': {...}}`` or ``{'error': ...}``, one per
+        evaluation.
+
+    Raises
+    ------
+    ValueError :
+        Raised if an evaluation asks for gradients or Hessians, or for a
+        response that is neither named as a QoI nor one of the first
+        len(QOI_NAMES).
+
+    """
+    blocks = []
+    for evaluation, result in zip(evaluations, results):
+        if 'error' in result:
+            blocks.append(['FAIL'])
+            continue
+        lines = []
+        for i_fn, (name, asv) in enumerate(evaluation['functions']):
+            if asv & ~1:
+                raise ValueError(f'{name}: only function values are'
+                                 ' available')
+            if asv & 1:
+                if name not in QOI_NAMES and i_fn >= len(QOI_NAMES):
+                    raise ValueError(f'{name}: not a QoI, and only the first'
+                                     f' {len(QOI_NAMES)} responses may be'
+                                     ' named otherwise')
+                qoi_name = name if name in QOI_NAMES else QOI_NAMES[i_fn]
+                lines.append(f'{result["qoi"][qoi_name]:.17e} {name}')
+        blocks.append(lines)
+
+    with open(filename, 'w', encoding='utf8') as results_file:
+        for i_block, lines in enumerate(blocks):
+            if i_block > 0:
+                results_file.write('#\n')
+            results_file.write(''.join(line + '\n' for line in lines))
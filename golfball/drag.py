@@ -0,0 +1,436 @@
+"""Drag coefficient table in a compact, memory-mapped binary format.
+
+The Cd table (Cd of dimpled spheres against Reynolds number, one curve per
+dimple size ratio eD) is stored as raw little-endian float64 arrays behind a
+small header, so it can be loaded with ``numpy.memmap`` alone.  Every process
+mapping the file shares one page-cached copy, and no pandas or PyTables is
+needed to run the sim.
+
+File layout, all values little-endian:
+
+==========  ==============================  ==================================
+offset      content                         type
+==========  ==============================  ==================================
+0           magic ``b'GBCDTBL'`` + version  8 bytes
+8           number of dimple sizes, n_eD    uint64
+16          number of Reynolds numbers, n   uint64
+24          reserved                        8 bytes
+32          dimple sizes eD                 float64, (n_eD,)
+...         Reynolds number grid Re         float64, (n,)
+...         Cd                              float64, (n_eD, n), C order
+==========  ==============================  ==================================
+
+The file is written by ``data/write_cd_h5.py`` next to the HDF5 table.
+
+:py:class:`CdSurface` makes Cd continuous in eD.  It is stored in the same
+format, sampled on a regular log Re grid for every measured curve, including
+the real golf ball (eD = 0.104, held at its last measured Cd above
+Re = 2.86e5).  Cd is linear in Re between grid points and linear in eD
+between curves, so a lookup is one index computation per axis.  On the curves
+of the Cd table it differs from the table by about 5e-3 in Cd, where the
+grid cuts the corners of the steepest drops of the drag crisis.
+
+:py:class:`DragModel` looks Cd up from a table or a surface.  It extracts the
+Re grid once and keeps the Cd curves of the most recently used dimple sizes
+in a bounded LRU cache, so evaluating the right-hand side never goes back to
+the table.
+"""
+
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+CD_TABLE_FILE = os.path.join(os.path.dirname(__file__), 'cd_table.bin')
+CD_SURFACE_FILE = os.path.join(os.path.dirname(__file__), 'cd_surface.bin')
+
+CD_MODELS = ('table', 'surface')
+
+MAGIC = b'GBCDTBL'
+VERSION = 1
+HEADER_SIZE = 32
+
+
+class CdTable():
+    """Cd against Reynolds number for a set of dimple size ratios.
+
+    Parameters
+    ----------
+    re_grid : array_like
+        Increasing Reynolds number grid, shape (n,).
+    dimple_sizes : array_like
+        Dimple size ratios eD, shape (n_eD,).
+    cd : array_like
+        Drag coefficients, shape (n_eD, n).
+
+    """
+
+    def __init__(self, re_grid, dimple_sizes, cd):
+        self.re_grid = re_grid
+        self.dimple_sizes = dimple_sizes
+        self.cd = cd
+
+    def column(self, dimple_size):
+        """Return the Cd curve of a dimple size ratio in the table.
+
+        Raises
+        ------
+        KeyError :
+            Raised if dimple_size is not one of the tabulated values.
+
+        """
+        matches = np.flatnonzero(self.dimple_sizes == dimple_size)
+        if matches.size == 0:
+            raise KeyError(dimple_size)
+        return self.cd[matches[0]]
+
+    def to_frame(self):
+        """Return the table as a DataFrame indexed by Re, one column per eD."""
+        import pandas as pd  # pylint: disable=C0415
+
+        cd_df = pd.DataFrame(np.array(self.cd).T,
+                             index=pd.Index(np.array(self.re_grid), name='Re'),
+                             columns=[float(dimple_size)
+                                      for dimple_size in self.dimple_sizes])
+        return cd_df
+
+
+def write_cd_table(filename, re_grid, dimple_sizes, cd):
+    """Write a Cd table to filename in the binary format of this module.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the output file.
+    re_grid : array_like
+        Increasing Reynolds number grid, shape (n,).
+    dimple_sizes : array_like
+        Dimple size ratios eD, shape (n_eD,).
+    cd : array_like
+        Drag coefficients, shape (n_eD, n).
+
+    """
+    re_grid = np.asarray(re_grid, dtype='<f8')
+    dimple_sizes = np.asarray(dimple_sizes, dtype='<f8')
+    cd = np.asarray(cd, dtype='<f8')
+    if cd.shape != (dimple_sizes.size, re_grid.size):
+        raise ValueError('cd must have shape'
+                         f' {(dimple_sizes.size, re_grid.size)}, not'
+                         f' {cd.shape}.')
+
+    header = np.zeros(HEADER_SIZE, dtype=np.uint8)
+    header[0:7] = np.frombuffer(MAGIC, dtype=np.uint8)
+    header[7] = VERSION
+    header[8:24] = np.array([dimple_sizes.size, re_grid.size],
+                            dtype='<u8').view(np.uint8)
+
+    with open(filename, 'wb') as f_out:
+        for array in (header, dimple_sizes, re_grid, cd):
+            f_out.write(np.ascontiguousarray(array).tobytes())
+
+
+def read_cd_table(filename=CD_TABLE_FILE, mmap=True):
+    """Read a Cd table written by :py:func:`write_cd_table`.
+
+    Parameters
+    ----------
+    filename : str, optional
+        Binary Cd table file; the table installed with golfball by default.
+    mmap : bool, optional
+        Map the arrays read-only from the file instead of reading them into
+        memory.
+
+    Returns
+    -------
+    CdTable
+
+    """
+    header = np.fromfile(filename, dtype=np.uint8, count=HEADER_SIZE)
+    if header.size < HEADER_SIZE or bytes(header[0:7]) != MAGIC:
+        raise ValueError(f'{filename} is not a golfball Cd table.')
+    if header[7] != VERSION:
+        raise ValueError(f'{filename} has unsupported Cd table version'
+                         f' {header[7]}.')
+    n_dimple_sizes, n_re = header[8:24].view('<u8')
+
+    if mmap:
+        data = np.memmap(filename, dtype='<f8', mode='r', offset=HEADER_SIZE)
+    else:
+        data = np.fromfile(filename, dtype='<f8', offset=HEADER_SIZE)
+    if data.size != n_dimple_sizes * (n_re + 1) + n_re:
+        raise ValueError(f'{filename} is truncated.')
+
+    dimple_sizes = data[:n_dimple_sizes]
+    re_grid = data[n_dimple_sizes:n_dimple_sizes + n_re]
+    cd = data[n_dimple_sizes + n_re:].reshape(n_dimple_sizes, n_re)
+    return CdTable(re_grid, dimple_sizes, cd)
+
+
+_DEFAULT_TABLE = None
+
+
+def get_cd_table():
+    """Return the process-wide, memory-mapped default CdTable."""
+    global _DEFAULT_TABLE  # pylint: disable=W0603
+    if _DEFAULT_TABLE is None:
+        _DEFAULT_TABLE = read_cd_table()
+    return _DEFAULT_TABLE
+
+
+def build_cd_surface(curves, n_re=4096):
+    """Sample measured Cd curves on a regular log Re grid.
+
+    Parameters
+    ----------
+    curves : dict
+        ``{eD: (re, cd)}`` measured Cd against Reynolds number for each
+        dimple size ratio.  Each curve is held constant beyond its data.
+    n_re : int, optional
+        Number of grid points, spanning the Re range of all the curves.
+
+    Returns
+    -------
+    CdTable
+        The curves sampled on the grid, in order of increasing eD.
+
+    """
+    dimple_sizes = np.array(sorted(curves), dtype=float)
+    re_min = min(np.min(re) for re, _ in curves.values())
+    re_max = max(np.max(re) for re, _ in curves.values())
+    re_grid = np.logspace(np.log10(re_min), np.log10(re_max), n_re)
+
+    cd = np.empty((dimple_sizes.size, n_re))
+    for i_dimple, dimple_size in enumerate(dimple_sizes):
+        re, cd_measured = (np.asarray(values, dtype=float)
+                           for values in curves[dimple_size])
+        order = np.argsort(re, kind='stable')
+        cd[i_dimple] = np.interp(re_grid, re[order], cd_measured[order])
+    return CdTable(re_grid, dimple_sizes, cd)
+
+
+class CdSurface():
+    """Cd continuous in Re and eD, on a regular log Re grid.
+
+    Parameters
+    ----------
+    table : CdTable
+        Cd curves sampled on a regular log Re grid, as made by
+        :py:func:`build_cd_surface`.
+
+    """
+
+    def __init__(self, table):
+        self.re_grid = np.array(table.re_grid, dtype=float)
+        self.dimple_sizes = np.array(table.dimple_sizes, dtype=float)
+        self.cd_grid = np.array(table.cd, dtype=float)
+
+        log_re = np.log10(self.re_grid)
+        self.log_re_min = log_re[0]
+        self.d_log_re = (log_re[-1] - log_re[0]) / (log_re.size - 1)
+        if not np.allclose(np.diff(log_re), self.d_log_re):
+            raise ValueError('The Cd surface needs a regular log Re grid.')
+
+    def locate(self, dimple_size):
+        """Return (curve index, weight of the next curve) for eD value(s).
+
+        Raises
+        ------
+        ValueError :
+            Raised if dimple_size is outside the measured curves.
+
+        """
+        dimple_size = np.asarray(dimple_size, dtype=float)
+        if dimple_size.size and (
+                dimple_size.min() < self.dimple_sizes[0]
+                or dimple_size.max() > self.dimple_sizes[-1]):
+            raise ValueError('eD must be between'
+                             f' {self.dimple_sizes[0]} and'
+                             f' {self.dimple_sizes[-1]}.')
+        i_dimple = np.minimum(
+            np.searchsorted(self.dimple_sizes, dimple_size, side='right') - 1,
+            self.dimple_sizes.size - 2)
+        weight = ((dimple_size - self.dimple_sizes[i_dimple])
+                  / (self.dimple_sizes[i_dimple + 1]
+                     - self.dimple_sizes[i_dimple]))
+        return i_dimple, weight
+
+    def column(self, dimple_size):
+        """Return the Cd curve on ``re_grid`` for a dimple size ratio.
+
+        Raises
+        ------
+        ValueError :
+            Raised if dimple_size is outside the measured curves.
+
+        """
+        i_dimple, weight = self.locate(dimple_size)
+        return ((1.0 - weight) * self.cd_grid[i_dimple]
+                + weight * self.cd_grid[i_dimple + 1])
+
+    def evaluate(self, reynolds_no, dimple_size):
+        """Return Cd at Reynolds number(s) and dimple size ratio(s).
+
+        Both arguments broadcast against each other.  Reynolds numbers
+        outside the grid take the Cd at its nearest end.
+        """
+        return self.evaluate_located(reynolds_no, *self.locate(dimple_size))
+
+    def evaluate_located(self, reynolds_no, i_dimple, weight):
+        """Return Cd for dimple sizes already located with :py:meth:`locate`.
+
+        Saves locating the same dimple sizes again when they don't change
+        between calls, as in an ensemble.
+        """
+        n_re = self.re_grid.size
+        reynolds_no = np.clip(reynolds_no, self.re_grid[0], self.re_grid[-1])
+        i_re = np.minimum(((np.log10(reynolds_no) - self.log_re_min)
+                           / self.d_log_re).astype(np.intp), n_re - 2)
+        re_lower = self.re_grid.take(i_re)
+        re_weight = ((reynolds_no - re_lower)
+                     / (self.re_grid.take(i_re + 1) - re_lower))
+
+        # corners of the cell in the flattened (eD, Re) grid
+        i_cell = i_dimple * n_re + i_re
+        cd_flat = self.cd_grid.ravel()
+        cd_lower = cd_flat.take(i_cell)
+        cd_lower += re_weight * (cd_flat.take(i_cell + 1) - cd_lower)
+        cd_upper = cd_flat.take(i_cell + n_re)
+        cd_upper += re_weight * (cd_flat.take(i_cell + n_re + 1) - cd_upper)
+        return cd_lower + weight * (cd_upper - cd_lower)
+
+
+_DEFAULT_SURFACE = None
+
+
+def get_cd_surface():
+    """Return the process-wide default CdSurface."""
+    global _DEFAULT_SURFACE  # pylint: disable=W0603
+    if _DEFAULT_SURFACE is None:
+        _DEFAULT_SURFACE = CdSurface(read_cd_table(CD_SURFACE_FILE))
+    return _DEFAULT_SURFACE
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class DragModel():
+    """Cd lookups with the curves of recently used dimple sizes cached.
+
+    Parameters
+    ----------
+    table : CdTable or CdSurface, optional
+        Table or surface to look Cd up in; the default table if omitted.
+    maxsize : int, optional
+        Number of dimple size curves kept; the least recently used curve is
+        dropped first.
+
+    """
+
+    def __init__(self, table=None, maxsize=64):
+        if table is None:
+            table = get_cd_table()
+        self.table = table
+        self.maxsize = maxsize
+        self.re_grid = np.array(table.re_grid, dtype=float)
+        self._columns = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def column(self, dimple_size):
+        """Return the Cd curve on ``re_grid`` for a dimple size ratio.
+
+        Raises
+        ------
+        KeyError :
+            Raised if the table has no curve for dimple_size.
+        ValueError :
+            Raised if dimple_size is outside the curves of a surface.
+
+        """
+        dimple_size = float(dimple_size)
+        with self._lock:
+            cd_column = self._columns.get(dimple_size)
+            if cd_column is not None:
+                self._hits += 1
+                self._columns.move_to_end(dimple_size)
+                return cd_column
+
+        cd_column = np.array(self.table.column(dimple_size), dtype=float)
+        with self._lock:
+            self._misses += 1
+            self._columns[dimple_size] = cd_column
+            while len(self._columns) > self.maxsize:
+                self._columns.popitem(last=False)
+        return cd_column
+
+    def cd(self, reynolds_no, dimple_size):
+        """Return Cd at Reynolds number(s) for dimple size ratio(s).
+
+        Parameters
+        ----------
+        reynolds_no : float or array_like
+            Reynolds number(s).
+        dimple_size : float or array_like
+            Dimple size ratio(s) eD, broadcast against reynolds_no.
+
+        Returns
+        -------
+        float or numpy.ndarray
+            Cd, with the broadcast shape of the inputs.
+
+        """
+        if np.ndim(dimple_size) == 0:
+            return np.interp(reynolds_no, self.re_grid,
+                             self.column(dimple_size))
+        if isinstance(self.table, CdSurface):
+            return self.table.evaluate(reynolds_no, dimple_size)
+
+        reynolds_no, dimple_size = np.broadcast_arrays(reynolds_no,
+                                                       dimple_size)
+        drag_coeff = np.empty(reynolds_no.shape)
+        dimple_sizes, dimple_index = np.unique(dimple_size,
+                                               return_inverse=True)
+        dimple_index = dimple_index.reshape(reynolds_no.shape)
+        for i_dimple, value in enumerate(dimple_sizes):
+            group = dimple_index == i_dimple
+            drag_coeff[group] = np.interp(reynolds_no[group], self.re_grid,
+                                          self.column(value))
+        return drag_coeff
+
+    def cache_info(self):
+        """Return the cache statistics, like functools.lru_cache does."""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self.maxsize,
+                             len(self._columns))
+
+    def cache_clear(self):
+        """Drop the cached curves and reset the statistics."""
+        with self._lock:
+            self._columns.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+_DEFAULT_MODELS = {}
+
+
+def get_drag_model(cd_model='table'):
+    """Return the process-wide DragModel of a Cd model.
+
+    Parameters
+    ----------
+    cd_model : {'table', 'surface'}, optional
+        ``table`` only has the tabulated dimple sizes, ``surface`` is
+        continuous in eD.
+
+    """
+    if cd_model not in CD_MODELS:
+        raise ValueError(f'cd_model must be one of {CD_MODELS}')
+    if cd_model not in _DEFAULT_MODELS:
+        if cd_model == 'surface':
+            _DEFAULT_MODELS[cd_model] = DragModel(get_cd_surface())
+        else:
+            _DEFAULT_MODELS[cd_model] = DragModel()
+    return _DEFAULT_MODELS[cd_model]
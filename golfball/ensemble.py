@@ -0,0 +1,259 @@
+"""Batched ensemble engine for integrating many golf ball shots at once.
+
+Instead of one ``odeint`` call per trajectory, every member of the ensemble
+is advanced together through a NumPy-vectorized right-hand side with a
+fixed-step 4th order Runge-Kutta scheme on the same ``dt`` grid that
+:py:meth:`golfball.sim.Sim.run` samples.  The Quantities of Interest (QoI)
+are accumulated on the fly with the same definitions used by
+:py:attr:`golfball.sim.Sim.qoi`, so a member of the ensemble reproduces the
+QoI of the equivalent single run to well within the regression tolerances.
+"""
+
+import numpy as np
+
+from .drag import get_drag_model
+from .stdAtm76 import getStandardAtmosphereArray, getReynoldsNumber
+
+STATE_SIZE = 12
+
+
+def initial_states(angle, azimuth, vel_mag, pos_LL=(0.0, 0.0, 0.0),
+                   w_LL_B_LL=(0.0, 0.0, 0.0)):
+    """Build an (N, 12) array of initial states from launch conditions.
+
+    The conversion is the same one :py:meth:`golfball.sim.Sim.run` uses for
+    its initial condition.
+
+    Parameters
+    ----------
+    angle : float or array_like
+        Launch angle above horizontal [deg], scalar or shape (N,).
+    azimuth : float or array_like
+        Launch angle about the z axis [deg], scalar or shape (N,).
+    vel_mag : float or array_like
+        Initial velocity magnitude [m/s], scalar or shape (N,).
+    pos_LL : array_like, optional
+        Initial position in the Local Level frame, shape (3,) or (N, 3).
+    w_LL_B_LL : array_like, optional
+        Initial angular velocity in the Local Level frame, shape (3,) or
+        (N, 3).
+
+    Returns
+    -------
+    numpy.ndarray
+        Initial states, shape (N, 12).
+
+    """
+    ang, az, vel = np.broadcast_arrays(np.radians(np.atleast_1d(angle)),
+                                       np.radians(np.atleast_1d(azimuth)),
+                                       np.atleast_1d(vel_mag).astype(float))
+    n_members = ang.shape[0]
+
+    x0 = np.zeros((n_members, STATE_SIZE))
+    x0[:, 0:3] = pos_LL
+    x0[:, 3] = np.cos(ang) * np.cos(az) * vel
+    x0[:, 4] = np.cos(ang) * np.sin(az) * vel
+    x0[:, 5] = np.sin(ang) * vel
+    x0[:, 9:12] = w_LL_B_LL
+    return x0
+
+
+def _member_array(value, n_members):
+    """Broadcast a scalar or per-member parameter to shape (N,)."""
+    return np.broadcast_to(np.asarray(value, dtype=float),
+                           (n_members,)).copy()
+
+
+def _member_vectors(value, n_members):
+    """Broadcast a 3-vector or per-member vectors to shape (N, 3)."""
+    return np.broadcast_to(np.asarray(value, dtype=float),
+                           (n_members, 3)).copy()
+
+
+class _EnsembleRHS():
+    """Vectorized right-hand side shared by the active ensemble members.
+
+    Per-member parameters are kept compacted to the members still in flight,
+    so evaluating the derivatives never needs to gather by member index.
+    """
+
+    def __init__(self, m, D, eD, S, rho_scale, wind, g_LL, cd_model='table'):
+        self.m = m[:, np.newaxis]
+        self.area = (D / 2.0)**2 * np.pi
+        self.l_ref = np.sqrt(4 * self.area / np.pi)
+        self.S = S[:, np.newaxis]
+        self.rho_scale = rho_scale
+        self.wind = wind
+        self.g = np.asarray(g_LL, dtype=float)
+
+        drag_model = get_drag_model(cd_model)
+        self.re_grid = drag_model.re_grid
+        if cd_model == 'surface':
+            # the surface evaluates every member at its own eD at once
+            self.surface = drag_model.table
+            self.dimple_index, self.dimple_weight = self.surface.locate(eD)
+            self.cd_columns = []
+        else:
+            # group members by dimple size so each Cd column is looked up once
+            self.surface = None
+            dimple_sizes, self.dimple_index = np.unique(eD,
+                                                        return_inverse=True)
+            self.dimple_weight = np.zeros(eD.shape)
+            self.cd_columns = [drag_model.column(dimple_size)
+                               for dimple_size in dimple_sizes]
+        self._group_members()
+
+    def _group_members(self):
+        """Cache which members use each Cd column."""
+        self.dimple_groups = [np.flatnonzero(self.dimple_index == i_dimple)
+                              for i_dimple in range(len(self.cd_columns))]
+
+    def select(self, keep):
+        """Keep only the members flagged by the boolean mask ``keep``."""
+        for name in ('m', 'area', 'l_ref', 'S', 'rho_scale', 'wind',
+                     'dimple_index', 'dimple_weight'):
+            setattr(self, name, getattr(self, name)[keep])
+        self._group_members()
+
+    def drag_coeff(self, reynolds_no):
+        """Interpolate Cd for every member from its Cd column."""
+        if self.surface is not None:
+            return self.surface.evaluate_located(
+                reynolds_no, self.dimple_index, self.dimple_weight)
+        if len(self.cd_columns) == 1:
+            return np.interp(reynolds_no, self.re_grid, self.cd_columns[0])
+
+        drag_coeff = np.empty_like(reynolds_no)
+        for group, cd_column in zip(self.dimple_groups, self.cd_columns):
+            if group.size:
+                drag_coeff[group] = np.interp(reynolds_no[group],
+                                              self.re_grid, cd_column)
+        return drag_coeff
+
+    def __call__(self, x):
+        """Evaluate state derivatives for the active members."""
+        wind_rel_vel = x[:, 3:6] - self.wind
+        wind_vel_mag = np.sqrt(np.einsum('ij,ij->i', wind_rel_vel,
+                                         wind_rel_vel))
+
+        temp, _, rho = getStandardAtmosphereArray(x[:, 2], units='m')
+        rho = rho * self.rho_scale
+        reynolds_no = getReynoldsNumber(wind_vel_mag, rho, self.l_ref, temp)
+        drag_coeff = self.drag_coeff(reynolds_no)
+
+        drag_scale = -0.5 * rho * wind_vel_mag * drag_coeff * self.area
+        omega = x[:, 9:12]
+        magnus_vec = np.empty_like(wind_rel_vel)
+        magnus_vec[:, 0] = (omega[:, 1] * wind_rel_vel[:, 2]
+                            - omega[:, 2] * wind_rel_vel[:, 1])
+        magnus_vec[:, 1] = (omega[:, 2] * wind_rel_vel[:, 0]
+                            - omega[:, 0] * wind_rel_vel[:, 2])
+        magnus_vec[:, 2] = (omega[:, 0] * wind_rel_vel[:, 1]
+                            - omega[:, 1] * wind_rel_vel[:, 0])
+
+        derivs = np.empty_like(x)
+        derivs[:, 0:3] = x[:, 3:6]
+        derivs[:, 3:6] = ((drag_scale[:, np.newaxis] * wind_rel_vel
+                           + self.S * magnus_vec) / self.m + self.g)
+        derivs[:, 6:9] = omega
+        derivs[:, 9:12] = 0.0  # no angular acceleration modeled
+        return derivs
+
+
+def run_ensemble(x0, m, D, eD, S, rho_scale=1.0, wind=(0.0, 0.0, 0.0),
+                 g_LL=(0.0, 0.0, -9.81), t_init=0.0, t_stop=20.0, dt=0.01,
+                 substeps=4, cd_model='table'):
+    """Integrate an ensemble of shots and return per-member QoI arrays.
+
+    All parameters may be given either as a single value shared by every
+    member or as one value per member.  Members are dropped from the
+    integration as soon as they fall below their launch height, and the
+    integration ends once every member has landed or ``t_stop`` is reached.
+
+    Parameters
+    ----------
+    x0 : array_like
+        Initial states, shape (N, 12) ordered like the :py:class:`Sim`
+        state vector.
+    m : float or array_like
+        Golf ball mass [kg].
+    D : float or array_like
+        Golf ball diameter [m].
+    eD : float or array_like
+        Dimple size ratio; with the ``table`` Cd model every value must be a
+        column of the Cd table.
+    S : float or array_like
+        Magnus Effect parameter.
+    rho_scale : float or array_like, optional
+        Density scale multiplier.
+    wind : array_like, optional
+        Constant wind vector in Local Level, shape (3,) or (N, 3).
+    g_LL : array_like, optional
+        Gravity vector in Local Level frame, shared by all members.
+    t_init, t_stop, dt : float, optional
+        Time grid, identical in meaning to the ``time`` input group.
+    substeps : int, optional
+        Number of Runge-Kutta steps taken between samples of the time grid.
+        The piecewise linear Cd table limits the accuracy of a single step
+        per sample across the drag crisis.
+    cd_model : {'table', 'surface'}, optional
+        Drag model, see :py:func:`golfball.drag.get_drag_model`.
+
+    Returns
+    -------
+    dict of numpy.ndarray
+        ``max_height``, ``max_range`` and ``time_of_flight``, each of
+        shape (N,).
+
+    """
+    x0 = np.atleast_2d(np.asarray(x0, dtype=float))
+    n_members = x0.shape[0]
+
+    rhs = _EnsembleRHS(_member_array(m, n_members),
+                       _member_array(D, n_members),
+                       _member_array(eD, n_members),
+                       _member_array(S, n_members),
+                       _member_array(rho_scale, n_members),
+                       _member_vectors(wind, n_members),
+                       g_LL, cd_model)
+
+    time = np.arange(t_init, t_stop, dt)
+
+    max_height = np.zeros(n_members)
+    max_range = np.zeros(n_members)
+    time_of_flight = np.full(n_members, time[0])
+
+    step = dt / substeps
+    members = np.arange(n_members)
+    x = x0.copy()
+    pos_init = x0[:, 0:3]
+    for time_k in time[1:]:
+        for _ in range(substeps):
+            k_1 = rhs(x)
+            k_2 = rhs(x + 0.5 * step * k_1)
+            k_3 = rhs(x + 0.5 * step * k_2)
+            k_4 = rhs(x + step * k_3)
+            x = x + step / 6.0 * (k_1 + 2.0 * k_2 + 2.0 * k_3 + k_4)
+
+        rel_pos = x[:, 0:3] - pos_init
+        above = rel_pos[:, 2] >= 0.0
+        members_above = members[above]
+        max_height[members_above] = np.maximum(max_height[members_above],
+                                               rel_pos[above, 2])
+        max_range[members_above] = np.maximum(
+            max_range[members_above],
+            np.linalg.norm(rel_pos[above], axis=1))
+        time_of_flight[members_above] = time_k
+
+        # drop the members which have landed
+        if members_above.size < members.size:
+            members = members_above
+            x = x[above]
+            pos_init = pos_init[above]
+            rhs.select(above)
+            if members.size == 0:
+                break
+
+    return {'max_height': max_height,
+            'max_range': max_range,
+            'time_of_flight': time_of_flight}
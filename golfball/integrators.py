@@ -0,0 +1,150 @@
+"""Integrator methods and their default tolerances.
+
+The ``integrator`` input group selects the method and its error control:
+
+- ``odeint``: LSODA through ``scipy.integrate.odeint``, sampled on the ``dt``
+  grid, with odeint's tolerances by default.
+- ``LSODA``, ``RK45``, ``DOP853``: ``scipy.integrate.solve_ivp`` methods,
+  with adaptive steps and scipy's tolerances by default.
+- ``RK4``: the classic fourth order Runge-Kutta method with a fixed
+  ``step`` (``dt`` by default), which takes the same steps, and the same
+  number of right-hand side evaluations, for any inputs.  Useful for
+  deterministic benchmarks; ``rtol`` and ``atol`` don't apply.
+
+``rtol`` and ``atol`` left empty (null) take the method's default from
+DEFAULT_TOLERANCES.  This module imports scipy, so :py:mod:`golfball.sim`
+only imports it when running.
+"""
+import numpy as np
+from scipy.integrate import DenseOutput, OdeSolver
+
+from .sim import ODEINT_TOL
+
+# (rtol, atol) of each method when not given
+DEFAULT_TOLERANCES = {'odeint': (ODEINT_TOL, ODEINT_TOL),
+                      'LSODA': (1e-3, 1e-6),
+                      'RK45': (1e-3, 1e-6),
+                      'DOP853': (1e-3, 1e-6),
+                      'RK4': (None, None)}
+
+
+def tolerances(integrator):
+    """Return (rtol, atol) of the ``integrator`` input group.
+
+    Empty entries take the method's default.
+    """
+    rtol, atol = DEFAULT_TOLERANCES[integrator['method']]
+    if integrator.get('rtol') is not None:
+        rtol = integrator['rtol']
+    if integrator.get('atol') is not None:
+        atol = integrator['atol']
+    return rtol, atol
+
+
+def solver_options(integrator, dt):
+    """Return the solver class and options of a solve_ivp method.
+
+    Parameters
+    ----------
+    integrator : dict
+        The ``integrator`` input group.
+    dt : float
+        Output time step, the RK4 step if ``step`` is empty.
+
+    Returns
+    -------
+    tuple
+        (OdeSolver subclass, dict of its keyword arguments).
+
+    """
+    method = integrator['method']
+    if method == 'RK4':
+        step = integrator.get('step')
+        return RK4, {'step': dt if step is None else step}
+
+    from scipy import integrate  # pylint: disable=C0415
+
+    rtol, atol = tolerances(integrator)
+    return getattr(integrate, method), {'rtol': rtol, 'atol': atol}
+
+
+class RK4(OdeSolver):
+    """Classic fourth order Runge-Kutta method with a fixed step.
+
+    Step i ends at ``t0 + i * step``, and the last step is shortened to end
+    at ``t_bound``.  The derivative at the end of a step is the first stage
+    of the next, so each step takes four right-hand side evaluations.  The
+    dense output is the cubic Hermite interpolant of the step's end points.
+
+    Parameters
+    ----------
+    fun, t0, y0, t_bound, vectorized
+        As for ``scipy.integrate.OdeSolver``.
+    step : float
+        Step size, positive.
+
+    """
+
+    def __init__(self, fun, t0, y0, t_bound, step, vectorized=False,
+                 **extraneous):
+        if extraneous:
+            raise TypeError(f'RK4 got unexpected options: {sorted(extraneous)}')
+        if not step > 0.0:
+            raise ValueError('step must be positive')
+        super().__init__(fun, t0, y0, t_bound, vectorized)
+        self.t0 = t0
+        self.h = step
+        self.n_steps = 0
+        self.f = self.fun(self.t, self.y)
+        self.y_old = None
+        self.f_old = None
+
+    def _step_impl(self):
+        t, y, k_1 = self.t, self.y, self.f
+        t_new = self.t0 + self.direction * (self.n_steps + 1) * self.h
+        # don't leave a sliver of a step before t_bound
+        if (self.direction * (t_new - self.t_bound)
+                > -1e-9 * self.h):
+            t_new = self.t_bound
+        h = t_new - t
+
+        k_2 = self.fun(t + 0.5 * h, y + 0.5 * h * k_1)
+        k_3 = self.fun(t + 0.5 * h, y + 0.5 * h * k_2)
+        k_4 = self.fun(t_new, y + h * k_3)
+        y_new = y + h / 6.0 * (k_1 + 2.0 * k_2 + 2.0 * k_3 + k_4)
+
+        self.y_old, self.f_old = y, k_1
+        self.t, self.y = t_new, y_new
+        self.f = self.fun(t_new, y_new)
+        self.n_steps += 1
+        return True, None
+
+    def _dense_output_impl(self):
+        return HermiteDenseOutput(self.t_old, self.t, self.y_old, self.f_old,
+                                  self.y, self.f)
+
+
+class HermiteDenseOutput(DenseOutput):
+    """Cubic Hermite interpolant between the states at two times."""
+
+    def __init__(self, t_old, t, y_old, f_old, y, f):
+        super().__init__(t_old, t)
+        self.h = t - t_old
+        self.y_old, self.f_old = y_old, f_old
+        self.y_new, self.f_new = y, f
+
+    def _call_impl(self, t):
+        x = (np.asarray(t) - self.t_old) / self.h
+        x_2 = x * x
+        x_3 = x_2 * x
+        coeffs = (2.0 * x_3 - 3.0 * x_2 + 1.0,
+                  (x_3 - 2.0 * x_2 + x) * self.h,
+                  3.0 * x_2 - 2.0 * x_3,
+                  (x_3 - x_2) * self.h)
+        if np.ndim(t) == 0:
+            return (coeffs[0] * self.y_old + coeffs[1] * self.f_old
+                    + coeffs[2] * self.y_new + coeffs[3] * self.f_new)
+        return (np.outer(self.y_old, coeffs[0])
+                + np.outer(self.f_old, coeffs[1])
+                + np.outer(self.y_new, coeffs[2])
+                + np.outer(self.f_new, coeffs[3]))
@@ -0,0 +1,474 @@
+"""Allocation-free right-hand side kernels for the golf ball equations.
+
+:py:class:`RHSKernel` resolves the ``params`` input group once into a flat
+float64 parameter vector plus the arrays the drag and atmosphere lookups
+need, and writes the state derivatives into one preallocated output buffer.
+The kernel itself is plain scalar arithmetic, so the same source runs as
+pure NumPy or, with the ``numba`` engine, is JIT-compiled when numba is
+installed.  Without numba the ``numba`` engine falls back to NumPy with a
+warning.
+
+The ``numba`` engine also compiles a whole fixed step RK4 integration of the
+QoIs, :py:meth:`RHSKernel.rk4_qoi`, that runs without holding the GIL, so
+threads running it use separate cores.
+"""
+
+import math
+import threading
+import warnings
+
+import numpy as np
+
+ENGINES = ('numpy', 'numba')
+
+# layout of the flat parameter vector
+P_MASS = 0
+P_AREA = 1
+P_L_REF = 2
+P_S = 3
+P_RHO_SCALE = 4
+P_G = 5          # 3 entries
+P_WIND = 8       # 3 entries
+P_TABLE_Z_MIN = 11
+P_TABLE_DZ = 12
+N_PARAMS = 13
+
+STATE_SIZE = 12
+
+EPS = np.finfo(float).eps
+
+
+def pack_params(params, atmosphere=None):
+    """Resolve the ``params`` input group into a flat parameter vector.
+
+    Parameters
+    ----------
+    params : dict
+        The ``params`` input group of :py:class:`golfball.sim.Sim`.
+    atmosphere : AtmosphereTable, optional
+        Table to take density and viscosity from; stdAtm76 if omitted.
+
+    Returns
+    -------
+    numpy.ndarray
+        Parameter vector of length N_PARAMS.
+
+    """
+    area = (params['D'] / 2.0)**2 * np.pi
+    packed = np.zeros(N_PARAMS)
+    packed[P_MASS] = params['m']
+    packed[P_AREA] = area
+    packed[P_L_REF] = np.sqrt(4 * area / np.pi)
+    packed[P_S] = params['S']
+    packed[P_RHO_SCALE] = params['rho_scale']
+    packed[P_G:P_G + 3] = params['g_LL']
+    packed[P_WIND:P_WIND + 3] = params['wind']
+    if atmosphere is not None:
+        packed[P_TABLE_Z_MIN] = atmosphere.z_min
+        packed[P_TABLE_DZ] = atmosphere.dz
+    return packed
+
+
+def pack_atmosphere(atmosphere=None):
+    """Stack the density and viscosity coefficients of an AtmosphereTable.
+
+    Returns an empty (0, 0, 4) array, meaning stdAtm76, if omitted.
+    """
+    if atmosphere is None:
+        return np.zeros((0, 0, 4))
+    return np.ascontiguousarray(np.stack([atmosphere.coeffs['density'],
+                                          atmosphere.coeffs['viscosity']]))
+
+
+# pylint: disable=C0103
+def _exact_atmosphere(height):
+    """Return (density, dynamic viscosity) at a height in meters.
+
+    Same formulas as getStandardDensity and getDynViscosity in stdAtm76, but
+    converting to geopotential height only once.
+    """
+    altitude_km = height / 1000.0
+    h = 6356.766 * altitude_km / (6356.766 + altitude_km)
+
+    if h <= 11:       # Troposphere
+        t = 288.15 - (6.5 * h)
+        p = 101325.0 * (288.15 / t) ** -5.255877
+    elif h <= 20:     # Stratosphere starts
+        t = 216.65
+        p = 22632.06 * math.exp(-0.1577 * (h - 11))
+    elif h <= 32:
+        t = 196.65 + h
+        p = 5474.889 * (216.65 / t) ** 34.16319
+    elif h <= 47:
+        t = 228.65 + 2.8 * (h - 32)
+        p = 868.0187 * (228.65 / t) ** 12.2011
+    elif h <= 51:     # Mesosphere starts
+        t = 270.65
+        p = 110.9063 * math.exp(-0.1262 * (h - 47))
+    elif h <= 71:
+        t = 270.65 - 2.8 * (h - 51)
+        p = 66.93887 * (270.65 / t) ** -12.2011
+    elif h <= 84.85:
+        t = 214.65 - 2 * (h - 71)
+        p = 3.956420 * (214.65 / t) ** -17.0816
+    else:
+        raise ValueError('geopot_height must be less than 84.85 km.')
+
+    rho = (0.0289644 * p) / (8.3144598 * t)
+    mu = 18.27 / 1e6 * (291.15 + 120.0) / (t + 120.0) * (t / 291.15)**1.5
+    return rho, mu
+
+
+def _table_atmosphere(pos, atm_coeffs):
+    """Return (density, dynamic viscosity) from AtmosphereTable coefficients.
+
+    ``pos`` is the altitude in grid spacings above the bottom of the table.
+    """
+    i_cell = min(int(pos), atm_coeffs.shape[1] - 1)
+    s = pos - i_cell
+    c = atm_coeffs[0, i_cell]
+    rho = c[0] + s * (c[1] + s * (c[2] + s * c[3]))
+    c = atm_coeffs[1, i_cell]
+    mu = c[0] + s * (c[1] + s * (c[2] + s * c[3]))
+    return rho, mu
+
+
+def _make_rhs_kernel(jit):
+    """Build the RHS kernel, compiling it and its helpers with ``jit``."""
+    exact_atmosphere = jit(_exact_atmosphere)
+    table_atmosphere = jit(_table_atmosphere)
+
+    def rhs_kernel(x, params, re_grid, cd_column, atm_coeffs, out):
+        """Write the state derivatives of x into out, and return out."""
+        u_x = x[3] - params[P_WIND]
+        u_y = x[4] - params[P_WIND + 1]
+        u_z = x[5] - params[P_WIND + 2]
+        wind_vel_mag = math.sqrt(u_x * u_x + u_y * u_y + u_z * u_z)
+
+        if atm_coeffs.shape[0] == 0:
+            rho, mu = exact_atmosphere(x[2])
+        else:
+            pos = (x[2] - params[P_TABLE_Z_MIN]) / params[P_TABLE_DZ]
+            if 0.0 <= pos <= atm_coeffs.shape[1]:
+                rho, mu = table_atmosphere(pos, atm_coeffs)
+            else:
+                rho, mu = exact_atmosphere(x[2])
+        rho *= params[P_RHO_SCALE]
+
+        reynolds_no = wind_vel_mag * rho * params[P_L_REF] / mu
+        drag_coeff = np.interp(reynolds_no, re_grid, cd_column)
+
+        # drag_vec = -q_dyn * Cd * A * u / |u|, q_dyn = 0.5 * rho * |u|**2
+        drag_scale = -0.5 * rho * wind_vel_mag * drag_coeff * params[P_AREA]
+        S = params[P_S]
+        mass = params[P_MASS]
+
+        out[0] = x[3]  # map \dot{x} to itself
+        out[1] = x[4]  # map \dot{y} to itself
+        out[2] = x[5]  # map \dot{z} to itself
+        # accel_vec = (drag_vec + S * (w x u)) / m + g
+        out[3] = ((drag_scale * u_x + S * (x[10] * u_z - x[11] * u_y))
+                  / mass + params[P_G])
+        out[4] = ((drag_scale * u_y + S * (x[11] * u_x - x[9] * u_z))
+                  / mass + params[P_G + 1])
+        out[5] = ((drag_scale * u_z + S * (x[9] * u_y - x[10] * u_x))
+                  / mass + params[P_G + 2])
+        out[6] = x[9]
+        out[7] = x[10]
+        out[8] = x[11]
+        out[9] = 0.0   # no angular acceleration modeled
+        out[10] = 0.0  # no angular acceleration modeled
+        out[11] = 0.0  # no angular acceleration modeled
+        return out
+
+    return jit(rhs_kernel)
+# pylint: enable=C0103
+
+
+def _make_rk4_qoi(jit, rhs_kernel):
+    """Build the fixed step RK4 QoI integration around an RHS kernel.
+
+    The steps, the cubic Hermite interpolant and the ground impact, apex and
+    range peak events are those of :py:class:`golfball.integrators.RK4` run
+    by :py:class:`golfball.qoi.EventQoI`; the events are located by
+    bisection instead of brentq.
+    """
+
+    def _event_value(i_event, x, x0):
+        """Return the ground, apex or range peak event function at x."""
+        if i_event == 0:
+            return x[2] - x0[2]
+        if i_event == 1:
+            return x[5]
+        return ((x[0] - x0[0]) * x[3] + (x[1] - x0[1]) * x[4]
+                + (x[2] - x0[2]) * x[5])
+
+    def _hermite(time, t_old, h, y_old, f_old, y_new, f_new, out):
+        """Write the step's interpolated state at time into out."""
+        s = (time - t_old) / h
+        s_2 = s * s
+        s_3 = s_2 * s
+        c_0 = 2.0 * s_3 - 3.0 * s_2 + 1.0
+        c_1 = (s_3 - 2.0 * s_2 + s) * h
+        c_2 = 3.0 * s_2 - 2.0 * s_3
+        c_3 = (s_3 - s_2) * h
+        for i in range(STATE_SIZE):
+            out[i] = (c_0 * y_old[i] + c_1 * f_old[i] + c_2 * y_new[i]
+                      + c_3 * f_new[i])
+        return out
+
+    def _locate(i_event, t_old, t_new, y_old, f_old, y_new, f_new, x0, buf):
+        """Return the time an event function falls through 0 in the step."""
+        h = t_new - t_old
+        low, high = t_old, t_new
+        for _ in range(200):
+            if high - low <= 4.0 * EPS * (1.0 + abs(high)):
+                break
+            mid = 0.5 * (low + high)
+            hermite(mid, t_old, h, y_old, f_old, y_new, f_new, buf)
+            if event_value(i_event, buf, x0) > 0.0:
+                low = mid
+            else:
+                high = mid
+        return 0.5 * (low + high)
+
+    event_value = jit(_event_value)
+    hermite = jit(_hermite)
+    locate = jit(_locate)
+
+    def rk4_qoi(x0, params, re_grid, cd_column, atm_coeffs, t_init, t_stop,
+                step, out):
+        """Integrate to the ground impact, or t_stop, with fixed step RK4.
+
+        Writes the max height, max range, time of flight and impact position
+        into out[0:6], and returns the number of steps.
+        """
+        y = x0.copy()
+        f = np.empty(STATE_SIZE)
+        rhs_kernel(y, params, re_grid, cd_column, atm_coeffs, f)
+        y_new = np.empty(STATE_SIZE)
+        f_new = np.empty(STATE_SIZE)
+        k_2 = np.empty(STATE_SIZE)
+        k_3 = np.empty(STATE_SIZE)
+        k_4 = np.empty(STATE_SIZE)
+        y_stage = np.empty(STATE_SIZE)
+        x_end = x0.copy()
+        g_old = np.zeros(3)
+        for i_event in range(3):
+            g_old[i_event] = event_value(i_event, y, x0)
+        t_events = np.empty(3)
+
+        max_height = 0.0
+        max_range = 0.0
+        time = t_init
+        t_end = t_init
+        n_steps = 0
+        landed = False
+        while time < t_stop and not landed:
+            t_new = t_init + (n_steps + 1) * step
+            # don't leave a sliver of a step before t_stop
+            if t_new - t_stop > -1e-9 * step:
+                t_new = t_stop
+            h = t_new - time
+
+            for i in range(STATE_SIZE):
+                y_stage[i] = y[i] + 0.5 * h * f[i]
+            rhs_kernel(y_stage, params, re_grid, cd_column, atm_coeffs, k_2)
+            for i in range(STATE_SIZE):
+                y_stage[i] = y[i] + 0.5 * h * k_2[i]
+            rhs_kernel(y_stage, params, re_grid, cd_column, atm_coeffs, k_3)
+            for i in range(STATE_SIZE):
+                y_stage[i] = y[i] + h * k_3[i]
+            rhs_kernel(y_stage, params, re_grid, cd_column, atm_coeffs, k_4)
+            for i in range(STATE_SIZE):
+                y_new[i] = y[i] + h / 6.0 * (f[i] + 2.0 * k_2[i]
+                                             + 2.0 * k_3[i] + k_4[i])
+            rhs_kernel(y_new, params, re_grid, cd_column, atm_coeffs, f_new)
+            n_steps += 1
+
+            for i_event in range(3):
+                g_new = event_value(i_event, y_new, x0)
+                t_events[i_event] = np.inf
+                if g_old[i_event] >= 0.0 >= g_new:
+                    t_events[i_event] = locate(i_event, time, t_new, y, f,
+                                               y_new, f_new, x0, y_stage)
+                g_old[i_event] = g_new
+
+            # apex and range peaks up to the impact
+            for i_event in range(1, 3):
+                if t_events[i_event] < t_events[0]:
+                    hermite(t_events[i_event], time, h, y, f, y_new, f_new,
+                            y_stage)
+                    rel_x = y_stage[0] - x0[0]
+                    rel_y = y_stage[1] - x0[1]
+                    rel_z = y_stage[2] - x0[2]
+                    max_height = max(max_height, rel_z)
+                    max_range = max(max_range, math.sqrt(
+                        rel_x * rel_x + rel_y * rel_y + rel_z * rel_z))
+
+            if t_events[0] < np.inf:
+                landed = True
+                t_end = t_events[0]
+                hermite(t_end, time, h, y, f, y_new, f_new, x_end)
+            else:
+                t_end = t_new
+                x_end[:] = y_new
+
+            y, y_new = y_new, y
+            f, f_new = f_new, f
+            time = t_new
+
+        rel_x = x_end[0] - x0[0]
+        rel_y = x_end[1] - x0[1]
+        rel_z = x_end[2] - x0[2]
+        out[0] = max(max_height, rel_z)
+        out[1] = max(max_range,
+                     math.sqrt(rel_x * rel_x + rel_y * rel_y + rel_z * rel_z))
+        out[2] = t_end
+        out[3] = x_end[0]
+        out[4] = x_end[1]
+        out[5] = x_end[2]
+        return n_steps
+
+    return jit(rk4_qoi)
+
+
+_KERNELS = {}
+_RK4_QOI = {}
+_KERNELS_LOCK = threading.Lock()
+
+
+def resolve_engine(engine='numpy'):
+    """Return the engine that runs: ``numpy`` if numba isn't installed.
+
+    Raises
+    ------
+    ValueError :
+        Raised if engine isn't one of ENGINES.
+
+    """
+    if engine not in ENGINES:
+        raise ValueError(f'engine must be one of {ENGINES}')
+
+    if engine == 'numba':
+        try:
+            import numba  # noqa: F401 pylint: disable=C0415,W0611
+        except ImportError:
+            warnings.warn('numba is not installed, falling back to the numpy'
+                          ' engine.')
+            engine = 'numpy'
+    return engine
+
+
+def _jit(engine):
+    """Return the decorator compiling the kernels of an engine."""
+    if engine == 'numba':
+        import numba  # pylint: disable=C0415
+        return numba.njit(nogil=True)
+    return lambda func: func
+
+
+def get_rhs_kernel(engine='numpy'):
+    """Return the RHS kernel function for an engine, building it once.
+
+    Parameters
+    ----------
+    engine : {'numpy', 'numba'}
+        ``numba`` JIT-compiles the kernel on first use, releasing the GIL
+        while it runs; if numba is not installed a warning is issued and the
+        NumPy kernel is returned.
+
+    """
+    engine = resolve_engine(engine)
+    with _KERNELS_LOCK:
+        if engine not in _KERNELS:
+            _KERNELS[engine] = _make_rhs_kernel(_jit(engine))
+    return _KERNELS[engine]
+
+
+def get_rk4_qoi(engine='numpy'):
+    """Return the fixed step RK4 QoI integration of an engine, built once.
+
+    See :py:func:`get_rhs_kernel` for the engines; the ``numba`` one runs
+    the whole integration without the GIL.
+    """
+    engine = resolve_engine(engine)
+    rhs_kernel = get_rhs_kernel(engine)
+    with _KERNELS_LOCK:
+        if engine not in _RK4_QOI:
+            _RK4_QOI[engine] = _make_rk4_qoi(_jit(engine), rhs_kernel)
+    return _RK4_QOI[engine]
+
+
+class RHSKernel():
+    """Right-hand side of one trajectory, with all parameters resolved once.
+
+    Parameters
+    ----------
+    params : dict
+        The ``params`` input group of :py:class:`golfball.sim.Sim`.
+    re_grid, cd_column : numpy.ndarray
+        Reynolds number grid and Cd values for the ball's dimple size.
+    atmosphere : AtmosphereTable, optional
+        Table to take density and viscosity from; stdAtm76 if omitted.
+    engine : {'numpy', 'numba'}, optional
+        Kernel implementation, see :py:func:`get_rhs_kernel`.
+
+    Calling the object as ``rhs(x, t)`` matches the ``odeint`` signature and
+    returns the same output buffer every time.  ``n_evals`` counts the
+    evaluations of both signatures.  ``engine`` is the engine that runs.
+
+    """
+
+    def __init__(self, params, re_grid, cd_column, atmosphere=None,
+                 engine='numpy'):
+        self.params = pack_params(params, atmosphere)
+        self.re_grid = np.ascontiguousarray(re_grid, dtype=float)
+        self.cd_column = np.ascontiguousarray(cd_column, dtype=float)
+        self.atm_coeffs = pack_atmosphere(atmosphere)
+        self.out = np.zeros(STATE_SIZE)
+        self.n_evals = 0
+        self.engine = resolve_engine(engine)
+        self._kernel = get_rhs_kernel(self.engine)
+
+    def __call__(self, x, _=None):
+        self.n_evals += 1
+        return self._kernel(x, self.params, self.re_grid, self.cd_column,
+                            self.atm_coeffs, self.out)
+
+    def derivatives(self, _, x):
+        """Return the derivatives in a new array, with the solve_ivp signature.
+
+        solve_ivp solvers keep references to the derivatives they are given,
+        so they must not share the output buffer.
+        """
+        self.n_evals += 1
+        return self._kernel(x, self.params, self.re_grid, self.cd_column,
+                            self.atm_coeffs, np.empty(STATE_SIZE))
+
+    def rk4_qoi(self, x0, t_init, t_stop, step):
+        """Integrate the QoIs with fixed step RK4, in one compiled call.
+
+        Parameters
+        ----------
+        x0 : numpy.ndarray
+            Initial state.
+        t_init, t_stop : float
+            Start and end times; the integration stops at the ground impact.
+        step : float
+            Step size.
+
+        Returns
+        -------
+        tuple
+            (max_height, max_range, time_of_flight, impact position, number
+            of steps).  ``n_evals`` counts the 1 + 4 per step evaluations.
+
+        """
+        out = np.empty(6)
+        n_steps = get_rk4_qoi(self.engine)(
+            np.ascontiguousarray(x0, dtype=float), self.params, self.re_grid,
+            self.cd_column, self.atm_coeffs, float(t_init), float(t_stop),
+            float(step), out)
+        self.n_evals += 1 + 4 * n_steps
+        return out[0], out[1], out[2], out[3:6], n_steps
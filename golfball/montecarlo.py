@@ -0,0 +1,624 @@
+"""Monte Carlo dispersion analyses with bounded-memory, mergeable statistics.
+
+A dispersion analysis draws some of the :py:class:`golfball.sim.Sim` inputs
+(launch speed, angle, spin, wind, ...) from distributions, runs the QoIs of
+every sample, and summarizes them.  The samples are run in chunks of
+``chunk_size`` over a process pool, and no chunk's samples outlive it: each
+chunk is reduced to a :py:class:`DispersionStats` of
+
+- the count, mean, covariance, minimum and maximum of the sampled inputs, the
+  QoIs and the impact point (Welford's updates, merged as by Chan et al.),
+- a :py:class:`QuantileSketch` per column, with quantiles to a relative
+  accuracy, and
+- a 2D histogram of the impact points (``impact_x``, ``impact_y``),
+
+which are merged into the totals in chunk order.  Chunk i draws its samples
+from its own random stream, ``SeedSequence(seed, spawn_key=(i,))``, so for a
+seed the results don't depend on the number of workers.
+
+The distributions and settings are the ``montecarlo`` group of the inputs
+YAML; the other groups are the base inputs::
+
+    montecarlo:
+      samples: 100000
+      seed: 1
+      chunk_size: 1000
+      distributions:
+        vel_mag: {dist: normal, std: 1.5}
+        angle: {dist: uniform, low: 30.0, high: 40.0}
+        wind[1]: {dist: normal, mean: 0.0, std: 3.0}
+        rho_scale: {dist: lognormal, sigma: 0.02}
+
+Distributions and their parameters are in DISTRIBUTIONS; a missing mean, mode
+or median is the base input's value.  Impact points need a method that stops
+at the ground impact, not ``odeint``.
+
+``gball-mc`` is the command line interface.
+"""
+# pylint: disable=C0415
+import sys
+import os
+import argparse
+import math
+
+import numpy as np
+
+from .sim import Sim
+from .sweep import (QOI_COLUMNS, _plain, apply_overrides, base_inputs,
+                    input_paths, warm_up)
+
+# parameters of each distribution; the first can default to the base value
+DISTRIBUTIONS = {'normal': ('mean', 'std'),
+                 'uniform': ('low', 'high'),
+                 'triangular': ('mode', 'low', 'high'),
+                 'lognormal': ('median', 'sigma')}
+
+DEFAULT_SETTINGS = {'samples': 10000,
+                    'seed': None,
+                    'chunk_size': 1000,
+                    'landing_bins': None,
+                    'distributions': {}}
+
+IMPACT_COLUMNS = ['impact_x', 'impact_y']
+
+# quantiles of the summary table
+SUMMARY_QUANTILES = (0.05, 0.5, 0.95)
+
+_WORKER = None
+
+
+def main(arg_list=None):
+    """Run a dispersion analysis from the command line and print a summary.
+
+    Parameters
+    ----------
+    arg_list : list of str, optional
+        List of individual commandline arguments to invoke main with. If
+        omitted, the actual commandline arguments will be used.
+
+    """
+    if arg_list is None:
+        arg_list = sys.argv[1:]
+    args = _make_parser().parse_args(arg_list)
+
+    inputs, settings = read_montecarlo_inputs(args.in_filename)
+    for name in ('samples', 'seed', 'chunk_size'):
+        if getattr(args, name) is not None:
+            settings[name] = getattr(args, name)
+    stats = run_montecarlo(inputs, settings['distributions'],
+                           settings['samples'], seed=settings['seed'],
+                           chunk_size=settings['chunk_size'],
+                           landing_bins=settings['landing_bins'],
+                           max_workers=args.jobs)
+    if args.out_filename is not None:
+        stats.save(args.out_filename)
+
+    print(f'{stats.count} samples, seed {stats.seed}')
+    print(stats.summary().to_string(float_format=lambda val: f'{val:.6g}'))
+
+
+def _make_parser():
+    """Define command line interface (CLI) argument parser."""
+    parser = argparse.ArgumentParser(
+        prog='gball-mc',
+        description="Monte Carlo dispersion analysis of the golfball QoIs")
+
+    parser.add_argument("--in_filename", '-i', required=True,
+                        help="filename of YAML w/ the base inputs and the"
+                        " montecarlo group")
+    parser.add_argument("--samples", '-n', default=None, type=int,
+                        help="number of samples.  default: specified by"
+                        " input file")
+    parser.add_argument("--seed", default=None, type=int,
+                        help="random seed.  default: specified by input file,"
+                        " or a new one")
+    parser.add_argument("--chunk_size", default=None, type=int,
+                        help="samples per chunk.  default: specified by input"
+                        " file")
+    parser.add_argument("--jobs", '-j', default=None, type=int,
+                        help="number of worker processes.  default: the"
+                        " number of CPUs")
+    parser.add_argument("--out_filename", '-o', default=None,
+                        help="save the statistics to this .npz file")
+    return parser
+
+
+def read_montecarlo_inputs(filename):
+    """Return the base inputs and the ``montecarlo`` settings of a YAML file.
+
+    Missing settings take their DEFAULT_SETTINGS value.
+    """
+    if not os.path.isfile(filename):
+        raise FileNotFoundError(f'{filename}')
+    from ruamel.yaml import YAML
+    with open(filename, 'r', encoding='utf8') as inputfile:
+        inputs = _plain(YAML(typ='safe').load(inputfile))
+    settings = {**DEFAULT_SETTINGS, **(inputs.pop('montecarlo', None) or {})}
+    unknown = sorted(set(settings) - set(DEFAULT_SETTINGS))
+    if unknown:
+        raise ValueError(f'unknown montecarlo settings: {unknown}')
+    return base_inputs(inputs), settings
+
+
+def check_distributions(distributions, inputs):
+    """Return the distributions with their defaults filled in.
+
+    Parameters
+    ----------
+    distributions : dict
+        ``{'dist': name, parameter: value, ...}`` by input name, named as
+        the columns of a sweep design.
+    inputs : dict
+        Base input groups.
+
+    Returns
+    -------
+    dict
+        (dist, parameter tuple) by input name, parameters in the order of
+        DISTRIBUTIONS.
+
+    Raises
+    ------
+    ValueError :
+        Raised for unknown inputs, distributions or parameters.
+
+    """
+    if not distributions:
+        raise ValueError('no distributions to sample')
+    paths = input_paths(inputs, distributions)
+    checked = {}
+    for name, spec in distributions.items():
+        spec = dict(spec)
+        dist = spec.pop('dist', None)
+        if dist not in DISTRIBUTIONS:
+            raise ValueError(f'{name}: dist must be one of'
+                             f' {list(DISTRIBUTIONS)}')
+        group, input_name, index = paths[name]
+        base = inputs[group][input_name]
+        if index is not None:
+            base = base[index]
+        spec.setdefault(DISTRIBUTIONS[dist][0], base)
+        unknown = sorted(set(spec) - set(DISTRIBUTIONS[dist]))
+        missing = [param for param in DISTRIBUTIONS[dist]
+                   if param not in spec]
+        if unknown or missing:
+            raise ValueError(f'{name}: {dist} takes'
+                             f' {list(DISTRIBUTIONS[dist])}')
+        checked[name] = (dist, tuple(float(spec[param])
+                                     for param in DISTRIBUTIONS[dist]))
+    return checked
+
+
+def chunk_rng(seed, chunk_id):
+    """Return the random generator of one chunk of samples."""
+    return np.random.default_rng(np.random.SeedSequence(seed,
+                                                        spawn_key=(chunk_id,)))
+
+
+def sample_distributions(distributions, n_samples, rng):
+    """Return samples of checked distributions, an array by input name."""
+    samples = {}
+    for name, (dist, params) in distributions.items():
+        if dist == 'normal':
+            samples[name] = rng.normal(params[0], params[1], n_samples)
+        elif dist == 'uniform':
+            samples[name] = rng.uniform(params[0], params[1], n_samples)
+        elif dist == 'triangular':
+            samples[name] = rng.triangular(params[1], params[0], params[2],
+                                           n_samples)
+        else:
+            samples[name] = rng.lognormal(math.log(params[0]), params[1],
+                                          n_samples)
+    return samples
+
+
+class RunningMoments():
+    """Count, mean, co-moments, minimum and maximum of a stream of vectors.
+
+    Parameters
+    ----------
+    n_columns : int
+        Length of the vectors.
+
+    Batches are reduced exactly, then merged in with the pairwise update of
+    Chan, Golub and LeVeque, which is Welford's update for a batch of one.
+
+    """
+
+    def __init__(self, n_columns):
+        self.count = 0
+        self.mean = np.zeros(n_columns)
+        self.comoment = np.zeros((n_columns, n_columns))
+        self.minimum = np.full(n_columns, np.inf)
+        self.maximum = np.full(n_columns, -np.inf)
+
+    def update(self, values):
+        """Take in a batch of vectors, shape (n, n_columns)."""
+        values = np.atleast_2d(values)
+        if not values.shape[0]:
+            return
+        batch = RunningMoments(values.shape[1])
+        batch.count = values.shape[0]
+        batch.mean = values.mean(axis=0)
+        centered = values - batch.mean
+        batch.comoment = centered.T @ centered
+        batch.minimum = values.min(axis=0)
+        batch.maximum = values.max(axis=0)
+        self.merge(batch)
+
+    def merge(self, other):
+        """Merge in the moments of another stream."""
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.comoment = (self.comoment + other.comoment
+                         + np.outer(delta, delta)
+                         * (self.count * other.count / count))
+        self.mean = self.mean + delta * (other.count / count)
+        self.count = count
+        self.minimum = np.minimum(self.minimum, other.minimum)
+        self.maximum = np.maximum(self.maximum, other.maximum)
+
+    @property
+    def covariance(self):
+        """Sample covariance matrix."""
+        return self.comoment / max(self.count - 1, 1)
+
+    @property
+    def std(self):
+        """Sample standard deviations."""
+        return np.sqrt(np.diag(self.covariance))
+
+
+class QuantileSketch():
+    """Mergeable quantile sketch with a relative accuracy (DDSketch).
+
+    Parameters
+    ----------
+    relative_accuracy : float, optional
+        Quantiles are within this relative error of a sample at the exact
+        rank.
+    min_value : float, optional
+        Values smaller in magnitude count as 0.
+
+    Values are counted in logarithmic buckets, one store each for positive
+    and negative values, so memory grows with the log of the range of the
+    values, not with their number, and merging adds the counts.
+
+    """
+
+    def __init__(self, relative_accuracy=0.005, min_value=1e-9):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1.0 + relative_accuracy) / (1.0 - relative_accuracy)
+        self.min_value = min_value
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _add(self, store, magnitudes):
+        """Count magnitudes into their buckets of a store."""
+        keys, counts = np.unique(
+            np.ceil(np.log(magnitudes) / math.log(self.gamma)).astype(int),
+            return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def update(self, values):
+        """Take in a batch of values."""
+        values = np.asarray(values, dtype=float).ravel()
+        self.count += values.size
+        self._add(self.positive, values[values > self.min_value])
+        self._add(self.negative, -values[values < -self.min_value])
+        self.zero_count += int(np.count_nonzero(
+            np.abs(values) <= self.min_value))
+
+    def merge(self, other):
+        """Merge in the counts of a sketch with the same accuracy."""
+        if other.gamma != self.gamma or other.min_value != self.min_value:
+            raise ValueError('sketches of different accuracies')
+        for store, other_store in ((self.positive, other.positive),
+                                   (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def _value(self, key):
+        """Return the value representing a bucket."""
+        return 2.0 * self.gamma**key / (self.gamma + 1.0)
+
+    def quantile(self, q):
+        """Return the q quantile, 0 <= q <= 1, or nan if empty."""
+        if not self.count:
+            return np.nan
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+    def to_arrays(self):
+        """Return the buckets as (keys, counts) arrays, negatives first."""
+        keys = sorted(self.negative)
+        return (np.array([-key for key in keys] + sorted(self.positive)
+                         + [0], dtype=np.int64),
+                np.array([self.negative[key] for key in keys]
+                         + [self.positive[key]
+                            for key in sorted(self.positive)]
+                         + [self.zero_count], dtype=np.int64),
+                len(keys))
+
+    @classmethod
+    def from_arrays(cls, keys, counts, n_negative, relative_accuracy,
+                    min_value):
+        """Return the sketch of :py:meth:`to_arrays` arrays."""
+        sketch = cls(relative_accuracy, min_value)
+        keys, counts = keys.tolist(), counts.tolist()
+        sketch.negative = {-key: count for key, count
+                           in zip(keys[:n_negative], counts[:n_negative])}
+        sketch.positive = dict(zip(keys[n_negative:-1],
+                                   counts[n_negative:-1]))
+        sketch.zero_count = counts[-1]
+        sketch.count = sum(counts)
+        return sketch
+
+
+class DispersionStats():
+    """Mergeable statistics of a dispersion analysis.
+
+    Parameters
+    ----------
+    names : list of str
+        Columns: the sampled inputs, then the QoIs, then the impact point.
+    landing_edges : tuple of numpy.ndarray, optional
+        x and y bin edges of the impact point histogram; no histogram if
+        omitted.
+    relative_accuracy : float, optional
+        Of the quantile sketches.
+    seed : int, optional
+        Seed the samples were drawn with.
+
+    """
+
+    def __init__(self, names, landing_edges=None, relative_accuracy=0.005,
+                 seed=None):
+        self.names = list(names)
+        self.seed = seed
+        self.moments = RunningMoments(len(self.names))
+        self.sketches = {name: QuantileSketch(relative_accuracy)
+                         for name in self.names}
+        self.landing_edges = landing_edges
+        self.landing_counts = None
+        if landing_edges is not None:
+            self.landing_counts = np.zeros((len(landing_edges[0]) - 1,
+                                            len(landing_edges[1]) - 1),
+                                           dtype=np.int64)
+
+    @property
+    def count(self):
+        """Number of samples."""
+        return self.moments.count
+
+    def update(self, values):
+        """Take in a batch of samples, shape (n, len(names))."""
+        values = np.atleast_2d(values)
+        self.moments.update(values)
+        for i_column, name in enumerate(self.names):
+            self.sketches[name].update(values[:, i_column])
+        if self.landing_counts is not None:
+            i_x = self.names.index('impact_x')
+            counts, _, _ = np.histogram2d(values[:, i_x], values[:, i_x + 1],
+                                          bins=self.landing_edges)
+            self.landing_counts += counts.astype(np.int64)
+
+    def merge(self, other):
+        """Merge in the statistics of other samples of the same columns."""
+        if other.names != self.names:
+            raise ValueError('statistics of different columns')
+        self.moments.merge(other.moments)
+        for name in self.names:
+            self.sketches[name].merge(other.sketches[name])
+        if self.landing_counts is not None:
+            self.landing_counts += other.landing_counts
+
+    def quantile(self, name, q):
+        """Return the q quantile of a column."""
+        return self.sketches[name].quantile(q)
+
+    def covariance(self):
+        """Return the covariance matrix as a DataFrame."""
+        import pandas as pd
+
+        return pd.DataFrame(self.moments.covariance, index=self.names,
+                            columns=self.names)
+
+    def summary(self, quantiles=SUMMARY_QUANTILES):
+        """Return the mean, std, extremes and quantiles of every column."""
+        import pandas as pd
+
+        table = {'mean': self.moments.mean, 'std': self.moments.std,
+                 'min': self.moments.minimum}
+        for q in quantiles:
+            table[f'q{q:g}'] = [self.quantile(name, q) for name in self.names]
+        table['max'] = self.moments.maximum
+        return pd.DataFrame(table, index=self.names)
+
+    def save(self, filename):
+        """Save the statistics to a compressed npz file."""
+        sketches = {}
+        for i_column, name in enumerate(self.names):
+            keys, counts, n_negative = self.sketches[name].to_arrays()
+            sketches[f'sketch_keys_{i_column}'] = keys
+            sketches[f'sketch_counts_{i_column}'] = counts
+            sketches[f'sketch_negative_{i_column}'] = n_negative
+        landing = {}
+        if self.landing_counts is not None:
+            landing = {'landing_x': self.landing_edges[0],
+                       'landing_y': self.landing_edges[1],
+                       'landing_counts': self.landing_counts}
+        sketch = self.sketches[self.names[0]]
+        np.savez_compressed(
+            filename, names=np.array(self.names),
+            # a decimal string: seeds can be 128-bit entropy
+            seed=np.array('' if self.seed is None else str(self.seed)),
+            count=self.moments.count, mean=self.moments.mean,
+            comoment=self.moments.comoment, minimum=self.moments.minimum,
+            maximum=self.moments.maximum,
+            relative_accuracy=sketch.relative_accuracy,
+            min_value=sketch.min_value, **landing, **sketches)
+
+    @classmethod
+    def load(cls, filename):
+        """Load statistics saved by :py:meth:`save`."""
+        with np.load(filename) as saved:
+            landing_edges = None
+            if 'landing_counts' in saved.files:
+                landing_edges = (saved['landing_x'], saved['landing_y'])
+            seed = str(saved['seed'])
+            stats = cls(saved['names'].tolist(), landing_edges,
+                        float(saved['relative_accuracy']),
+                        int(seed) if seed else None)
+            if landing_edges is not None:
+                stats.landing_counts = saved['landing_counts']
+            stats.moments.count = int(saved['count'])
+            stats.moments.mean = saved['mean']
+            stats.moments.comoment = saved['comoment']
+            stats.moments.minimum = saved['minimum']
+            stats.moments.maximum = saved['maximum']
+            for i_column, name in enumerate(stats.names):
+                stats.sketches[name] = QuantileSketch.from_arrays(
+                    saved[f'sketch_keys_{i_column}'],
+                    saved[f'sketch_counts_{i_column}'],
+                    int(saved[f'sketch_negative_{i_column}']),
+                    float(saved['relative_accuracy']),
+                    float(saved['min_value']))
+        return stats
+
+
+def _init_worker(settings):
+    """Keep the analysis settings and warm up the lookups of the runs."""
+    global _WORKER  # pylint: disable=W0603
+    _WORKER = settings
+    warm_up(settings['inputs'])
+
+
+def _run_chunk(chunk_id, n_samples):
+    """Run one chunk of samples and return their DispersionStats."""
+    settings = _WORKER
+    inputs, paths = settings['inputs'], settings['paths']
+    samples = sample_distributions(settings['distributions'], n_samples,
+                                   chunk_rng(settings['seed'], chunk_id))
+    names = list(samples)
+    values = np.empty((n_samples, len(settings['names'])))
+    for i_sample in range(n_samples):
+        overrides = {name: float(samples[name][i_sample]) for name in names}
+        # the base inputs are checked, and the overrides are numbers
+        sim = Sim(inputs=apply_overrides(inputs, overrides, paths))
+        qoi = sim.run(qoi_only=True)
+        row = list(overrides.values()) + [qoi[name] for name in QOI_COLUMNS]
+        if settings['impact']:
+            row += sim.impact['pos_LL'][0:2]
+        values[i_sample] = row
+    stats = DispersionStats(settings['names'], settings['landing_edges'],
+                            settings['relative_accuracy'])
+    stats.update(values)
+    return stats
+
+
+def run_montecarlo(inputs, distributions, n_samples, seed=None,
+                   chunk_size=1000, landing_bins=None,
+                   relative_accuracy=0.005, max_workers=None):
+    """Run a dispersion analysis and return its statistics.
+
+    Parameters
+    ----------
+    inputs : str or dict or None
+        Base inputs: an input YAML filename, input groups, or None for the
+        default inputs.
+    distributions : dict
+        Distribution specs by input name, see :py:func:`check_distributions`.
+    n_samples : int
+        Number of samples.
+    seed : int, optional
+        Seed of the samples; a new one, kept in the result, if omitted.
+    chunk_size : int, optional
+        Samples per chunk.  Results depend on it, but not on max_workers.
+    landing_bins : list, optional
+        ``[[x_low, x_high, n_x], [y_low, y_high, n_y]]`` bins of the impact
+        point histogram.  By default, 100 x 100 bins over a square a quarter
+        of the nominal range from the nominal impact point.
+    relative_accuracy : float, optional
+        Of the quantile sketches.
+    max_workers : int, optional
+        Number of worker processes; the number of CPUs if omitted.  With 1,
+        the samples are run in this process.
+
+    Returns
+    -------
+    DispersionStats
+        Statistics of the sampled inputs, the QoIs and, unless the method is
+        ``odeint``, the impact point.
+
+    """
+    inputs = base_inputs(inputs)
+    distributions = check_distributions(distributions, inputs)
+    if chunk_size < 1 or n_samples < 1:
+        raise ValueError('n_samples and chunk_size must be at least 1')
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+
+    impact = inputs['integrator']['method'] != 'odeint'
+    names = list(distributions) + QOI_COLUMNS
+    landing_edges = None
+    if impact:
+        names += IMPACT_COLUMNS
+        if landing_bins is None:
+            nominal = Sim.from_dict(inputs)
+            half_width = 0.25 * nominal.run(qoi_only=True)['max_range']
+            center = nominal.impact['pos_LL']
+            landing_bins = [[center[i] - half_width, center[i] + half_width,
+                             100] for i in range(2)]
+        landing_edges = tuple(np.linspace(low, high, int(n_bins) + 1)
+                              for low, high, n_bins in landing_bins)
+
+    settings = {'inputs': inputs,
+                'paths': input_paths(inputs, distributions),
+                'distributions': distributions, 'seed': seed,
+                'names': names, 'impact': impact,
+                'landing_edges': landing_edges,
+                'relative_accuracy': relative_accuracy}
+    chunk_ids = range(-(-n_samples // chunk_size))
+    sizes = [min(chunk_size, n_samples - chunk_id * chunk_size)
+             for chunk_id in chunk_ids]
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(sizes)))
+
+    stats = DispersionStats(names, landing_edges, relative_accuracy, seed)
+    if max_workers == 1:
+        _init_worker(settings)
+        for chunk_id, size in zip(chunk_ids, sizes):
+            stats.merge(_run_chunk(chunk_id, size))
+        return stats
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             initializer=_init_worker,
+                             initargs=(settings,)) as executor:
+        # merged in chunk order, so the totals don't depend on the workers
+        for chunk_stats in executor.map(_run_chunk, chunk_ids, sizes):
+            stats.merge(chunk_stats)
+    return stats
@@ -0,0 +1,301 @@
+"""Multilevel Monte Carlo estimates of the mean of a QoI or of a probability.
+
+A plain Monte Carlo estimate of, say, the mean carry under dispersed launch
+conditions needs many runs at the fidelity the answer is wanted at.  The sim
+has cheaper fidelities that agree closely with it: the RK4 method at a long
+step, or the table atmosphere.  A multilevel estimate writes the mean of the
+finest level L as the telescoping sum
+
+    E[Q_L] = E[Q_0] + sum over l of E[Q_l - Q_(l-1)]
+
+and estimates each term from its own independent samples; the two runs of a
+correction term share their inputs.  Q_0 is cheap, and the corrections have
+small variances, so few samples of the expensive levels are needed.
+
+:py:func:`run_multilevel` runs a pilot of every level, then allocates the
+samples that reach a target standard error at the least cost from the
+measured variance V_l and CPU time C_l of each level,
+
+    N_l = sqrt(V_l / C_l) * sum over k of sqrt(V_k C_k) / target_std**2
+
+and repeats with the updated variances until no level needs more.  The
+finest level is the base inputs; the coarser levels are input groups applied
+over them, by default those of DEFAULT_LEVELS.  Samples are drawn as for
+:py:mod:`golfball.montecarlo`, chunk c of level l from
+``SeedSequence(seed, spawn_key=(l, c))``, and chunks run over a process pool.
+"""
+# pylint: disable=C0415
+import os
+import time
+import statistics
+
+import numpy as np
+
+from .montecarlo import (RunningMoments, check_distributions,
+                         sample_distributions)
+from .sim import Sim
+from .sweep import (QOI_COLUMNS, apply_overrides, base_inputs, input_paths,
+                    warm_up)
+
+# coarse levels, coarsest first, over the base inputs as the finest level
+DEFAULT_LEVELS = [
+    {'integrator': {'method': 'RK4', 'step': 0.5},
+     'config': {'atmosphere': 'table'}},
+    {'integrator': {'method': 'RK4', 'step': 0.1},
+     'config': {'atmosphere': 'table'}},
+]
+
+# rounds of sample allocation, after the pilot
+MAX_ROUNDS = 10
+
+_WORKER = None
+
+
+class MultilevelEstimate():
+    """Multilevel estimate of a mean, with its variance and cost.
+
+    Attributes
+    ----------
+    estimate : float
+        Estimate of the mean of the QoI, or of the probability that it is
+        below the threshold.
+    variance : float
+        Variance of the estimate, the sum of V_l / N_l.
+    levels : pandas.DataFrame
+        ``n_samples``, ``mean`` and ``var`` of the term of each level, the
+        ``cost`` of a sample in CPU seconds, and the ``fine_var`` of the
+        level's own QoI.
+    cpu_time : float
+        CPU seconds of all the runs.
+    mc_cpu_time : float
+        Estimated CPU seconds of a plain Monte Carlo estimate of the finest
+        level with the same variance.
+
+    """
+
+    def __init__(self, qoi, threshold, seed, moments, costs):
+        import pandas as pd
+
+        self.qoi = qoi
+        self.threshold = threshold
+        self.seed = seed
+        counts = np.array([level.count for level in moments])
+        variances = np.array([level.covariance[0, 0] for level in moments])
+        self.levels = pd.DataFrame({
+            'n_samples': counts,
+            'mean': [level.mean[0] for level in moments],
+            'var': variances,
+            'cost': costs['pair'] / counts,
+            'fine_var': [level.covariance[1, 1] for level in moments]})
+        self.levels.index.name = 'level'
+        self.estimate = float(self.levels['mean'].sum())
+        self.variance = float(np.sum(variances / counts))
+        self.cpu_time = float(costs['pair'].sum())
+        fine_cost = costs['fine'][-1] / counts[-1]
+        self.mc_cpu_time = float(self.levels['fine_var'].iloc[-1] * fine_cost
+                                 / max(self.variance, np.finfo(float).tiny))
+
+    @property
+    def std_error(self):
+        """Standard error of the estimate."""
+        return self.variance**0.5
+
+    def confidence_interval(self, confidence=0.95):
+        """Return the (low, high) normal confidence interval of the mean."""
+        half_width = (statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+                      * self.std_error)
+        return (self.estimate - half_width, self.estimate + half_width)
+
+
+def level_inputs(inputs, levels=None):
+    """Return the checked inputs of every level, coarsest first.
+
+    Parameters
+    ----------
+    inputs : str or dict or None
+        Base inputs, the finest level: an input YAML filename, input groups,
+        or None for the default inputs.
+    levels : list of dict, optional
+        Input groups of the coarser levels, coarsest first, applied over the
+        base inputs.  DEFAULT_LEVELS if omitted.
+
+    """
+    inputs = base_inputs(inputs)
+    if levels is None:
+        levels = DEFAULT_LEVELS
+    all_inputs = []
+    for level in levels:
+        merged = {group: {**values, **level.get(group, {})}
+                  for group, values in inputs.items()}
+        all_inputs.append(base_inputs(merged))
+    return all_inputs + [inputs]
+
+
+def _init_worker(settings):
+    """Keep the estimate's settings and warm up the lookups of every level."""
+    global _WORKER  # pylint: disable=W0603
+    _WORKER = settings
+    for inputs in settings['inputs']:
+        warm_up(inputs)
+
+
+def _run_qoi(inputs, overrides, paths, qoi, threshold):
+    """Run one sample of one level, and return its quantity and CPU time."""
+    start = time.process_time()
+    value = Sim(inputs=apply_overrides(inputs, overrides, paths)).run(
+        qoi_only=True)[qoi]
+    if threshold is not None:
+        value = float(value < threshold)
+    return value, time.process_time() - start
+
+
+def _run_chunk(level, chunk_id, n_samples):
+    """Run one chunk of a level's samples.
+
+    Returns the (term, fine QoI) rows, and the CPU seconds of the fine and
+    the coarse runs.
+    """
+    settings = _WORKER
+    rng = np.random.default_rng(np.random.SeedSequence(
+        settings['seed'], spawn_key=(level, chunk_id)))
+    samples = sample_distributions(settings['distributions'], n_samples, rng)
+    args = (settings['paths'], settings['qoi'], settings['threshold'])
+    values = np.empty((n_samples, 2))
+    fine_time = coarse_time = 0.0
+    for i_sample in range(n_samples):
+        overrides = {name: float(value[i_sample])
+                     for name, value in samples.items()}
+        fine, cpu_time = _run_qoi(settings['inputs'][level], overrides, *args)
+        fine_time += cpu_time
+        coarse = 0.0
+        if level:
+            coarse, cpu_time = _run_qoi(settings['inputs'][level - 1],
+                                        overrides, *args)
+            coarse_time += cpu_time
+        values[i_sample] = (fine - coarse, fine)
+    return values, fine_time, coarse_time
+
+
+def allocate(variances, costs, target_std):
+    """Return the samples per level that reach target_std at least cost."""
+    variances = np.maximum(np.asarray(variances, dtype=float), 0.0)
+    costs = np.asarray(costs, dtype=float)
+    scale = np.sum(np.sqrt(variances * costs)) / target_std**2
+    return np.ceil(scale * np.sqrt(variances / costs)).astype(int)
+
+
+def run_multilevel(inputs, distributions, target_std, qoi='max_range',
+                   threshold=None, levels=None, n_pilot=64, chunk_size=64,
+                   seed=None, max_workers=None, max_samples=1000000):
+    """Estimate the mean of a QoI, or a probability, by multilevel sampling.
+
+    Parameters
+    ----------
+    inputs : str or dict or None
+        Base inputs, the finest level: an input YAML filename, input groups,
+        or None for the default inputs.
+    distributions : dict
+        Distribution specs by input name, see
+        :py:func:`golfball.montecarlo.check_distributions`.
+    target_std : float
+        Standard error to reach.
+    qoi : str, optional
+        One of QOI_COLUMNS.
+    threshold : float, optional
+        If given, estimate the probability that the QoI is below it instead
+        of its mean.
+    levels : list of dict, optional
+        Input groups of the coarser levels, coarsest first.  DEFAULT_LEVELS
+        if omitted; an empty list is plain Monte Carlo.
+    n_pilot : int, optional
+        Samples of every level before the first allocation, at least 2.
+    chunk_size : int, optional
+        Samples per chunk.  The pilot samples depend on it, but not on
+        max_workers.  The samples allocated after the pilot follow the
+        measured CPU times, so the final estimate of a seed can differ
+        between calls.
+    seed : int, optional
+        Seed of the samples; a new one, kept in the result, if omitted.
+    max_workers : int, optional
+        Number of worker processes; the number of CPUs if omitted.  With 1,
+        the samples are run in this process.
+    max_samples : int, optional
+        Most samples of any one level.
+
+    Returns
+    -------
+    MultilevelEstimate
+
+    Raises
+    ------
+    ValueError :
+        Raised for an unknown qoi, invalid inputs or levels, a target_std
+        that isn't positive, or fewer than 2 pilot samples.
+
+    """
+    if qoi not in QOI_COLUMNS:
+        raise ValueError(f'qoi must be one of {QOI_COLUMNS}')
+    if not target_std > 0.0:
+        raise ValueError('target_std must be > 0')
+    if n_pilot < 2:
+        raise ValueError('n_pilot must be at least 2, to measure variances')
+    all_inputs = level_inputs(inputs, levels)
+    distributions = check_distributions(distributions, all_inputs[-1])
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    settings = {'inputs': all_inputs,
+                'paths': input_paths(all_inputs[-1], distributions),
+                'distributions': distributions, 'seed': seed, 'qoi': qoi,
+                'threshold': threshold}
+
+    n_levels = len(all_inputs)
+    moments = [RunningMoments(2) for _ in range(n_levels)]
+    costs = {'fine': np.zeros(n_levels), 'pair': np.zeros(n_levels)}
+    next_chunk = [0] * n_levels
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    executor = None
+    if max_workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(max_workers=max_workers,
+                                       initializer=_init_worker,
+                                       initargs=(settings,))
+    else:
+        _init_worker(settings)
+
+    def run_samples(extra):
+        """Run extra samples of each level, in chunks, and merge them."""
+        chunks = []
+        for level, n_extra in enumerate(extra):
+            for start in range(0, n_extra, chunk_size):
+                chunks.append((level, next_chunk[level],
+                               min(chunk_size, n_extra - start)))
+                next_chunk[level] += 1
+        run = executor.map if executor is not None else map
+        # merged in chunk order, so the totals don't depend on the workers
+        for (level, _, _), (values, fine_time, coarse_time) in zip(
+                chunks, run(_run_chunk, *zip(*chunks))):
+            moments[level].update(values)
+            costs['fine'][level] += fine_time
+            costs['pair'][level] += fine_time + coarse_time
+
+    try:
+        run_samples([n_pilot] * n_levels)
+        for _ in range(MAX_ROUNDS):
+            counts = np.array([level.count for level in moments])
+            variances = [level.covariance[0, 0] for level in moments]
+            if np.sum(variances / counts) <= target_std**2:
+                break
+            wanted = np.minimum(allocate(variances, costs['pair'] / counts,
+                                         target_std), max_samples)
+            extra = np.maximum(wanted - counts, 0)
+            if not extra.any():
+                break
+            run_samples(extra.tolist())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return MultilevelEstimate(qoi, threshold, seed, moments, costs)
@@ -0,0 +1,317 @@
+"""Optimize a QoI over chosen inputs, with parallel, memoized evaluations.
+
+:py:func:`optimize` finds the inputs that maximize (or minimize) one QoI,
+``max_range`` by default, within bounds, e.g. the launch angle and backspin
+that carry furthest for one ball and atmosphere.  It runs scipy's
+``differential_evolution``, which asks for a whole population of candidates
+at a time, and a :py:class:`BatchObjective` runs each population over a
+pool of worker processes that stay up for the whole optimization.
+
+The candidates are QoI-only runs (see ``qoi_only``) set up from the inputs
+in memory, as in :py:mod:`golfball.sweep`: nothing is read or written per
+run.  Every result is memoized; given a ``resolution`` per input, the
+candidates are snapped to multiples of it first, so that nearby candidates
+share one run.  The convergence history, the number of candidates asked for
+and of sims actually run come back with the optimum.
+
+Bounds are named like the columns of a sweep design (``angle``,
+``w_LL_B_LL[1]``, ...).  The ``odeint`` method's QoIs step with the ``dt``
+grid; a solve_ivp method gives a smooth QoI, which converges better.
+
+``gball-optimize`` is the command line interface.
+"""
+# pylint: disable=C0415
+import sys
+import os
+import argparse
+from collections import namedtuple
+from itertools import repeat
+
+import numpy as np
+
+from .sim import Sim
+from .sweep import (QOI_COLUMNS, apply_overrides, base_inputs, input_paths,
+                    warm_up, write_results)
+
+OptimizationResult = namedtuple(
+    'OptimizationResult',
+    ['x', 'value', 'qoi', 'n_evals', 'n_runs', 'history', 'success',
+     'message'])
+
+
+def main(arg_list=None):
+    """Optimize a QoI from the command line and print the optimum.
+
+    Parameters
+    ----------
+    arg_list : list of str, optional
+        List of individual commandline arguments to invoke main with. If
+        omitted, the actual commandline arguments will be used.
+
+    """
+    if arg_list is None:
+        arg_list = sys.argv[1:]
+    parser = _make_parser()
+    args = parser.parse_args(arg_list)
+
+    bounds, resolution = {}, {}
+    for vary in args.vary:
+        if len(vary) not in (3, 4):
+            parser.error('--vary takes NAME LOW HIGH [STEP]')
+        name = vary[0]
+        try:
+            bounds[name] = (float(vary[1]), float(vary[2]))
+            if len(vary) == 4:
+                resolution[name] = float(vary[3])
+        except ValueError:
+            parser.error(f'--vary {name}: bounds and step must be numbers')
+
+    result = optimize(args.in_filename, bounds, qoi=args.qoi,
+                      maximize=not args.minimize, resolution=resolution,
+                      popsize=args.popsize, maxiter=args.maxiter,
+                      tol=args.tol, seed=args.seed, max_workers=args.jobs)
+    if args.history is not None:
+        write_results(result.history, args.history)
+
+    print(f"{'Maximum' if not args.minimize else 'Minimum'} {args.qoi}:"
+          f" {result.value:.6f}")
+    max_width = max(len(name) for name in bounds)
+    for name, val in result.x.items():
+        print(f'-- {name.ljust(max_width + 2)}: {val:.6f}')
+    print(f'{result.n_evals} candidates, {result.n_runs} sim runs,'
+          f' {len(result.history)} generations: {result.message}')
+
+
+def _make_parser():
+    """Define command line interface (CLI) argument parser."""
+    parser = argparse.ArgumentParser(
+        prog='gball-optimize',
+        description="find the inputs that maximize a golfball QoI")
+
+    parser.add_argument("--in_filename", '-i', default=None,
+                        help="filename of YAML w/ the base inputs.  default:"
+                        " the default inputs")
+    parser.add_argument("--vary", nargs='+', action='append', required=True,
+                        metavar='NAME LOW HIGH [STEP]',
+                        help="an input to optimize, its bounds, and"
+                        " optionally the step its values are snapped to."
+                        "  Repeat for each input")
+    parser.add_argument("--qoi", default='max_range', choices=QOI_COLUMNS,
+                        help="QoI to optimize.  default: max_range")
+    parser.add_argument("--minimize", action='store_true',
+                        help="minimize the QoI instead")
+    parser.add_argument("--popsize", default=15, type=int,
+                        help="candidates per generation, per input."
+                        "  default: 15")
+    parser.add_argument("--maxiter", default=100, type=int,
+                        help="most generations.  default: 100")
+    parser.add_argument("--tol", default=0.01, type=float,
+                        help="relative spread of the population at"
+                        " convergence.  default: 0.01")
+    parser.add_argument("--seed", default=None, type=int,
+                        help="seed of the optimizer, for repeatable runs")
+    parser.add_argument("--jobs", '-j', default=None, type=int,
+                        help="number of worker processes.  default: the"
+                        " number of CPUs")
+    parser.add_argument("--history", default=None,
+                        help="write the convergence history to this table"
+                        " (.csv, .parquet or .h5)")
+    return parser
+
+
+def _run_candidates(inputs, paths, rows):
+    """Run the QoIs of candidate rows of input overrides."""
+    return [Sim.from_dict(apply_overrides(inputs, row, paths)).run(
+        qoi_only=True) for row in rows]
+
+
+class BatchObjective():
+    """A QoI of batches of candidate inputs, run over a pool of processes.
+
+    Parameters
+    ----------
+    inputs : str or dict or None
+        Base inputs, as for :py:func:`golfball.sweep.run_sweep`.
+    names : list of str
+        Inputs given by the candidates, in order.
+    qoi : str, optional
+        QoI returned.
+    maximize : bool, optional
+        Return the QoI negated, so that minimizing it maximizes the QoI.
+    resolution : dict, optional
+        Steps by input name; candidate values are snapped to multiples of
+        them.
+    max_workers : int, optional
+        Number of worker processes; the number of CPUs if omitted.  With 1,
+        the runs are done in this process.
+
+    Calling the object with candidates of shape (len(names), S) returns the
+    S objective values, the way ``differential_evolution(...,
+    vectorized=True)`` calls it.  Results are memoized by the snapped
+    candidate in :py:attr:`memo`.
+
+    """
+
+    def __init__(self, inputs, names, qoi='max_range', maximize=True,
+                 resolution=None, max_workers=None):
+        if qoi not in QOI_COLUMNS:
+            raise ValueError(f'qoi must be one of {QOI_COLUMNS}')
+        self.inputs = base_inputs(inputs)
+        self.names = list(names)
+        self.paths = input_paths(self.inputs, self.names)
+        self.qoi = qoi
+        self.sign = -1.0 if maximize else 1.0
+        resolution = resolution or {}
+        unknown = [name for name in resolution if name not in self.names]
+        if unknown:
+            raise ValueError(f'resolution of inputs not optimized: {unknown}')
+        self.steps = np.array([resolution.get(name, 0.0)
+                               for name in self.names], dtype=float)
+        self.memo = {}
+        self.n_evals = 0
+        self.n_runs = 0
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max(1, max_workers)
+        self.executor = None
+        if self.max_workers == 1:
+            warm_up(self.inputs)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, initializer=warm_up,
+                initargs=(self.inputs,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop the worker processes."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def snap(self, points):
+        """Return candidates, shape (S, len(names)), snapped to resolution."""
+        points = np.array(points, dtype=float)
+        snapped = self.steps > 0.0
+        points[:, snapped] = (np.round(points[:, snapped]
+                                       / self.steps[snapped])
+                              * self.steps[snapped])
+        return points
+
+    def evaluate(self, points):
+        """Return the QoI dicts of candidates, running the new ones.
+
+        Parameters
+        ----------
+        points : array_like
+            Candidates, shape (S, len(names)).
+
+        Returns
+        -------
+        list of dict
+            The QoIs of each candidate.
+
+        """
+        keys = [tuple(point) for point in self.snap(points).tolist()]
+        self.n_evals += len(keys)
+        new = list(dict.fromkeys(key for key in keys
+                                 if key not in self.memo))
+        if new:
+            rows = [dict(zip(self.names, key)) for key in new]
+            if self.executor is None:
+                results = _run_candidates(self.inputs, self.paths, rows)
+            else:
+                chunksize = -(-len(rows) // self.max_workers)
+                chunks = [rows[i:i + chunksize]
+                          for i in range(0, len(rows), chunksize)]
+                results = [result for chunk in self.executor.map(
+                    _run_candidates, repeat(self.inputs), repeat(self.paths),
+                    chunks) for result in chunk]
+            self.n_runs += len(new)
+            for key, result in zip(new, results):
+                self.memo[key] = {name: result[name] for name in QOI_COLUMNS}
+        return [self.memo[key] for key in keys]
+
+    def __call__(self, x):
+        points = np.atleast_2d(np.asarray(x, dtype=float).T)
+        values = [self.sign * qoi[self.qoi] for qoi in self.evaluate(points)]
+        return np.array(values) if np.ndim(x) > 1 else values[0]
+
+
+def optimize(inputs, bounds, qoi='max_range', maximize=True, resolution=None,
+             popsize=15, maxiter=100, tol=0.01, seed=None, max_workers=None):
+    """Find the inputs within bounds that maximize (or minimize) a QoI.
+
+    Parameters
+    ----------
+    inputs : str or dict or None
+        Base inputs: an input YAML filename, input groups, or None for the
+        default inputs.
+    bounds : dict
+        (low, high) bounds by name of the inputs to optimize.
+    qoi : str, optional
+        QoI to optimize.
+    maximize : bool, optional
+        Maximize the QoI, or minimize it.
+    resolution : dict, optional
+        Steps by input name that candidates are snapped to; see
+        :py:class:`BatchObjective`.
+    popsize : int, optional
+        Candidates per generation, per input.
+    maxiter : int, optional
+        Most generations.
+    tol : float, optional
+        Convergence tolerance of ``differential_evolution``.
+    seed : int, optional
+        Seed of the optimizer, for repeatable runs.
+    max_workers : int, optional
+        Number of worker processes.
+
+    Returns
+    -------
+    OptimizationResult
+        ``x``, the optimal inputs by name; ``value``, the optimal QoI;
+        ``qoi``, all the QoIs there; ``n_evals`` candidates and ``n_runs``
+        sims run; ``history``, a DataFrame of the best candidate of each
+        generation, with the optimizer's convergence, which reaches 1 at
+        tol, and the evaluation counts so far; and ``success`` and
+        ``message`` from the optimizer.
+
+    """
+    import pandas as pd
+    from scipy.optimize import differential_evolution
+
+    names = list(bounds)
+    history = []
+    with BatchObjective(inputs, names, qoi=qoi, maximize=maximize,
+                        resolution=resolution,
+                        max_workers=max_workers) as objective:
+
+        def callback(xk, convergence):
+            # the best candidate has been run, so its QoIs are memoized
+            best = objective.memo[tuple(objective.snap([xk])[0].tolist())]
+            history.append({'generation': len(history) + 1,
+                            qoi: best[qoi],
+                            'convergence': convergence,
+                            'n_evals': objective.n_evals,
+                            'n_runs': objective.n_runs,
+                            **dict(zip(names, xk))})
+
+        result = differential_evolution(
+            objective, [bounds[name] for name in names], popsize=popsize,
+            maxiter=maxiter, tol=tol, seed=seed, polish=False,
+            vectorized=True, updating='deferred', callback=callback)
+
+        best = objective.snap([result.x])[0]
+        best_qoi = objective.evaluate([best])[0]
+        return OptimizationResult(
+            x=dict(zip(names, best.tolist())), value=best_qoi[qoi],
+            qoi=best_qoi, n_evals=objective.n_evals, n_runs=objective.n_runs,
+            history=pd.DataFrame(history), success=bool(result.success),
+            message=str(result.message))
@@ -0,0 +1,171 @@
+"""Columnar output files: Parquet, Arrow IPC and NumPy npz.
+
+The ``output_format`` config input selects how :py:class:`golfball.sim.Sim`
+writes its outputs:
+
+- ``yaml`` (the default): the QoIs as YAML, the trajectory as a pandas HDF5
+  file, as always.
+- ``parquet``, ``arrow`` or ``npz``: the QoIs as one typed table row, and the
+  trajectory as a table with one column per state.  The extensions of
+  ``out_filename`` and ``traj_filename`` are replaced by the format's
+  (``.parquet``, ``.arrow`` or ``.npz``).
+
+The QoI row holds the QoIs followed by the ``state`` and ``params`` inputs of
+the run, with vector inputs split into one column per entry (``wind[0]``,
+...), so the outputs of a whole study can be read as one table.  All QoI
+files of a study have the same columns.  Trajectory columns are ``time``,
+always float64, and the states, in the ``traj_dtype`` precision;
+``traj_stride`` keeps every n-th sample only, plus the last one.
+
+Parquet and Arrow need pyarrow, which is only imported when one of them is
+used.  :py:func:`study_dataset` opens the QoI files of a study directory as a
+``pyarrow.dataset.Dataset``, which reads Arrow files without copying them.
+"""
+# pylint: disable=C0415
+import os
+
+import numpy as np
+
+OUTPUT_FORMATS = ('yaml', 'parquet', 'arrow', 'npz')
+
+TRAJ_DTYPES = ('float64', 'float32')
+
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow', 'npz': '.npz'}
+
+# input groups written next to the QoIs
+ROW_INPUT_GROUPS = ('state', 'params')
+
+
+def output_filename(filename, output_format):
+    """Return filename with the extension of a columnar output format."""
+    if output_format not in EXTENSIONS:
+        return filename
+    return os.path.splitext(filename)[0] + EXTENSIONS[output_format]
+
+
+def qoi_row(qoi, inputs):
+    """Return the QoIs and the state and params inputs of a run as one row.
+
+    Returns
+    -------
+    dict
+        Float values by column name; vector inputs give one column per
+        entry, named like ``wind[0]``.
+
+    """
+    row = {name: float(val) for name, val in qoi.items()}
+    for group in ROW_INPUT_GROUPS:
+        for name, val in inputs[group].items():
+            if isinstance(val, (list, tuple)):
+                for index, entry in enumerate(val):
+                    row[f'{name}[{index}]'] = float(entry)
+            else:
+                row[name] = float(val)
+    return row
+
+
+def traj_columns(traj, dtype='float64', stride=1):
+    """Return a trajectory DataFrame as a dict of column arrays.
+
+    Parameters
+    ----------
+    traj : pandas.DataFrame
+        Trajectory indexed by time, like :py:attr:`golfball.sim.Sim.traj`.
+    dtype : {'float64', 'float32'}, optional
+        Precision of the state columns; time is always float64.
+    stride : int, optional
+        Keep every stride-th sample, and the last one.
+
+    """
+    if dtype not in TRAJ_DTYPES:
+        raise ValueError(f'traj_dtype must be one of {TRAJ_DTYPES}')
+    if stride < 1:
+        raise ValueError('traj_stride must be at least 1')
+    keep = np.arange(0, len(traj), stride)
+    if len(traj) and keep[-1] != len(traj) - 1:
+        keep = np.append(keep, len(traj) - 1)
+    columns = {'time': traj.index.to_numpy(dtype=np.float64)[keep]}
+    for name in traj.columns:
+        columns[name] = traj[name].to_numpy(dtype=dtype)[keep]
+    return columns
+
+
+def write_columns(filename, columns, output_format):
+    """Write a dict of equal length column arrays as a table.
+
+    Parameters
+    ----------
+    filename : str
+        Output file.
+    columns : dict
+        Column arrays (or scalars, for a single row) by name.
+    output_format : {'parquet', 'arrow', 'npz'}
+        File format.
+
+    """
+    columns = {name: np.atleast_1d(val) for name, val in columns.items()}
+    if output_format == 'npz':
+        np.savez(filename, **columns)
+        return
+    if output_format not in ('parquet', 'arrow'):
+        raise ValueError(f'output_format must be one of {OUTPUT_FORMATS}')
+
+    import pyarrow as pa
+
+    table = pa.table(columns)
+    if output_format == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, filename)
+    else:
+        with pa.OSFile(filename, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+def read_columns(filename):
+    """Read a table written by :py:func:`write_columns` as a DataFrame.
+
+    The format is taken from the file extension.
+    """
+    import pandas as pd
+
+    ext = os.path.splitext(filename)[1]
+    if ext == EXTENSIONS['npz']:
+        with np.load(filename) as arrays:
+            return pd.DataFrame({name: arrays[name] for name in arrays.files})
+    if ext == EXTENSIONS['parquet']:
+        return pd.read_parquet(filename)
+    if ext == EXTENSIONS['arrow']:
+        return pd.read_feather(filename)
+    raise ValueError(f'{filename}: not a {sorted(EXTENSIONS.values())} file')
+
+
+def study_dataset(directory, output_format='parquet',
+                  prefix='projectile_outputs'):
+    """Open the QoI or trajectory files of a study as one Arrow dataset.
+
+    Parameters
+    ----------
+    directory : str
+        Directory searched, with its subdirectories, for files with the
+        format's extension.
+    output_format : {'parquet', 'arrow'}, optional
+        Format of the files.
+    prefix : str, optional
+        Only open files whose names start with prefix: the QoI files by
+        default.  Use the ``traj_filename`` stem for the trajectories.
+
+    Returns
+    -------
+    pyarrow.dataset.Dataset
+
+    """
+    import pyarrow.dataset as ds
+
+    ext = EXTENSIONS[output_format]
+    files = sorted(os.path.join(root, name)
+                   for root, _, names in os.walk(directory)
+                   for name in names
+                   if name.startswith(prefix) and name.endswith(ext))
+    return ds.dataset(files, format='ipc' if output_format == 'arrow'
+                      else output_format)
@@ -0,0 +1,177 @@
+"""Quantities of Interest (QoI) accumulated one integrator step at a time.
+
+The trackers here are fed the solution as the integrator advances and keep
+only running maxima, so the memory a run needs does not grow with the length
+of the trajectory.
+
+- :py:class:`GridQoI` takes samples on the ``dt`` grid, with the same QoI
+  definitions as the ``odeint`` run of :py:class:`golfball.sim.Sim`.
+- :py:class:`EventQoI` looks at each step of a ``scipy.integrate.OdeSolver``
+  and locates the ground impact, apex and range peak events the way
+  ``solve_ivp`` does, giving the same QoIs as the event-driven runs.
+"""
+
+import math
+
+import numpy as np
+
+EPS = np.finfo(float).eps
+
+
+def impact_events(x0):
+    """Return the (ground, apex, range_peak) event functions of a shot.
+
+    All three have the ``solve_ivp`` event signature and trigger on
+    decreasing values: ``ground`` when the ball falls back through its
+    launch height (terminal), ``apex`` at the top of the flight, and
+    ``range_peak`` where the distance from the launch point stops growing.
+    """
+    def ground(_, x):
+        return x[2] - x0[2]
+    ground.terminal = True
+    ground.direction = -1
+
+    def apex(_, x):
+        return x[5]
+    apex.direction = -1
+
+    def range_peak(_, x):
+        return np.dot(x[0:3] - x0[0:3], x[3:6])
+    range_peak.direction = -1
+
+    return ground, apex, range_peak
+
+
+def event_qoi(x0, t_impact, x_impact, event_states):
+    """Return the QoI dict from the impact and the apex/range peak states.
+
+    Parameters
+    ----------
+    x0 : numpy.ndarray
+        Initial state.
+    t_impact : float
+        Time of the ground impact, or of the end of the integration.
+    x_impact : numpy.ndarray
+        State at ``t_impact``.
+    event_states : list of array_like
+        States at the apex and range peak events, each of shape (n, 12).
+
+    """
+    rel_pos = np.vstack([[0.0, 0.0, 0.0], x_impact[0:3] - x0[0:3]]
+                        + [np.reshape(x_event, (-1, x0.size))[:, 0:3]
+                           - x0[0:3] for x_event in event_states])
+    return {'max_height': float(rel_pos[:, 2].max()),
+            'max_range': float(np.linalg.norm(rel_pos, axis=1).max()),
+            'time_of_flight': float(t_impact)}
+
+
+class GridQoI():
+    """QoI sampled on the ``dt`` grid, until a sample is below launch height.
+
+    Parameters
+    ----------
+    x0 : numpy.ndarray
+        Initial state.
+    t_init : float
+        Initial time.
+
+    """
+
+    def __init__(self, x0, t_init):
+        self.pos_init = x0[0:3].copy()
+        self.landed = False
+
+        self.max_height = 0.0
+        self.max_range = 0.0
+        self.time_of_flight = t_init
+        # the samples of the maxima
+        self.x_max_height = x0
+        self.x_max_range = x0
+
+    def update(self, time, x):
+        """Take in the state x sampled at a grid time."""
+        rel_pos = x[0:3] - self.pos_init
+        if rel_pos[2] < 0.0:
+            self.landed = True
+            return
+        if rel_pos[2] > self.max_height:
+            self.max_height = rel_pos[2]
+            self.x_max_height = x.copy()
+        range_mag = math.sqrt(np.dot(rel_pos, rel_pos))
+        if range_mag > self.max_range:
+            self.max_range = range_mag
+            self.x_max_range = x.copy()
+        self.time_of_flight = time
+
+    @property
+    def qoi(self):
+        """QoI dict, like :py:attr:`golfball.sim.Sim.qoi`."""
+        return {'max_height': float(self.max_height),
+                'max_range': float(self.max_range),
+                'time_of_flight': float(self.time_of_flight)}
+
+
+class EventQoI():
+    """QoI from the ground impact, apex and range peak events.
+
+    Events are found like ``solve_ivp`` finds them: by a sign change of the
+    event function between the ends of a step, then located on the step's
+    interpolant with ``brentq``.
+
+    Parameters
+    ----------
+    x0 : numpy.ndarray
+        Initial state.
+    t_init : float
+        Initial time.
+
+    """
+
+    def __init__(self, x0, t_init):
+        self.x0 = x0.copy()
+        self.events = impact_events(x0)
+        self.g_old = [event(t_init, x0) for event in self.events]
+        self.event_states = [[] for _ in self.events[1:]]
+        self.landed = False
+        self.t_end = t_init
+        self.x_end = self.x0
+
+    def update(self, solver):
+        """Look for events in the solver's last step."""
+        t_old, t_new = self.t_end, solver.t
+        g_new = [event(t_new, solver.y) for event in self.events]
+        active = [i_event for i_event in range(len(self.events))
+                  if self.g_old[i_event] >= 0.0 >= g_new[i_event]]
+        self.g_old = g_new
+        self.t_end, self.x_end = t_new, solver.y.copy()
+        if not active:
+            return
+
+        from scipy.optimize import brentq  # pylint: disable=C0415
+
+        interpolant = solver.dense_output()
+        found = []
+        for i_event in active:
+            event = self.events[i_event]
+            t_event = brentq(lambda t, event=event: event(t, interpolant(t)),
+                             t_old, t_new, xtol=4 * EPS, rtol=4 * EPS)
+            found.append((t_event, i_event))
+
+        for t_event, i_event in sorted(found):
+            x_event = interpolant(t_event)
+            if i_event == 0:
+                self.landed = True
+                self.t_end, self.x_end = t_event, x_event
+                break
+            self.event_states[i_event - 1].append(x_event)
+
+    @property
+    def impact(self):
+        """Impact time and position, like :py:attr:`golfball.sim.Sim.impact`."""
+        return {'time': float(self.t_end),
+                'pos_LL': [float(p) for p in self.x_end[0:3]]}
+
+    @property
+    def qoi(self):
+        """QoI dict, like :py:attr:`golfball.sim.Sim.qoi`."""
+        return event_qoi(self.x0, self.t_end, self.x_end, self.event_states)
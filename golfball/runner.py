@@ -0,0 +1,94 @@
+"""Run many sims at once in one process, over threads, or over processes.
+
+:py:func:`run_many` runs the QoIs of a list of input groups, each one a
+:py:meth:`golfball.sim.Sim.from_dict` Sim, and returns them in order.  With
+the default ``thread`` executor nothing is pickled or copied between
+processes, which suits services that embed golfball.
+
+Threads only run at the same time while they don't hold the GIL.  RK4 runs
+of the ``numba`` engine integrate in one compiled call that releases it
+(:py:meth:`golfball.kernels.RHSKernel.rk4_qoi`), so they scale with the
+cores.  Every other method calls back into Python at each step, and its
+runs mostly take turns; give them the ``process`` executor instead.
+"""
+# pylint: disable=C0415
+import os
+
+from .sim import Sim
+
+EXECUTORS = ('thread', 'process')
+
+# chunks per worker process, so that workers finishing early pick up more
+CHUNKS_PER_WORKER = 4
+
+
+def run_qoi(sim):
+    """Run a Sim's QoIs and return them with its stats, in one dict."""
+    return {**sim.run(qoi_only=True), **sim.stats}
+
+
+def _run_inputs(inputs_chunk):
+    """Run the QoIs of a chunk of input groups in a worker process."""
+    return [run_qoi(Sim.from_dict(inputs)) for inputs in inputs_chunk]
+
+
+def run_many(inputs_list, executor='thread', max_workers=None):
+    """Run the QoIs of many sims concurrently.
+
+    Parameters
+    ----------
+    inputs_list : iterable of dict
+        Input groups of each run, as for :py:meth:`golfball.sim.Sim.from_dict`.
+    executor : {'thread', 'process'}, optional
+        Run over a pool of threads of this process, or of worker processes.
+    max_workers : int, optional
+        Number of threads or processes; the number of CPUs if omitted.  With
+        1, the runs are done one after the other in this thread.
+
+    Returns
+    -------
+    list of dict
+        The QoIs of each run, with its ``n_rhs`` and ``n_steps`` stats, in
+        the order of inputs_list.
+
+    Raises
+    ------
+    ValueError :
+        Raised if the executor is unknown, or any inputs are invalid; no run
+        is started then.
+
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f'executor must be one of {EXECUTORS}')
+    sims = [Sim.from_dict(inputs) for inputs in inputs_list]
+    if not sims:
+        return []
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(sims)))
+
+    if max_workers == 1:
+        return [run_qoi(sim) for sim in sims]
+
+    if executor == 'thread':
+        from concurrent.futures import ThreadPoolExecutor
+        from .sweep import warm_up
+
+        # load the lookups the runs share once, before the threads start
+        configs = {(sim.inputs['config']['cd_model'],
+                    sim.inputs['config']['atmosphere']): sim.inputs
+                   for sim in sims}
+        for inputs in configs.values():
+            warm_up(inputs)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(run_qoi, sims))
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    inputs = [sim.inputs for sim in sims]
+    chunksize = -(-len(inputs) // (max_workers * CHUNKS_PER_WORKER))
+    chunks = [inputs[i:i + chunksize]
+              for i in range(0, len(inputs), chunksize)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return [qoi for chunk in pool.map(_run_inputs, chunks)
+                for qoi in chunk]
@@ -0,0 +1,346 @@
+"""Forward sensitivities of the trajectory and the QoIs to the inputs.
+
+With the ``sensitivities`` config input set, :py:meth:`golfball.sim.Sim.run`
+integrates the sensitivity of the state to each of SENSITIVITY_PARAMS
+alongside the state itself: the 12 states are followed by the 12 x P matrix
+``s = dx/dp``, row by row, and
+
+    ds/dt = df/dx s + df/dp,    s(t_init) = dx0/dp,
+
+with the Jacobians of :py:class:`golfball.kernels.RHSKernel` worked out
+analytically.  Cd is piecewise linear in the Reynolds number, so its slope is
+that of the current segment of the Cd column; the density and viscosity
+gradients are central differences over ATM_STEP of the atmosphere model.
+
+The QoI gradients follow from the sensitivities at the samples or events that
+give the QoIs.  Event times move with the parameters: the impact time of a
+solve_ivp method has the gradient ``-(dg/dx s) / (dg/dx f)`` of its event
+function g.  The QoIs of the ``odeint`` method are taken on the ``dt`` grid,
+so the gradients are those of the grid samples, and the time of flight, a
+grid time, has a zero gradient.
+
+Gradients are added to :py:attr:`golfball.sim.Sim.qoi` as ``dQOI/dPARAM``,
+e.g. ``dmax_range/dangle``, per unit of the input: per degree for ``angle``
+and ``azimuth``, per rad/s for the spin ``w_LL_B_LL``.
+"""
+import numpy as np
+
+from .kernels import (STATE_SIZE, P_AREA, P_G, P_L_REF, P_MASS, P_RHO_SCALE,
+                      P_S, P_TABLE_DZ, P_TABLE_Z_MIN, P_WIND,
+                      _exact_atmosphere, _table_atmosphere)
+
+SENSITIVITY_PARAMS = ('vel_mag', 'angle', 'azimuth',
+                      'w_LL_B_LL[0]', 'w_LL_B_LL[1]', 'w_LL_B_LL[2]',
+                      'm', 'D', 'S', 'rho_scale',
+                      'wind[0]', 'wind[1]', 'wind[2]')
+
+N_PARAMS = len(SENSITIVITY_PARAMS)
+
+# columns of the parameters in the sensitivity matrix
+I_VEL_MAG = 0
+I_ANGLE = 1
+I_AZIMUTH = 2
+I_SPIN = 3       # 3 entries
+I_MASS = 6
+I_D = 7
+I_S = 8
+I_RHO_SCALE = 9
+I_WIND = 10      # 3 entries
+
+QOI_NAMES = ('max_height', 'max_range', 'time_of_flight')
+
+# altitude step [m] of the density and viscosity central differences
+ATM_STEP = 0.5
+
+
+def gradient_name(qoi, param):
+    """Return the QoI dict key of the gradient of a QoI to a parameter."""
+    return f'd{qoi}/d{param}'
+
+
+# gradient keys of the QoI dict, QoI by QoI
+GRADIENT_COLUMNS = [gradient_name(qoi, param) for qoi in QOI_NAMES
+                    for param in SENSITIVITY_PARAMS]
+
+
+def augmented_state(x0, state):
+    """Return the initial state followed by its sensitivities.
+
+    Parameters
+    ----------
+    x0 : numpy.ndarray
+        Initial state, from :py:meth:`golfball.sim.Sim.initial_state`.
+    state : dict
+        The ``state`` input group it was built from.
+
+    """
+    ang = np.radians(state['angle'])
+    az = np.radians(state['azimuth'])
+    vel_mag = state['vel_mag']
+    sens = np.zeros((STATE_SIZE, N_PARAMS))
+    sens[3:6, I_VEL_MAG] = [np.cos(ang) * np.cos(az),
+                            np.cos(ang) * np.sin(az),
+                            np.sin(ang)]
+    sens[3:6, I_ANGLE] = np.radians(vel_mag) * np.array(
+        [-np.sin(ang) * np.cos(az), -np.sin(ang) * np.sin(az), np.cos(ang)])
+    sens[3:6, I_AZIMUTH] = np.radians(vel_mag) * np.array(
+        [-np.cos(ang) * np.sin(az), np.cos(ang) * np.cos(az), 0.0])
+    sens[9:12, I_SPIN:I_SPIN + 3] = np.eye(3)
+    return np.concatenate([x0, sens.ravel()])
+
+
+# diagonal of a 3 x 3 matrix
+_DIAG = (np.arange(3), np.arange(3))
+
+
+def _skew(vec):
+    """Return the matrix of the cross product ``vec x ...``."""
+    return np.array([[0.0, -vec[2], vec[1]],
+                     [vec[2], 0.0, -vec[0]],
+                     [-vec[1], vec[0], 0.0]])
+
+
+def _sensitivities(y):
+    """Return the (12, P) sensitivity matrix of an augmented state."""
+    return np.reshape(y[STATE_SIZE:], (STATE_SIZE, N_PARAMS))
+
+
+class SensitivityRHS():
+    """Right-hand side of the states and of their forward sensitivities.
+
+    Parameters
+    ----------
+    rhs : RHSKernel
+        Right-hand side of the states.
+
+    Has the call signatures of :py:class:`golfball.kernels.RHSKernel`, for
+    states of size 12 * (1 + N_PARAMS), and counts its evaluations in
+    ``n_evals`` the same way.
+
+    """
+
+    def __init__(self, rhs):
+        self.rhs = rhs
+
+    @property
+    def n_evals(self):
+        """Number of right-hand side evaluations."""
+        return self.rhs.n_evals
+
+    def _atmosphere(self, height):
+        """Return (density, viscosity) as the kernel computes them."""
+        atm_coeffs = self.rhs.atm_coeffs
+        if atm_coeffs.shape[0] > 0:
+            params = self.rhs.params
+            pos = (height - params[P_TABLE_Z_MIN]) / params[P_TABLE_DZ]
+            if 0.0 <= pos <= atm_coeffs.shape[1]:
+                return _table_atmosphere(pos, atm_coeffs)
+        return _exact_atmosphere(height)
+
+    def _drag_coeff(self, reynolds_no):
+        """Return Cd and its slope dCd/dRe at a Reynolds number."""
+        re_grid, cd_column = self.rhs.re_grid, self.rhs.cd_column
+        drag_coeff = np.interp(reynolds_no, re_grid, cd_column)
+        i_cell = np.searchsorted(re_grid, reynolds_no, side='right') - 1
+        if 0 <= i_cell < re_grid.size - 1:
+            return drag_coeff, ((cd_column[i_cell + 1] - cd_column[i_cell])
+                                / (re_grid[i_cell + 1] - re_grid[i_cell]))
+        return drag_coeff, 0.0
+
+    def _accel_jacobians(self, x):
+        """Return f and the nonzero blocks of the acceleration's Jacobians.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            f, shape (12,); d(accel)/dz, shape (3,); d(accel)/dv and
+            d(accel)/dw, shape (3, 3); d(accel)/dp, shape (3, P).
+
+        """
+        params = self.rhs.params
+        f_x = self.rhs(x).copy()
+
+        vel_air = x[3:6] - params[P_WIND:P_WIND + 3]
+        speed = np.sqrt(vel_air @ vel_air)
+        area, diameter = params[P_AREA], params[P_L_REF]
+        mass, magnus = params[P_MASS], params[P_S]
+
+        rho_atm, visc = self._atmosphere(x[2])
+        rho_up, visc_up = self._atmosphere(x[2] + ATM_STEP)
+        rho_down, visc_down = self._atmosphere(x[2] - ATM_STEP)
+        drho_atm = (rho_up - rho_down) / (2.0 * ATM_STEP)
+        dvisc = (visc_up - visc_down) / (2.0 * ATM_STEP)
+        rho = params[P_RHO_SCALE] * rho_atm
+
+        reynolds_no = speed * rho * diameter / visc
+        drag_coeff, dcd_dre = self._drag_coeff(reynolds_no)
+        # drag acceleration is drag_scale * vel_air / m
+        drag_scale = -0.5 * rho * speed * drag_coeff * area
+        # d(drag_scale)/d(speed) * speed, Re being proportional to speed
+        drag_slope = -0.5 * area * rho * (drag_coeff + dcd_dre * reynolds_no)
+
+        ddrag_dvel = (drag_slope / speed * vel_air if speed > 0.0
+                      else np.zeros(3))
+        ddrag_dz = -0.5 * area * speed * params[P_RHO_SCALE] * (
+            drho_atm * drag_coeff
+            + rho_atm * dcd_dre * reynolds_no
+            * (drho_atm / rho_atm - dvisc / visc))
+        spin_cross = _skew(x[9:12])
+        daccel_dvel = vel_air[:, np.newaxis] * ddrag_dvel
+        daccel_dvel += magnus * spin_cross
+        daccel_dvel[_DIAG] += drag_scale
+        daccel_dvel /= mass
+
+        daccel_dp = np.zeros((3, N_PARAMS))
+        daccel_dp[:, I_MASS] = -(f_x[3:6] - params[P_G:P_G + 3]) / mass
+        # A and L_ref = D, and so Re, grow with D
+        daccel_dp[:, I_D] = vel_air * (
+            -0.5 * rho * speed * np.pi * diameter / 4.0
+            * (2.0 * drag_coeff + dcd_dre * reynolds_no) / mass)
+        daccel_dp[:, I_S] = spin_cross @ vel_air / mass
+        daccel_dp[:, I_RHO_SCALE] = vel_air * (rho_atm * speed * drag_slope
+                                               / (rho * mass))
+        daccel_dp[:, I_WIND:I_WIND + 3] = -daccel_dvel
+        return (f_x, vel_air * (ddrag_dz / mass), daccel_dvel,
+                _skew(vel_air) * (-magnus / mass), daccel_dp)
+
+    def jacobians(self, x):
+        """Return the derivatives of a state and the Jacobians df/dx, df/dp.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            f, shape (12,); df/dx, shape (12, 12); df/dp, shape (12, P).
+
+        """
+        f_x, daccel_dz, daccel_dvel, daccel_dspin, daccel_dp = (
+            self._accel_jacobians(x))
+        jac_x = np.zeros((STATE_SIZE, STATE_SIZE))
+        jac_x[0:3, 3:6] = np.eye(3)
+        jac_x[3:6, 2] = daccel_dz
+        jac_x[3:6, 3:6] = daccel_dvel
+        jac_x[3:6, 9:12] = daccel_dspin
+        jac_x[6:9, 9:12] = np.eye(3)
+        jac_p = np.zeros((STATE_SIZE, N_PARAMS))
+        jac_p[3:6] = daccel_dp
+        return f_x, jac_x, jac_p
+
+    def _augmented(self, y):
+        """Return the derivatives of an augmented state in a new array.
+
+        Only the velocity rows of df/dx and df/dp are full, so ds/dt is
+        assembled block by block.
+        """
+        f_x, daccel_dz, daccel_dvel, daccel_dspin, daccel_dp = (
+            self._accel_jacobians(y[:STATE_SIZE]))
+        sens = _sensitivities(y)
+        out = np.zeros_like(y)
+        out[:STATE_SIZE] = f_x
+        d_sens = _sensitivities(out)
+        d_sens[0:3] = sens[3:6]
+        d_sens[3:6] = (daccel_dz[:, np.newaxis] * sens[2]
+                       + daccel_dvel @ sens[3:6]
+                       + daccel_dspin @ sens[9:12] + daccel_dp)
+        d_sens[6:9] = sens[9:12]
+        return out
+
+    def __call__(self, y, _=None):
+        return self._augmented(y)
+
+    def derivatives(self, _, y):
+        """Return the derivatives, with the solve_ivp signature."""
+        return self._augmented(y)
+
+
+def _gradients(d_height, d_range, d_time):
+    """Return the gradient entries of the QoI dict."""
+    values = np.concatenate([d_height, d_range, d_time])
+    return dict(zip(GRADIENT_COLUMNS, values.tolist()))
+
+
+def _range_gradient(rel_pos, d_rel_pos):
+    """Return the gradient of |rel_pos|, zero at the origin."""
+    range_mag = np.sqrt(rel_pos @ rel_pos)
+    if range_mag == 0.0:
+        return np.zeros(N_PARAMS)
+    return rel_pos @ d_rel_pos / range_mag
+
+
+def grid_gradients(y0, y_max_height, y_max_range):
+    """Return the QoI gradients of the ``dt`` grid QoIs.
+
+    Parameters
+    ----------
+    y0 : numpy.ndarray
+        Initial augmented state.
+    y_max_height, y_max_range : numpy.ndarray
+        Augmented states of the grid samples of the highest point and of the
+        furthest one.
+
+    """
+    s_0 = _sensitivities(y0)[0:3]
+    d_height = (_sensitivities(y_max_height)[0:3] - s_0)[2]
+    d_range = _range_gradient(y_max_range[0:3] - y0[0:3],
+                              _sensitivities(y_max_range)[0:3] - s_0)
+    return _gradients(d_height, d_range, np.zeros(N_PARAMS))
+
+
+def event_gradients(y0, y_impact, landed, event_states, rhs):
+    """Return the QoI gradients of the event QoIs.
+
+    Parameters
+    ----------
+    y0 : numpy.ndarray
+        Initial augmented state.
+    y_impact : numpy.ndarray
+        Augmented state at the ground impact, or at the end of the
+        integration.
+    landed : bool
+        Whether y_impact is at the ground impact event.
+    event_states : list of array_like
+        Augmented states at the apex and range peak events, as for
+        :py:func:`golfball.qoi.event_qoi`.
+    rhs : SensitivityRHS
+        Right-hand side of the run.
+
+    """
+    s_0 = _sensitivities(y0)[0:3]
+
+    def moved(y_event, grad_g):
+        """Return the rel. position at an event and its gradient, and dt/dp.
+
+        grad_g is the gradient dg/dx of the event function, or None if the
+        time doesn't move.
+        """
+        sens = _sensitivities(y_event)
+        d_time = np.zeros(N_PARAMS)
+        if grad_g is not None:
+            f_x = rhs.rhs(y_event[:STATE_SIZE])
+            d_time = -(grad_g @ sens) / (grad_g @ f_x)
+        d_pos = sens[0:3] - s_0 + np.outer(y_event[3:6], d_time)
+        return y_event[0:3] - y0[0:3], d_pos, d_time
+
+    def unit(index):
+        grad_g = np.zeros(STATE_SIZE)
+        grad_g[index] = 1.0
+        return grad_g
+
+    candidates = [(np.zeros(3), np.zeros((3, N_PARAMS)), None)]
+    impact = moved(y_impact, unit(2) if landed else None)
+    candidates.append(impact)
+    for y_apex in np.reshape(event_states[0], (-1, y0.size)):
+        candidates.append(moved(y_apex, unit(5)))
+    for y_peak in np.reshape(event_states[1], (-1, y0.size)):
+        grad_g = np.zeros(STATE_SIZE)
+        grad_g[0:3] = y_peak[3:6]
+        grad_g[3:6] = y_peak[0:3] - y0[0:3]
+        candidates.append(moved(y_peak, grad_g))
+
+    # the same samples as event_qoi takes the maxima of
+    heights = [rel_pos[2] for rel_pos, _, _ in candidates]
+    ranges = [np.sqrt(rel_pos @ rel_pos) for rel_pos, _, _ in candidates]
+    _, d_pos_height, _ = candidates[int(np.argmax(heights))]
+    rel_range, d_pos_range, _ = candidates[int(np.argmax(ranges))]
+    return _gradients(d_pos_height[2],
+                      _range_gradient(rel_range, d_pos_range),
+                      impact[2])
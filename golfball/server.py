@@ -0,0 +1,324 @@
+"""Long-lived evaluation server, started with ``gball serve``.
+
+The server reads the base inputs and warms up scipy, the Cd model and the
+atmosphere table once, then answers evaluation requests until it is shut
+down, so a study pays for none of that per sample and nothing is written to
+disk.  It speaks a line protocol, one JSON object per line, over stdin/stdout
+or over a local Unix socket:
+
+- ``{"id": 7, "params": {"angle": 30.0, "eD": 0.005}}`` runs one evaluation
+  and answers ``{"id": 7, "qoi": {...}, "stats": {...}}``, the stats being
+  the RHS evaluations and integrator steps of the run.
+- ``{"id": 7, "batch": [{...}, {...}]}`` runs several, in order, and answers
+  ``{"id": 7, "results": [{"qoi": {...}, "stats": {...}}, {"error":
+  "..."}]}``.
+- ``{"command": "ping"}`` answers ``{"status": "ok"}``, and
+  ``{"command": "shutdown"}`` stops the server after answering.
+
+``params`` override the base inputs the way the columns of a design table do
+in :py:mod:`golfball.sweep`.  An evaluation that fails answers with an
+``error`` message instead of ``qoi``, and the server keeps running.  A socket
+connection can send any number of requests, and several connections are
+served at once.  With ``--jobs N`` the evaluations of a batch are spread over
+N worker processes that stay up for the life of the server.
+
+:py:mod:`golfball.dakota` is the client Dakota calls as its analysis driver.
+"""
+# pylint: disable=C0415
+import os
+import sys
+import argparse
+import json
+import stat
+import threading
+
+from .sweep import apply_overrides, base_inputs, warm_up
+
+DEFAULT_SOCKET = 'gball.sock'
+
+# base inputs of the current worker process, set by _init_worker
+_WORKER_INPUTS = None
+
+
+def main(arg_list=None):
+    """Serve evaluation requests over stdin/stdout or a Unix socket.
+
+    Parameters
+    ----------
+    arg_list : list of str, optional
+        List of individual commandline arguments, after ``serve``.  If
+        omitted, the actual commandline arguments will be used.
+
+    """
+    if arg_list is None:
+        arg_list = sys.argv[1:]
+    args = _make_parser().parse_args(arg_list)
+
+    with EvaluationServer(args.in_filename, max_workers=args.jobs) as server:
+        if args.socket is None:
+            server.serve_stdio()
+        else:
+            server.serve_socket(args.socket)
+
+
+def _make_parser():
+    """Define command line interface (CLI) argument parser."""
+    parser = argparse.ArgumentParser(
+        prog='gball serve',
+        description="answer golfball evaluation requests, one JSON object per"
+        " line, until shut down")
+
+    parser.add_argument("--in_filename", '-i', default=None,
+                        help="filename of YAML w/ the base inputs.  default:"
+                        " the default inputs")
+    parser.add_argument("--socket", '-s', default=None, metavar='PATH',
+                        help="listen on a Unix socket at PATH instead of"
+                        " reading stdin and writing stdout")
+    parser.add_argument("--jobs", '-j', default=1, type=int,
+                        help="worker processes for the evaluations of a"
+                        " batch.  default: 1, evaluate in the server process")
+    return parser
+
+
+def evaluate(inputs, params):
+    """Run one evaluation, and return its result.
+
+    Parameters
+    ----------
+    inputs : dict
+        Base input groups, as returned by
+        :py:func:`golfball.sweep.base_inputs`.
+    params : dict
+        Input overrides, by input name.
+
+    Returns
+    -------
+    dict
+        ``{'qoi': {...}, 'stats': {...}}``, or ``{'error': message}`` if the
+        run failed.
+
+    """
+    from .sim import Sim
+
+    try:
+        sim = Sim.from_dict(apply_overrides(inputs, params))
+        sim.run(qoi_only=True)
+    except Exception as err:  # pylint: disable=W0718
+        return {'error': f'{type(err).__name__}: {err}'}
+    return {'qoi': sim.qoi, 'stats': sim.stats}
+
+
+def _init_worker(inputs):
+    """Keep the base inputs and warm up the lookups a worker's runs share."""
+    global _WORKER_INPUTS  # pylint: disable=W0603
+    _WORKER_INPUTS = inputs
+    warm_up(inputs)
+
+
+def _evaluate_rows(rows):
+    """Run a chunk of evaluations in a worker process."""
+    return [evaluate(_WORKER_INPUTS, params) for params in rows]
+
+
+class EvaluationServer():
+    """Answers evaluation requests from warm, long-lived state.
+
+    Parameters
+    ----------
+    inputs : str or dict or None
+        Base inputs: an input YAML filename, input groups, or None for the
+        default inputs.
+    max_workers : int, optional
+        Worker processes for the evaluations of a batch.  With 1, the
+        default, everything is evaluated in this process.
+
+    """
+
+    def __init__(self, inputs=None, max_workers=1):
+        self.inputs = base_inputs(inputs)
+        warm_up(self.inputs)
+        self.max_workers = max_workers
+        self.executor = None
+        if max_workers > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=max_workers,
+                                                initializer=_init_worker,
+                                                initargs=(self.inputs,))
+        self.shutdown_requested = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop the worker processes, if any."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def evaluate_batch(self, batch):
+        """Run a list of evaluations and return their results, in order."""
+        if self.executor is None or len(batch) < 2:
+            return [evaluate(self.inputs, params) for params in batch]
+        chunksize = -(-len(batch) // self.max_workers)
+        chunks = [batch[i:i + chunksize]
+                  for i in range(0, len(batch), chunksize)]
+        return [result for chunk in self.executor.map(_evaluate_rows, chunks)
+                for result in chunk]
+
+    def handle(self, message):
+        """Answer one request, given and returned as a dict."""
+        response = {'id': message['id']} if 'id' in message else {}
+        command = message.get('command')
+        if command == 'ping':
+            response['status'] = 'ok'
+        elif command == 'shutdown':
+            self.shutdown_requested.set()
+            response['status'] = 'ok'
+        elif command is not None:
+            response['error'] = f'unknown command: {command}'
+        elif 'params' in message:
+            if isinstance(message['params'], dict):
+                response.update(self.evaluate_batch([message['params']])[0])
+            else:
+                response['error'] = 'bad request: "params" must be an object'
+        elif 'batch' in message:
+            batch = message['batch']
+            if (isinstance(batch, list)
+                    and all(isinstance(params, dict) for params in batch)):
+                response['results'] = self.evaluate_batch(batch)
+            else:
+                response['error'] = ('bad request: "batch" must be a list of'
+                                     ' objects')
+        else:
+            response['error'] = ('a request needs "params", "batch" or'
+                                 ' "command"')
+        return response
+
+    def handle_line(self, line):
+        """Answer one request line with one response line."""
+        try:
+            message = json.loads(line)
+            if not isinstance(message, dict):
+                raise ValueError('a request must be a JSON object')
+        except ValueError as err:
+            return json.dumps({'error': f'bad request: {err}'}) + '\n'
+        try:
+            response = self.handle(message)
+        except Exception as err:  # pylint: disable=W0718
+            # no request, however malformed, may stop the server
+            response = {'id': message['id']} if 'id' in message else {}
+            response['error'] = f'{type(err).__name__}: {err}'
+        return json.dumps(response) + '\n'
+
+    def serve_stdio(self, infile=None, outfile=None):
+        """Answer request lines from infile until EOF or a shutdown.
+
+        Parameters
+        ----------
+        infile, outfile : file, optional
+            Text files to read requests from and write responses to;
+            stdin and stdout if omitted.
+
+        """
+        infile = sys.stdin if infile is None else infile
+        outfile = sys.stdout if outfile is None else outfile
+        for line in infile:
+            if not line.strip():
+                continue
+            outfile.write(self.handle_line(line))
+            outfile.flush()
+            if self.shutdown_requested.is_set():
+                break
+
+    def serve_socket(self, path, ready=None):
+        """Answer requests on a Unix socket until a shutdown request.
+
+        Parameters
+        ----------
+        path : str
+            Socket path.  A stale socket file there is replaced.
+        ready : threading.Event, optional
+            Set once the socket accepts connections.
+
+        Raises
+        ------
+        FileExistsError :
+            Raised if path is not a socket, or a server is listening on it.
+
+        """
+        import socketserver
+
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            """Answer every request line of one connection."""
+
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    response = server.handle_line(line.decode('utf8'))
+                    self.wfile.write(response.encode('utf8'))
+                    self.wfile.flush()
+                    if server.shutdown_requested.is_set():
+                        break
+
+        _remove_stale_socket(path)
+        with socketserver.ThreadingUnixStreamServer(path, Handler) as sock:
+            sock.daemon_threads = True
+            thread = threading.Thread(target=sock.serve_forever)
+            thread.start()
+            if ready is not None:
+                ready.set()
+            try:
+                self.shutdown_requested.wait()
+            finally:
+                sock.shutdown()
+                thread.join()
+                os.remove(path)
+
+
+def _remove_stale_socket(path):
+    """Remove a socket file no server listens on; refuse anything else."""
+    import socket
+
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f'{path}: exists and is not a socket')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(path)
+            return
+    raise FileExistsError(f'{path}: a server is already listening')
+
+
+def request(message, path=DEFAULT_SOCKET):
+    """Send one request to a server on a Unix socket, and return the answer.
+
+    Parameters
+    ----------
+    message : dict
+        The request.
+    path : str, optional
+        Socket path of the server.
+
+    """
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        with sock.makefile('rwb') as stream:
+            stream.write(json.dumps(message).encode('utf8') + b'\n')
+            stream.flush()
+            line = stream.readline()
+    if not line:
+        raise ConnectionError(f'{path}: server closed the connection')
+    return json.loads(line)
@@ -1,31 +1,66 @@
-"""3D Golf Ball demo simulation with varying Drag Crisis and Magus Effect."""
+"""3D Golf Ball demo simulation with varying Drag Crisis and Magus Effect.
+
+pandas, scipy and ruamel.yaml are imported where they are first needed, and
+the Cd table is memory-mapped on first use, so that ``gball --help`` and
+short runs driven by other tools start quickly.
+"""
+# pylint: disable=C0415
 import sys
 import os
 import argparse
-from ruamel.yaml import YAML
+import copy
+import functools
+import numbers
 import numpy as np
 
-import pandas as pd
-from scipy.integrate import odeint
-
-from .stdAtm76 import getStandardDensity
+from . import drag
 from .stdAtm76 import getStandardTemperature, getGeopotential, getReynoldsNumber
+from .atmosphere import get_atmosphere_table
+from .qoi import impact_events, event_qoi, GridQoI, EventQoI
+from .kernels import RHSKernel, ENGINES
+from .outputs import OUTPUT_FORMATS, TRAJ_DTYPES
 
 DEFAULT_INPUT_FILE = 'projectile_inputs.yml'
 # NOTE: make sure all tests referring to this file import this variable
 
 DEFAULT_OUTPUT_FILE = 'projectile_outputs.yml'
 
+ATMOSPHERE_MODES = ('exact', 'table')
+
+INTEGRATOR_METHODS = ('odeint', 'LSODA', 'RK45', 'DOP853', 'RK4')
+
+# odeint's default rtol and atol
+ODEINT_TOL = 1.49012e-8
+
+TRAJ_COLUMNS = ['p_LL_x', 'p_LL_y', 'p_LL_z',
+                'v_LL_x', 'v_LL_y', 'v_LL_z',
+                'theta_x', 'theta_y', 'theta_z',
+                'w_x', 'w_y', 'w_z']
+
 DEFAULT_INPUTS_YAML = f"""\
 # Golfball Sim Inputs
 config:
   out_filename: {DEFAULT_OUTPUT_FILE}
   traj_filename: 'projectile_trajectory.h5'
   write_traj: false
+  qoi_only: false
+  sensitivities: false
+  atmosphere: exact
+  engine: numpy
+  cd_model: table
+  cache_filename: ''
+  output_format: yaml
+  traj_dtype: float64
+  traj_stride: 1
 time: 
   t_init: 0.0
   t_stop: 20.0
   dt: 0.01
+integrator:
+  method: odeint
+  rtol: null
+  atol: null
+  step: null
 state:
   angle: 38.0
   azimuth: 0.0
@@ -46,6 +81,9 @@ params:
 def main(arg_list=None):
     """Read in the inputs, run the sim, write out the outputs.
 
+    ``gball serve ...`` starts the evaluation server of
+    :py:mod:`golfball.server` instead.
+
     Parameters
     ----------
     arg_list : list of str, optional
@@ -55,6 +93,10 @@ def main(arg_list=None):
     """
     if arg_list is None:
         arg_list = sys.argv[1:]
+    if arg_list and arg_list[0] == 'serve':
+        from .server import main as serve
+        serve(arg_list[1:])
+        return
     args = get_args(arg_list)
 
     sim = Sim(args)
@@ -132,49 +174,252 @@ def _make_parser():
                         " for QoI.  default: specified by input file")
     parser.add_argument('--write_traj', action='store_true',
                         help="flag to write trajectory file.  default: False")
+    parser.add_argument('--qoi_only', action='store_true',
+                        help="flag to only compute the QoIs, without keeping"
+                        " the trajectory.  default: False")
+    parser.add_argument('--sensitivities', action='store_true',
+                        help="flag to also compute the QoI gradients to the"
+                        " launch state and ball, density and wind params."
+                        "  default: False")
     parser.add_argument('--traj_filename', default=None,
                         help="trajectory output filename.  default: specified"
                         " by input file")
+    parser.add_argument('--atmosphere', default=None,
+                        choices=ATMOSPHERE_MODES,
+                        help="standard atmosphere evaluation: exact stdAtm76"
+                        " or a precomputed lookup table.  default: specified"
+                        " by input file")
+    parser.add_argument('--engine', default=None, choices=ENGINES,
+                        help="right-hand side implementation; numba JIT"
+                        " compiles it when installed.  default: specified by"
+                        " input file")
+    parser.add_argument('--cd_model', default=None, choices=drag.CD_MODELS,
+                        help="drag model: the Cd table, which only has the"
+                        " tabulated eD values, or the Cd surface, continuous"
+                        " in eD.  default: specified by input file")
+    parser.add_argument('--cache_filename', default=None,
+                        help="file of cached results to look runs up in and"
+                        " store them to; empty for no cache.  default:"
+                        " specified by input file")
+    parser.add_argument('--output_format', default=None,
+                        choices=OUTPUT_FORMATS,
+                        help="format of the output files: YAML QoIs and an"
+                        " HDF5 trajectory, or columnar tables.  default:"
+                        " specified by input file")
+    parser.add_argument('--traj_dtype', default=None, choices=TRAJ_DTYPES,
+                        help="precision of the states in columnar trajectory"
+                        " files.  default: specified by input file")
+    parser.add_argument('--traj_stride', default=None, type=int,
+                        help="keep every n-th sample in columnar trajectory"
+                        " files.  default: specified by input file")
+    parser.add_argument('--method', default=None, choices=INTEGRATOR_METHODS,
+                        help="ODE integrator: odeint on the fixed time grid,"
+                        " or a solve_ivp method that stops at ground impact."
+                        "  RK4 takes fixed steps.  default: specified by"
+                        " input file")
+    parser.add_argument('--rtol', default=None, type=float,
+                        help="relative tolerance of the integrator.  default:"
+                        " specified by input file, or the method's")
+    parser.add_argument('--atol', default=None, type=float,
+                        help="absolute tolerance of the integrator.  default:"
+                        " specified by input file, or the method's")
+    parser.add_argument('--step', default=None, type=float,
+                        help="RK4 step size.  default: specified by input"
+                        " file, or dt")
     return parser
 
 
-CD_TABLE_FILE = os.path.join(os.path.dirname(__file__), 'cd_table.h5')
-CD_TABLE = pd.read_hdf(CD_TABLE_FILE, '/cd_table')
+_DEFAULT_INPUTS = None
+
+_NO_ARGS = None
+
+# allowed values of the inputs with a fixed set of choices
+INPUT_CHOICES = {('config', 'atmosphere'): ATMOSPHERE_MODES,
+                 ('config', 'engine'): ENGINES,
+                 ('config', 'cd_model'): drag.CD_MODELS,
+                 ('config', 'output_format'): OUTPUT_FORMATS,
+                 ('config', 'traj_dtype'): TRAJ_DTYPES,
+                 ('integrator', 'method'): INTEGRATOR_METHODS}
 
+# numeric inputs that must be > 0 when given
+POSITIVE_INPUTS = (('config', 'traj_stride'), ('time', 'dt'),
+                   ('integrator', 'rtol'), ('integrator', 'atol'),
+                   ('integrator', 'step'), ('params', 'm'), ('params', 'D'))
+
+
+def default_inputs():
+    """Return a new copy of the default input groups, as plain dicts.
+
+    DEFAULT_INPUTS_YAML is only parsed the first time, since parsing it takes
+    longer than copying the result.
+    """
+    global _DEFAULT_INPUTS  # pylint: disable=W0603
+    if _DEFAULT_INPUTS is None:
+        from ruamel.yaml import YAML
+        _DEFAULT_INPUTS = YAML(typ='safe').load(DEFAULT_INPUTS_YAML)
+    return copy.deepcopy(_DEFAULT_INPUTS)
 
-def calc_drag_coeff(height, vel_mag, l_ref, rho, dimple_size):
+
+def _no_args():
+    """Return a new namespace of the command line defaults, no sys.argv."""
+    global _NO_ARGS  # pylint: disable=W0603
+    if _NO_ARGS is None:
+        _NO_ARGS = get_args([])
+    return argparse.Namespace(**vars(_NO_ARGS))
+
+
+def _is_real(value):
+    """Return whether value is a real number, and not a bool."""
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def check_inputs(inputs):
+    """Check complete input groups against the default inputs.
+
+    Every group and input must be one of the defaults, with a value of the
+    same kind: a bool, a string, a number, or a list of as many numbers.
+    Inputs with choices must be one of them, and sizes, step sizes and
+    tolerances must be positive.
+
+    Parameters
+    ----------
+    inputs : dict
+        Input groups, with the defaults filled in.
+
+    Raises
+    ------
+    ValueError :
+        Raised with all the problems found, if any.
+
+    """
+    problems = []
+    defaults = default_inputs()
+    for group, values in inputs.items():
+        if group not in defaults:
+            problems.append(f'unknown input group {group!r}')
+            continue
+        for name, value in values.items():
+            if name not in defaults[group]:
+                problems.append(f'unknown input {group}.{name}')
+                continue
+            default = defaults[group][name]
+            if isinstance(default, bool):
+                valid = isinstance(value, bool)
+            elif isinstance(default, str):
+                valid = isinstance(value, str)
+            elif isinstance(default, list):
+                valid = (isinstance(value, (list, tuple))
+                         and len(value) == len(default)
+                         and all(_is_real(val) for val in value))
+            elif isinstance(default, int):
+                valid = (isinstance(value, numbers.Integral)
+                         and not isinstance(value, bool))
+            elif default is None:
+                valid = value is None or _is_real(value)
+            else:
+                valid = _is_real(value)
+            if not valid:
+                problems.append(f'{group}.{name} = {value!r}: expected a'
+                                f' value like {default!r}')
+            elif (group, name) in INPUT_CHOICES:
+                if value not in INPUT_CHOICES[group, name]:
+                    problems.append(f'{group}.{name} must be one of'
+                                    f' {INPUT_CHOICES[group, name]}')
+            elif (group, name) in POSITIVE_INPUTS:
+                if value is not None and not value > 0:
+                    problems.append(f'{group}.{name} must be > 0')
+    time = inputs.get('time', {})
+    if (_is_real(time.get('t_init')) and _is_real(time.get('t_stop'))
+            and not time['t_stop'] > time['t_init']):
+        problems.append('time.t_stop must be after time.t_init')
+    if problems:
+        raise ValueError('invalid inputs: ' + '; '.join(problems))
+
+
+_CD_TABLE = None
+
+
+def get_cd_table():
+    """Return the Cd table as a DataFrame indexed by Re, one column per eD.
+
+    The sim itself uses the memory-mapped :py:func:`golfball.drag.get_cd_table`
+    table; this DataFrame view of it is built on first use.
+    """
+    global _CD_TABLE  # pylint: disable=W0603
+    if _CD_TABLE is None:
+        _CD_TABLE = drag.get_cd_table().to_frame()
+    return _CD_TABLE
+
+
+def __getattr__(name):
+    """Provide the module attribute CD_TABLE, loaded on first access."""
+    if name == 'CD_TABLE':
+        return get_cd_table()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def calc_drag_coeff(height, vel_mag, l_ref, rho, dimple_size,
+                    atmosphere=None, cd_model='table'):
     """Calcualte the Coefficient of Drag (Cd).
 
     Calculate Cd as a function of height, velocity magnitude,
     reference length, and density.  Note:  this assumes a
     Temperature profile from the US Standard ATM, and uses CD
+
+    If an AtmosphereTable is given as `atmosphere`, the dynamic viscosity is
+    looked up from it instead of being computed from stdAtm76.  With
+    ``cd_model='surface'`` any dimple size between the measured curves is
+    allowed, see :py:mod:`golfball.drag`.
     """
-    temp = getStandardTemperature(getGeopotential(height, units='m'))
-    reynolds_no = getReynoldsNumber(vel_mag, rho, l_ref, temp)
+    if atmosphere is None:
+        temp = getStandardTemperature(getGeopotential(height, units='m'))
+        reynolds_no = getReynoldsNumber(vel_mag, rho, l_ref, temp)
+    else:
+        reynolds_no = vel_mag * rho * l_ref / atmosphere.viscosity(height)
 
-    drag_coeff = np.interp(reynolds_no, CD_TABLE.index.values,
-                           CD_TABLE.loc[:, dimple_size].values)
+    drag_coeff = drag.get_drag_model(cd_model).cd(reynolds_no, dimple_size)
     return drag_coeff, reynolds_no
 
 
 class Sim():
-    """The primary simulation object."""
+    """The primary simulation object.
 
-    def __init__(self, args=None):
+    Parameters
+    ----------
+    args : argparse.Namespace, optional
+        Parsed command line arguments, see :py:func:`get_args`.  If omitted,
+        the actual command line arguments are used, unless ``inputs`` is
+        given.
+    inputs : dict, optional
+        Input groups to use instead of reading an input file.  They are
+        copied, and missing entries are filled in from the defaults.
+
+    :py:meth:`from_dict` and :py:meth:`from_kwargs` build a Sim from inputs
+    in memory, checked first, without reading the command line or touching
+    any file.
+
+    """
+
+    def __init__(self, args=None, inputs=None):
         self.inputs = None
-        self.yaml = YAML()
-        self.traj = None
+        self._yaml = None
+        self._traj = None
+        self._make_traj = None
         self.qoi = {}
+        self.impact = None
+        self.stats = {}
 
         # Use an argparser if no args are passed in
         if args is None:
-            self.args = get_args()
+            self.args = _no_args() if inputs is not None else get_args()
         else:
             self.args = args
 
         # if we're asking for the default input file and it doesn't exist,
         # create it.
-        if self.args.in_filename is None:
+        if inputs is not None:
+            self.inputs = copy.deepcopy(inputs)
+        elif self.args.in_filename is None:
             if not os.path.isfile(DEFAULT_INPUT_FILE):
                 self.write_default_inputs()
             self.inputs = self.read_inputs(DEFAULT_INPUT_FILE)
@@ -182,7 +427,12 @@ class Sim():
             # if we specified an input file, load it
             self.inputs = self.read_inputs(self.args.in_filename)
 
-        input_groups = self.inputs.keys()
+        self.fill_default_inputs()
+
+        # groups of other tools, like montecarlo, have no options; the
+        # default inputs were loaded by fill_default_inputs
+        input_groups = [group for group in self.inputs
+                        if group in _DEFAULT_INPUTS]
 
         # pylint: disable=E1136
         # NOTE (esb): self.inputs is a dictionary with keys, read from a YAML
@@ -190,7 +440,8 @@ class Sim():
         for input_group in input_groups:
             for argname in self.inputs[input_group].keys():
                 val = getattr(self.args, argname)
-                if argname != 'write_traj':
+                if argname not in ('write_traj', 'qoi_only',
+                                   'sensitivities'):
                     if val is not None:
                         self.inputs[input_group][argname] = val
                 else:
@@ -198,6 +449,66 @@ class Sim():
                         self.inputs[input_group][argname] = val
         # pylint: enable=E1136
 
+    @classmethod
+    def from_dict(cls, inputs, verbose=False):
+        """Return a Sim of input groups held in memory.
+
+        Neither the command line nor any file is read, and nothing is written
+        unless asked for: :py:meth:`run` returns the QoIs, and
+        :py:attr:`traj` holds the trajectory.
+
+        Parameters
+        ----------
+        inputs : dict
+            Input groups, like those of an input file.  They are copied, and
+            missing entries are filled in from the defaults.
+        verbose : bool, optional
+            Print the inputs and QoIs of each run.
+
+        Raises
+        ------
+        ValueError :
+            Raised if the inputs fail :py:func:`check_inputs`.
+
+        """
+        sim = cls(inputs=inputs)
+        check_inputs(sim.inputs)
+        sim.args.verbose = verbose
+        return sim
+
+    @classmethod
+    def from_kwargs(cls, verbose=False, **kwargs):
+        """Return a Sim of the default inputs overridden by keyword.
+
+        Keywords are input names, without their group, e.g.
+        ``Sim.from_kwargs(angle=24.0, method='LSODA', wind=[2.0, 0.0, 0.0])``.
+        See :py:meth:`from_dict`.
+
+        Raises
+        ------
+        ValueError :
+            Raised if a keyword isn't an input name, or if the inputs fail
+            :py:func:`check_inputs`.
+
+        """
+        inputs = default_inputs()
+        groups = {name: group for group, values in inputs.items()
+                  for name in values}
+        unknown = sorted(name for name in kwargs if name not in groups)
+        if unknown:
+            raise ValueError(f'unknown inputs: {unknown}')
+        for name, value in kwargs.items():
+            inputs[groups[name]][name] = value
+        return cls.from_dict(inputs, verbose=verbose)
+
+    @property
+    def yaml(self):
+        """The ruamel.yaml YAML object reading and writing the files."""
+        if self._yaml is None:
+            from ruamel.yaml import YAML
+            self._yaml = YAML()
+        return self._yaml
+
     def write_default_inputs(self):
         """Write default parameters to the default input file."""
 
@@ -206,6 +517,20 @@ class Sim():
         with open(DEFAULT_INPUT_FILE, 'w', encoding='utf8') as f_def_inp:
             self.yaml.dump(default_input, f_def_inp)
 
+    def fill_default_inputs(self):
+        """Add any input group or parameter missing from the inputs.
+
+        Missing entries take their value from DEFAULT_INPUTS_YAML, so input
+        files written before an option existed keep working.
+        """
+        for input_group, defaults in default_inputs().items():
+            if input_group not in self.inputs:
+                self.inputs[input_group] = defaults
+                continue
+            for argname, val in defaults.items():
+                if argname not in self.inputs[input_group]:
+                    self.inputs[input_group][argname] = val
+
     def read_inputs(self, filename):
         """Read inputs YAML file.
 
@@ -231,28 +556,49 @@ class Sim():
     def write_qoi(self):
         """Write Quantities of Interest to YAML.
 
-        Parameters
-        ----------
-        qoi : dict
-            Quantities of Interest to write out.
-        filename : str
-            name of YAML output file for QoI
-
+        With a columnar ``output_format``, they are written as one table row
+        instead, see :py:mod:`golfball.outputs`.
         """
-        with open(self.inputs['config']['out_filename'], 'w',
-                  encoding="utf8") as fh_in:
-            self.yaml.dump(self.qoi, fh_in)
+        output_format = self.inputs['config']['output_format']
+        if output_format == 'yaml':
+            with open(self.inputs['config']['out_filename'], 'w',
+                      encoding="utf8") as fh_in:
+                self.yaml.dump(self.qoi, fh_in)
+            return
+
+        from . import outputs
+        outputs.write_columns(
+            outputs.output_filename(self.inputs['config']['out_filename'],
+                                    output_format),
+            outputs.qoi_row(self.qoi, self.inputs), output_format)
 
     def write_trajectories(self, filename):
         """Save full trajectory to traj_df.h5 HDF5 file.
 
+        With a columnar ``output_format``, the trajectory is written as a
+        table of ``traj_dtype`` columns instead, keeping every
+        ``traj_stride``-th sample, see :py:mod:`golfball.outputs`.
+
         Parameters
         ----------
         filename : str
             Name of the output file for the trajectory HDF5.
 
         """
-        self.traj.to_hdf(filename, '/traj_df')
+        if self.traj is None:
+            raise ValueError('No trajectory to write, the sim was run with'
+                             ' qoi_only.')
+        config = self.inputs['config']
+        if config['output_format'] == 'yaml':
+            self.traj.to_hdf(filename, key='/traj_df')
+            return
+
+        from . import outputs
+        outputs.write_columns(
+            outputs.output_filename(filename, config['output_format']),
+            outputs.traj_columns(self.traj, config['traj_dtype'],
+                                 config['traj_stride']),
+            config['output_format'])
 
     def write_outputs(self):
         """Write quantities of interest to YAML, and optional traj to HDF5."""
@@ -262,9 +608,27 @@ class Sim():
         if self.inputs['config']['write_traj']:
             self.write_trajectories(self.inputs['config']['traj_filename'])
 
-    def run(self):
-        """Run the simulation."""
-        def print_inputs(gname):
+    @property
+    def traj(self):
+        """Trajectory DataFrame of the last run, indexed by time.
+
+        The DataFrame is only built when the trajectory is first requested.
+        Runs with an event-driven integrator keep the solver's dense output
+        until then, and resample it onto the ``dt`` grid.
+        """
+        if self._traj is None and self._make_traj is not None:
+            self._traj = self._make_traj()
+            self._make_traj = None
+        return self._traj
+
+    @traj.setter
+    def traj(self, traj):
+        self._traj = traj
+        self._make_traj = None
+
+    def print_inputs(self):
+        """Print the input parameters, one group at a time."""
+        for gname in self.inputs.keys():
             print(f'{gname} Parameters')
             print('----------------')
             names = sorted(list(self.inputs[gname].keys()))
@@ -275,68 +639,269 @@ class Sim():
                                f'{self.inputs[gname][name]}\n')
             print(output_str)
 
-        #  Print the input parameters
-        if self.args.verbose:
-            for input_group in self.inputs.keys():
-                print_inputs(input_group)
-
-        # pylint: disable=C0103,W0613
-        # NOTE (esb): "t" argument dictated by ODE solver, despite note being
-        #             used (W0613)
-        # TODO: (esb) consider using better, longer variable names. (C0103)
-
-        def x_dot(x, _, params):
-            """Differential equations for ODE solver.
-
-            x is a vector consisting of [p_x, p_y, p_z, v_x, v_y, v_z, theta_x, theta_y, theta_z, w_x, w_y, w_z]
-            """
-            mass = params['m']
-            g = np.array(params['g_LL'])
-            A = (params['D'] / 2.0)**2 * np.pi
-            eD = params['eD']
-            S = params['S']
-
-            wind_rel_vel = x[3:6] - np.array(params['wind'])
-            wind_vel_mag = np.linalg.norm(wind_rel_vel)
-            vel_mag = np.linalg.norm(x[3:6])
-            fpa = np.arctan2(x[5], np.linalg.norm(x[3:5]))
-            rho = getStandardDensity(x[2], units='m') * params['rho_scale']
-            l_ref = np.sqrt(4 * A / np.pi)
-            Cd, Re = calc_drag_coeff(x[2], wind_vel_mag, l_ref, rho, eD)
-
-            q_dyn = 0.5 * rho * wind_vel_mag**2
-            drag_vec = -q_dyn * Cd * A * wind_rel_vel / wind_vel_mag
-            magnus_vec = S * np.cross(x[9:12], wind_rel_vel)
-            accel_vec = (drag_vec + magnus_vec) / mass + g 
-
-            derivs = [x[3],  # map \dot{x} to itself
-                      x[4],  # map \dot{y} to itself
-                      x[5],  # map \dot{z} to itself
-                      accel_vec[0],
-                      accel_vec[1],
-                      accel_vec[2],
-                      x[9],
-                      x[10],
-                      x[11],
-                      0.0,  # no angular acceleration modeled
-                      0.0,  # no angular acceleration modeled
-                      0.0]  # no angular acceleration modeled
-            return derivs
-        # pylint: enable=C0103,W0613
-
-        # Initial Condition
+    def print_qoi(self):
+        """Print the Quantities of Interest."""
+        print('Quantities of Interest (QoI):')
+        print('-----------------------------')
+        print(f"-- Distance Travelled: {self.qoi['max_range']:12.6f} m")
+        print(f"-- Max Height:         {self.qoi['max_height']:12.6f} m")
+        # print('-- time @ max height:  %12.6f s' %
+        #       float(t_at_max_h))
+        print(f"-- time @ impact:      {self.qoi['time_of_flight']:12.6f} s")
+        if self.impact is not None:
+            pos = ', '.join(f'{p:.6f}' for p in self.impact['pos_LL'])
+            print(f'-- impact position:   [{pos}] m')
+        if self.stats:
+            print(f"-- RHS evaluations:   {self.stats['n_rhs']:12d}")
+            print(f"-- integrator steps:  {self.stats['n_steps']:12d}")
+        gradients = [name for name in self.qoi if '/' in name]
+        if gradients:
+            max_width = max(len(name) for name in gradients)
+            print('Gradients:')
+            for name in gradients:
+                print(f'-- {name.ljust(max_width + 2)}: '
+                      f'{self.qoi[name]:14.6e}')
+
+    def initial_state(self):
+        """Return the initial state vector built from the state inputs."""
         ang = self.inputs['state']['angle'] * np.pi / 180.
         az = self.inputs['state']['azimuth'] * np.pi / 180.
         vel_mag = self.inputs['state']['vel_mag']
-        x0 = np.array(
-            self.inputs["state"]["pos_LL"]
-            + [np.cos(ang) * np.cos(az) * vel_mag, 
+        return np.array(
+            list(self.inputs["state"]["pos_LL"])
+            + [np.cos(ang) * np.cos(az) * vel_mag,
                np.cos(ang) * np.sin(az) * vel_mag,
                np.sin(ang) * vel_mag]
             + [0.0, 0.0, 0.0]
-            + self.inputs["state"]["w_LL_B_LL"]
+            + list(self.inputs["state"]["w_LL_B_LL"])
         )
-        # print(f'x0: {x0}')
+
+    def make_rhs(self):
+        """Resolve the inputs once into an allocation-free RHS kernel."""
+        atmosphere_mode = self.inputs['config']['atmosphere']
+        if atmosphere_mode not in ATMOSPHERE_MODES:
+            raise ValueError(f'atmosphere must be one of {ATMOSPHERE_MODES}')
+        if atmosphere_mode == 'table':
+            atmosphere = get_atmosphere_table()
+        else:
+            atmosphere = None
+
+        dimple_size = self.inputs['params']['eD']
+        drag_model = drag.get_drag_model(self.inputs['config']['cd_model'])
+        return RHSKernel(self.inputs['params'], drag_model.re_grid,
+                         drag_model.column(dimple_size),
+                         atmosphere=atmosphere,
+                         engine=self.inputs['config']['engine'])
+
+    def run(self, qoi_only=None):
+        """Run the simulation.
+
+        Parameters
+        ----------
+        qoi_only : bool, optional
+            Only compute the QoIs, step by step, without keeping any
+            trajectory.  Defaults to the ``qoi_only`` config input.
+
+        Returns
+        -------
+        dict
+            A copy of the QoIs, :py:attr:`qoi`, which later runs don't
+            change.
+
+        With the ``cache_filename`` config input set, the results are looked
+        up in, and stored to, that :py:mod:`golfball.cache` file first.  Full
+        runs store their trajectory too.
+
+        The cost of the run is left in :py:attr:`stats`: the number of
+        right-hand side evaluations (``n_rhs``) and of integrator steps
+        (``n_steps``), both 0 for a cache hit.
+
+        With the ``sensitivities`` config input set, the forward
+        sensitivities are integrated along with the states, and
+        :py:attr:`qoi` also gets the QoI gradients of
+        :py:mod:`golfball.sensitivity`.
+
+        """
+        if qoi_only is None:
+            qoi_only = self.inputs['config']['qoi_only']
+
+        #  Print the input parameters
+        if self.args.verbose:
+            self.print_inputs()
+
+        method = self.inputs['integrator']['method']
+        if method not in INTEGRATOR_METHODS:
+            raise ValueError(f'method must be one of {INTEGRATOR_METHODS}')
+        # nothing, gradients included, carries over from a previous run
+        self.qoi = {}
+
+        cache = None
+        if self.inputs['config']['cache_filename']:
+            from .cache import cache_key, get_cache
+            cache = get_cache(self.inputs['config']['cache_filename'])
+            key = cache_key(self.inputs)
+            cached = cache.get(key, traj=not qoi_only)
+
+        if cache is not None and cached is not None:
+            self.qoi.update(cached.qoi)
+            self.impact = cached.impact
+            self.stats = {'n_rhs': 0, 'n_steps': 0}
+            self.traj = None
+            if not qoi_only:
+                self._make_traj = functools.partial(_traj_frame, *cached.traj)
+        else:
+            x_dot = self.make_rhs()
+            x0 = self.initial_state()
+            self.impact = None
+            if self.inputs['config']['sensitivities']:
+                from .sensitivity import SensitivityRHS, augmented_state
+                x_dot = SensitivityRHS(x_dot)
+                x0 = augmented_state(x0, self.inputs['state'])
+
+            if qoi_only:
+                n_steps = self._run_qoi_only(x_dot, x0, method)
+            elif method == 'odeint':
+                n_steps = self._run_odeint(x_dot, x0)
+            else:
+                n_steps = self._run_ivp(x_dot, x0, method)
+            self.stats = {'n_rhs': x_dot.n_evals, 'n_steps': int(n_steps)}
+
+            if cache is not None:
+                traj = None
+                if not qoi_only:
+                    traj = (self.traj.index.to_numpy(), self.traj.to_numpy())
+                cache.put(key, self.qoi, self.impact, traj)
+
+        if self.args.verbose:
+            self.print_qoi()
+        return dict(self.qoi)
+
+    def iter_trajectory(self, block_size=None):
+        """Integrate step by step, yielding the trajectory as it's computed.
+
+        The samples are those of :py:attr:`traj` after :py:meth:`run` with
+        the same integrator method: the ``dt`` grid up to the ground impact,
+        and for the solve_ivp methods the impact point itself.  The
+        integrator only advances when the next sample is asked for, and
+        nothing but the current block is kept, so memory use doesn't grow
+        with the flight time.  :py:attr:`qoi` (and :py:attr:`impact`) are
+        set once the stream is exhausted, and :py:attr:`stats` counts the
+        work done so far.
+
+        Parameters
+        ----------
+        block_size : int, optional
+            Yield ``(time, states)`` arrays of up to block_size samples, of
+            shapes (n,) and (n, 12).  By default each sample is yielded on
+            its own, as a ``(time, state)`` pair.
+
+        Yields
+        ------
+        tuple
+            (time, state) samples, or (time, states) blocks.
+
+        """
+        method = self.inputs['integrator']['method']
+        if method not in INTEGRATOR_METHODS:
+            raise ValueError(f'method must be one of {INTEGRATOR_METHODS}')
+        x_dot = self.make_rhs()
+        x0 = self.initial_state()
+        self.qoi = {}
+        self.impact = None
+        self.traj = None
+        self.stats = {'n_rhs': 0, 'n_steps': 0}
+
+        if method == 'odeint':
+            samples = self._odeint_samples(x_dot, x0)
+        else:
+            samples = self._ivp_samples(x_dot, x0, method)
+        if block_size is None:
+            yield from samples
+        else:
+            yield from _sample_blocks(samples, block_size)
+
+    async def aiter_trajectory(self, block_size=None):
+        """Async version of :py:meth:`iter_trajectory`.
+
+        Each sample or block is integrated in the event loop's default
+        executor, so the loop keeps running meanwhile, and only when the
+        consumer asks for it.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        samples = self.iter_trajectory(block_size)
+        done = object()
+        try:
+            while True:
+                item = await loop.run_in_executor(None, next, samples, done)
+                if item is done:
+                    return
+                yield item
+        finally:
+            samples.close()
+
+    def _odeint_samples(self, x_dot, x0):
+        """Yield the odeint grid samples above launch height, one at a time."""
+        t_init = self.inputs['time']['t_init']
+        t_stop = self.inputs['time']['t_stop']
+        dt = self.inputs['time']['dt']
+        solver = self._lsoda_solver(x_dot, x0)
+        tracker = GridQoI(x0, t_init)
+
+        yield t_init, x0.copy()
+        n_samples = int(np.ceil((t_stop - t_init) / dt))
+        for i_sample in range(1, n_samples):
+            time_k = t_init + i_sample * dt
+            x_k = solver.integrate(time_k)
+            if not solver.successful():
+                raise RuntimeError('odeint step failed.')
+            self.stats = {'n_rhs': x_dot.n_evals,
+                          'n_steps': _lsoda_steps(solver)}
+            tracker.update(time_k, x_k)
+            if tracker.landed:
+                break
+            yield time_k, x_k.copy()
+
+        self.qoi.update(tracker.qoi)
+
+    def _ivp_samples(self, x_dot, x0, method):
+        """Yield the dt grid samples of each solver step, then the impact."""
+        t_init = self.inputs['time']['t_init']
+        t_stop = self.inputs['time']['t_stop']
+        dt = self.inputs['time']['dt']
+        solver = self._ivp_solver(x_dot, x0)
+        tracker = EventQoI(x0, t_init)
+
+        yield t_init, x0.copy()
+        i_sample = 1
+        while solver.status == 'running' and not tracker.landed:
+            message = solver.step()
+            if solver.status == 'failed':
+                raise RuntimeError(f'{method} step failed: {message}')
+            self.stats = {'n_rhs': x_dot.n_evals,
+                          'n_steps': self.stats['n_steps'] + 1}
+            tracker.update(solver)
+            interpolant = None
+            # same grid as np.arange(t_init, t_end, dt)
+            while t_init + i_sample * dt < tracker.t_end:
+                if interpolant is None:
+                    interpolant = solver.dense_output()
+                yield t_init + i_sample * dt, interpolant(t_init
+                                                          + i_sample * dt)
+                i_sample += 1
+
+        yield tracker.t_end, tracker.x_end.copy()
+        self.qoi.update(tracker.qoi)
+        self.impact = tracker.impact
+
+    def _run_odeint(self, x_dot, x0):
+        """Integrate on the fixed time grid out to t_stop with odeint.
+
+        Returns the number of integrator steps.
+        """
+        from scipy.integrate import odeint
+        from .integrators import tolerances
 
         # time vector
         dt = self.inputs['time']['dt']
@@ -345,7 +910,11 @@ class Sim():
         time = np.arange(t_init, t_stop, dt)
 
         # integrate the ODE
-        traj = odeint(x_dot, x0, time, args=(self.inputs['params'],))
+        rtol, atol = tolerances(self.inputs['integrator'])
+        traj, info = odeint(x_dot, x0, time, rtol=rtol, atol=atol,
+                            full_output=True)
+        if info['message'] != 'Integration successful.':
+            raise RuntimeError(f'odeint failed: {info["message"]}')
 
         # Trim to only be for heights above initial height
         mask_above_init_height = traj[:, 2] >= traj[0, 2]
@@ -354,44 +923,213 @@ class Sim():
 
         # Store Quantities of Interest
         rel_pos = traj[:, 0:3] - traj[0, 0:3]
-        ground_dist = np.linalg.norm(traj[:, 0:2], axis=1)
         height = rel_pos[:, 2]
         max_height = height.max()
-        t_at_max_h = time[height.argmax()]
         range_mag = np.linalg.norm(rel_pos, axis=1)
         max_range = range_mag.max()
-        i_max_range = range_mag.argmax()
-        h_at_max_range = height[i_max_range]
-        t_at_max_range = time[i_max_range]
         time_of_flight = time[-1]
 
         self.qoi['max_height'] = float(max_height)
-        # self.qoi['t_at_max_height'] = float(t_at_max_h)
         self.qoi['max_range'] = float(max_range)
-        # self.qoi['t_at_max_range'] = float(t_at_max_range)
-        # self.qoi['h_at_max_range'] = float(h_at_max_range)
         self.qoi['time_of_flight'] = float(time_of_flight)
+        if x0.size > len(TRAJ_COLUMNS):
+            from .sensitivity import grid_gradients
+            self.qoi.update(grid_gradients(traj[0], traj[height.argmax()],
+                                           traj[range_mag.argmax()]))
 
-        if self.args.verbose:
-            print('Quantities of Interest (QoI):')
-            print('-----------------------------')
-            print(f"-- Distance Travelled: {self.qoi['max_range']:12.6f} m")
-            print(f"-- Max Height:         {self.qoi['max_height']:12.6f} m")
-            # print('-- time @ max height:  %12.6f s' %
-            #       float(t_at_max_h))
-            print(f'-- time @ impact:      {float(time_of_flight):12.6f} s')
-
-        self.traj = pd.DataFrame(traj)
-        self.traj.columns = ['p_LL_x', 'p_LL_y', 'p_LL_z',
-                             'v_LL_x', 'v_LL_y', 'v_LL_z',
-                             'theta_x', 'theta_y', 'theta_z',
-                             'w_x', 'w_y', 'w_z']
-        self.traj.index = time
-        self.traj.index.name = 'time'
+        self.traj = None
+        self._make_traj = functools.partial(_traj_frame, time, traj)
+        return info['nst'][-1]
+
+    def _run_ivp(self, x_dot, x0, method):
+        """Integrate with solve_ivp until the ball returns to launch height.
+
+        The QoIs come from events located on the solver's dense output: the
+        terminal ground crossing gives the exact impact time and position,
+        the vertical velocity sign change gives the apex, and the range rate
+        sign change catches any range maximum before impact.  Returns the
+        number of integrator steps.
+        """
+        from scipy.integrate import solve_ivp
+        from .integrators import solver_options
+
+        t_span = (self.inputs['time']['t_init'], self.inputs['time']['t_stop'])
+        solver_class, options = solver_options(self.inputs['integrator'],
+                                               self.inputs['time']['dt'])
+        sol = solve_ivp(x_dot.derivatives, t_span, x0, method=solver_class,
+                        events=impact_events(x0), dense_output=True,
+                        **options)
+        if not sol.success:
+            raise RuntimeError(f'solve_ivp failed: {sol.message}')
+
+        landed = sol.t_events[0].size > 0
+        if landed:
+            t_impact = sol.t_events[0][0]
+            x_impact = sol.y_events[0][0]
+        else:
+            t_impact = sol.t[-1]
+            x_impact = sol.y[:, -1]
+
+        self.qoi.update(event_qoi(x0, t_impact, x_impact, sol.y_events[1:]))
+        if x0.size > len(TRAJ_COLUMNS):
+            from .sensitivity import event_gradients
+            self.qoi.update(event_gradients(x0, x_impact, landed,
+                                            sol.y_events[1:], x_dot))
+        self.impact = {'time': float(t_impact),
+                       'pos_LL': [float(p) for p in x_impact[0:3]]}
+
+        self.traj = None
+        self._make_traj = functools.partial(_resample_dense_traj, self.inputs,
+                                            sol.sol, t_impact, x_impact)
+        return len(sol.t) - 1
+
+    def _run_qoi_only(self, x_dot, x0, method):
+        """Accumulate the QoIs one solver step at a time.
+
+        No trajectory is stored, so memory use does not grow with the flight
+        time, and the integration ends as soon as the ball has landed.  The
+        odeint method steps the same LSODA solver from one dt grid sample to
+        the next, the solve_ivp methods locate the same events as
+        :py:meth:`_run_ivp`.  Returns the number of integrator steps.
+
+        RK4 runs of the ``numba`` engine are integrated in one compiled call
+        that releases the GIL, see :py:meth:`golfball.kernels.RHSKernel.rk4_qoi`.
+        """
+        t_init = self.inputs['time']['t_init']
+        t_stop = self.inputs['time']['t_stop']
+        if method == 'RK4' and getattr(x_dot, 'engine', None) == 'numba':
+            return self._run_compiled_rk4(x_dot, x0)
+        if method == 'odeint':
+            dt = self.inputs['time']['dt']
+            solver = self._lsoda_solver(x_dot, x0)
+            tracker = GridQoI(x0, t_init)
+            # same grid as np.arange(t_init, t_stop, dt)
+            n_samples = int(np.ceil((t_stop - t_init) / dt))
+            for i_sample in range(1, n_samples):
+                time_k = t_init + i_sample * dt
+                tracker.update(time_k, solver.integrate(time_k))
+                if not solver.successful():
+                    raise RuntimeError('odeint step failed.')
+                if tracker.landed:
+                    break
+            n_steps = _lsoda_steps(solver)
+        else:
+            solver = self._ivp_solver(x_dot, x0)
+            tracker = EventQoI(x0, t_init)
+            n_steps = 0
+            while solver.status == 'running' and not tracker.landed:
+                message = solver.step()
+                if solver.status == 'failed':
+                    raise RuntimeError(f'{method} step failed: {message}')
+                n_steps += 1
+                tracker.update(solver)
+            self.impact = tracker.impact
+
+        self.qoi.update(tracker.qoi)
+        if x0.size > len(TRAJ_COLUMNS):
+            from .sensitivity import event_gradients, grid_gradients
+            if method == 'odeint':
+                self.qoi.update(grid_gradients(x0, tracker.x_max_height,
+                                               tracker.x_max_range))
+            else:
+                self.qoi.update(event_gradients(x0, tracker.x_end,
+                                                tracker.landed,
+                                                tracker.event_states, x_dot))
+        self.traj = None
+        return n_steps
+
+    def _run_compiled_rk4(self, x_dot, x0):
+        """Integrate the QoIs with the compiled RK4 of the RHS kernel."""
+        from .integrators import solver_options
+
+        _, options = solver_options(self.inputs['integrator'],
+                                    self.inputs['time']['dt'])
+        max_height, max_range, time_of_flight, impact_pos, n_steps = (
+            x_dot.rk4_qoi(x0, self.inputs['time']['t_init'],
+                          self.inputs['time']['t_stop'], options['step']))
+        self.qoi.update({'max_height': float(max_height),
+                         'max_range': float(max_range),
+                         'time_of_flight': float(time_of_flight)})
+        self.impact = {'time': float(time_of_flight),
+                       'pos_LL': [float(p) for p in impact_pos]}
+        self.traj = None
+        return n_steps
+
+    def _lsoda_solver(self, x_dot, x0):
+        """Return the odeint method's LSODA solver, to step along the grid."""
+        from scipy import integrate
+        from .integrators import tolerances
+
+        rtol, atol = tolerances(self.inputs['integrator'])
+        solver = integrate.ode(lambda t, x: x_dot(x, t))
+        solver.set_integrator('lsoda', rtol=rtol, atol=atol)
+        solver.set_initial_value(x0, self.inputs['time']['t_init'])
+        return solver
+
+    def _ivp_solver(self, x_dot, x0):
+        """Return the OdeSolver of a solve_ivp method, to step it by hand."""
+        from .integrators import solver_options
+
+        solver_class, options = solver_options(self.inputs['integrator'],
+                                               self.inputs['time']['dt'])
+        return solver_class(x_dot.derivatives, self.inputs['time']['t_init'],
+                            x0, self.inputs['time']['t_stop'], **options)
+
+
+def _lsoda_steps(solver):
+    """Return the number of steps taken by a scipy.integrate.ode LSODA."""
+    # IWORK(11) of LSODA is NST, the steps taken so far
+    return int(solver._integrator.iwork[10])  # pylint: disable=W0212
+
+
+def _traj_frame(time, traj):
+    """Return the trajectory DataFrame of states traj sampled at time.
+
+    Any sensitivities after the states are left out.
+    """
+    import pandas as pd
+
+    traj_df = pd.DataFrame(traj[:, :len(TRAJ_COLUMNS)], index=time,
+                           columns=TRAJ_COLUMNS)
+    traj_df.index.name = 'time'
+    return traj_df
+
+
+def _sample_blocks(samples, block_size):
+    """Group (time, state) samples into (times, states) blocks."""
+    if block_size < 1:
+        raise ValueError('block_size must be at least 1')
+    times = np.empty(block_size)
+    states = np.empty((block_size, len(TRAJ_COLUMNS)))
+    n_block = 0
+    for time_k, x_k in samples:
+        times[n_block] = time_k
+        states[n_block] = x_k
+        n_block += 1
+        if n_block == block_size:
+            yield times, states
+            times = np.empty(block_size)
+            states = np.empty((block_size, len(TRAJ_COLUMNS)))
+            n_block = 0
+    if n_block:
+        yield times[:n_block], states[:n_block]
+
+
+def _resample_dense_traj(inputs, dense_output, t_impact, x_impact):
+    """Resample a dense output onto the dt grid, ending at impact."""
+    dt = inputs['time']['dt']
+    time = np.arange(inputs['time']['t_init'], t_impact, dt)
+    if time.size:
+        traj = np.vstack([dense_output(time).T, x_impact])
+    else:
+        traj = x_impact[np.newaxis, :]
+    return _traj_frame(np.append(time, t_impact), traj)
 
 
 def load_gball_h5(h5_file=None):
     """Load the saved Pandas DataFrame from the specified HDF5 file."""
+    import pandas as pd
+
     return pd.read_hdf(h5_file, '/traj_df')
 
 
@@ -3,7 +3,11 @@
 
 """Module for querying the 1976 US Standard Atmosphere."""
 
-import numpy as np   # needed for np.sqrt() and np.exp()
+import numpy as np   # needed for np.sqrt(), np.exp() and np.power()
+
+# Tops of the atmosphere layers in geopotential height [km].  Each layer
+# includes its top, matching the "<=" tests of getStandardTemperature.
+LAYER_TOPS = np.array([11.0, 20.0, 32.0, 47.0, 51.0, 71.0, 84.85])
 
 
 def getGeopotential(altitude, units='km', earth_radius=6356.766):
@@ -61,6 +65,9 @@ def getStandardPressure(altitude=0.0, units='km'):
 
     Validation data:
     https://www.avs.org/AVS/files/c7/c7edaedb-95b2-438f-adfb-36de54f87b9e.pdf
+
+    NOTE: np.power is used (rather than **) so these results are bit-for-bit
+          the same as the array versions below on every platform.
     """
 
     geopot_height = getGeopotential(altitude, units=units)
@@ -68,19 +75,19 @@ def getStandardPressure(altitude=0.0, units='km'):
     t = getStandardTemperature(geopot_height)
 
     if geopot_height <= 11:
-        pressure = 101325.0 * (288.15 / t) ** -5.255877
+        pressure = 101325.0 * np.power(288.15 / t, -5.255877)
     elif geopot_height <= 20:
         pressure = 22632.06 * np.exp(-0.1577 * (geopot_height - 11))
     elif geopot_height <= 32:
-        pressure = 5474.889 * (216.65 / t) ** 34.16319
+        pressure = 5474.889 * np.power(216.65 / t, 34.16319)
     elif geopot_height <= 47:
-        pressure = 868.0187 * (228.65 / t) ** 12.2011
+        pressure = 868.0187 * np.power(228.65 / t, 12.2011)
     elif geopot_height <= 51:
         pressure = 110.9063 * np.exp(-0.1262 * (geopot_height - 47))
     elif geopot_height <= 71:
-        pressure = 66.93887 * (270.65 / t) ** -12.2011
+        pressure = 66.93887 * np.power(270.65 / t, -12.2011)
     elif geopot_height <= 84.85:
-        pressure = 3.956420 * (214.65 / t) ** -17.0816
+        pressure = 3.956420 * np.power(214.65 / t, -17.0816)
     else:
         raise ValueError('altitude must be less than 84.85 km.')
 
@@ -112,6 +119,106 @@ def getSpeedOfSound(altitude=0.0, units='km'):
 
     return np.sqrt(gamma * pres/dens)
 
+def getLayerIndex(geopot_height):
+    """Return the index of the atmosphere layer for each geopotential height.
+
+    Layer i spans LAYER_TOPS[i-1] < geopot_height <= LAYER_TOPS[i], the same
+    bands as the if/elif chain in getStandardTemperature.
+
+    Raises ValueError if any height is above 84.85 km (or is NaN).
+    """
+
+    layer = np.searchsorted(LAYER_TOPS, geopot_height, side='left')
+    if np.any(layer == len(LAYER_TOPS)):
+        raise ValueError('geopot_height must be less than 84.85 km.')
+
+    return layer
+
+def _evaluateLayers(layer, funcs, *args):
+    """Evaluate funcs[i](*args) on the elements that are in layer i."""
+
+    result = np.empty(np.shape(layer))
+    for i, func in enumerate(funcs):
+        in_layer = layer == i
+        if np.any(in_layer):
+            result[in_layer] = func(*(arg[in_layer] for arg in args))
+
+    return result
+
+_TEMPERATURE_FUNCS = (
+    lambda h: 288.15 - (6.5 * h),
+    lambda h: np.full(h.shape, 216.65),
+    lambda h: 196.65 + h,
+    lambda h: 228.65 + 2.8 * (h - 32),
+    lambda h: np.full(h.shape, 270.65),
+    lambda h: 270.65 - 2.8 * (h - 51),
+    lambda h: 214.65 - 2 * (h - 71),
+)
+
+_PRESSURE_FUNCS = (
+    lambda h, t: 101325.0 * np.power(288.15 / t, -5.255877),
+    lambda h, t: 22632.06 * np.exp(-0.1577 * (h - 11)),
+    lambda h, t: 5474.889 * np.power(216.65 / t, 34.16319),
+    lambda h, t: 868.0187 * np.power(228.65 / t, 12.2011),
+    lambda h, t: 110.9063 * np.exp(-0.1262 * (h - 47)),
+    lambda h, t: 66.93887 * np.power(270.65 / t, -12.2011),
+    lambda h, t: 3.956420 * np.power(214.65 / t, -17.0816),
+)
+
+def getStandardAtmosphereArray(altitude=0.0, units='km'):
+    """Get Standard Temperature, Pressure and Density for an array of altitudes.
+
+    The layer of each altitude is looked up once and shared by all three
+    quantities.  Results are bit-for-bit identical to getStandardTemperature,
+    getStandardPressure and getStandardDensity element by element.
+
+    Returns
+    -------
+    (temperature, pressure, density): tuple of ndarray (K, Pa, kg/m^3)
+        Same shape as altitude; 0-d input gives numpy scalars.
+
+    """
+
+    geopot_height = np.asarray(getGeopotential(np.asarray(altitude, float),
+                                               units=units))
+    layer = getLayerIndex(geopot_height)
+
+    temperature = _evaluateLayers(layer, _TEMPERATURE_FUNCS, geopot_height)
+    pressure = _evaluateLayers(layer, _PRESSURE_FUNCS, geopot_height,
+                               temperature)
+
+    M = 0.0289644 # kg/mol
+    R = 8.3144598 # N*m/(mol*K) -- for air
+    density = (M * pressure) / (R * temperature)
+
+    return temperature[()], pressure[()], density[()]
+
+def getStandardTemperatureArray(geopot_height=0.0):
+    """Array version of getStandardTemperature (bit-for-bit identical)."""
+
+    geopot_height = np.asarray(geopot_height, dtype=float)
+    layer = getLayerIndex(geopot_height)
+
+    return _evaluateLayers(layer, _TEMPERATURE_FUNCS, geopot_height)[()]
+
+def getStandardPressureArray(altitude=0.0, units='km'):
+    """Array version of getStandardPressure (bit-for-bit identical)."""
+
+    return getStandardAtmosphereArray(altitude, units=units)[1]
+
+def getStandardDensityArray(altitude=0.0, units='km'):
+    """Array version of getStandardDensity (bit-for-bit identical)."""
+
+    return getStandardAtmosphereArray(altitude, units=units)[2]
+
+def getSpeedOfSoundArray(altitude=0.0, units='km'):
+    """Array version of getSpeedOfSound (bit-for-bit identical)."""
+
+    _, pres, dens = getStandardAtmosphereArray(altitude, units=units)
+    gamma = 1.4
+
+    return np.sqrt(gamma * pres/dens)
+
 def getDynViscosity(T):
     """Return the dynamic viscosity in Pascal-Seconds.
 
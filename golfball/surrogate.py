@@ -0,0 +1,410 @@
+"""Surrogate models of the QoIs over a box of inputs.
+
+Design-space studies ask for the QoIs at far more points than the sim can
+run.  :py:func:`build_surrogate` samples a box of inputs with a Sobol or
+Latin hypercube design, runs the sim at every sample with
+:py:func:`golfball.sweep.run_sweep`, and fits a :py:class:`Surrogate` to the
+results, which :py:meth:`Surrogate.predict` then evaluates at up to millions
+of points per second.
+
+The box maps input names, as in the columns of a sweep design (``vel_mag``,
+``angle``, ``eD``, ``w_LL_B_LL[1]``, ``wind[0]``, ...), to their (low, high)
+bounds.  Inputs are scaled to [-1, 1] over the box, and two kinds of model
+are fitted to the scaled inputs:
+
+- ``poly`` (the default): a least squares polynomial of all terms up to a
+  total degree, evaluated term by term, each from a lower one.
+- ``rbf``: cubic radial basis functions centred on the samples, with a
+  linear tail, which interpolate the samples.  It needs no degree to be
+  chosen, but its cost grows with the number of samples.
+
+Another, independent, design of held-out samples measures the surrogate's
+error against the sim, in :py:attr:`Surrogate.errors`.  Surrogates are saved
+to, and loaded from, compressed npz files of a few arrays.
+
+Surrogates are only meaningful inside the box, and only as good as the QoIs
+are smooth there:
+
+- the ``odeint`` method quantizes the time of flight, and the range, to the
+  ``dt`` grid, so sample with a solve_ivp method, which stops at the impact
+  itself;
+- sampling ``eD`` needs the ``surface`` Cd model, and the drag crisis makes
+  the QoIs change sharply with ``eD`` below about 0.002.
+"""
+# pylint: disable=C0415
+from math import comb
+
+import numpy as np
+
+from .sweep import QOI_COLUMNS, run_sweep
+
+DESIGN_METHODS = ('sobol', 'lhs')
+
+SURROGATE_KINDS = ('poly', 'rbf')
+
+# highest polynomial degree chosen by default
+MAX_DEGREE = 6
+
+# points evaluated at a time by predict, to keep the work arrays in cache
+PREDICT_BLOCK = 4096
+
+ERROR_METRICS = ('rmse', 'max_abs', 'rel_rms')
+
+
+def sample_box(box, n_samples, method='sobol', seed=None):
+    """Return a space-filling design of samples of a box of inputs.
+
+    Parameters
+    ----------
+    box : dict
+        (low, high) bounds by input name.
+    n_samples : int
+        Number of samples.  Sobol designs are best balanced for powers of 2.
+    method : {'sobol', 'lhs'}, optional
+        Scrambled Sobol sequence, or Latin hypercube.
+    seed : int, optional
+        Seed of the scrambling, for repeatable designs.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per sample, one column per input, like a sweep design.
+
+    """
+    import warnings
+    import pandas as pd
+    from scipy.stats import qmc
+
+    if method not in DESIGN_METHODS:
+        raise ValueError(f'method must be one of {DESIGN_METHODS}')
+    lower, upper = _bounds(box)
+    if method == 'sobol':
+        sampler = qmc.Sobol(len(box), seed=seed)
+    else:
+        sampler = qmc.LatinHypercube(len(box), seed=seed)
+    with warnings.catch_warnings():
+        # Sobol designs of any size are still good designs
+        warnings.simplefilter('ignore', UserWarning)
+        unit = sampler.random(n_samples)
+    return pd.DataFrame(qmc.scale(unit, lower, upper), columns=list(box))
+
+
+def _bounds(box):
+    """Return the lower and upper bounds of a box as arrays."""
+    lower = np.array([float(low) for low, _ in box.values()])
+    upper = np.array([float(high) for _, high in box.values()])
+    if not np.all(upper > lower):
+        raise ValueError('every input of the box needs low < high')
+    return lower, upper
+
+
+def build_surrogate(box, inputs=None, n_train=512, n_test=128, kind='poly',
+                    degree=None, method='sobol', seed=None, max_workers=None):
+    """Sample the sim over a box of inputs and fit a surrogate to it.
+
+    Parameters
+    ----------
+    box : dict
+        (low, high) bounds by input name.
+    inputs : str or dict, optional
+        Base inputs of the runs, as for :py:func:`golfball.sweep.run_sweep`.
+    n_train : int, optional
+        Number of samples to fit the surrogate to.
+    n_test : int, optional
+        Number of held-out Latin hypercube samples to measure its error on;
+        0 to skip the error report.
+    kind : {'poly', 'rbf'}, optional
+        Kind of surrogate, see :py:meth:`Surrogate.fit`.
+    degree : int, optional
+        Degree of a ``poly`` surrogate.
+    method : {'sobol', 'lhs'}, optional
+        Design of the training samples.
+    seed : int, optional
+        Seed of the designs.
+    max_workers : int, optional
+        Number of worker processes of the sweeps.
+
+    Returns
+    -------
+    Surrogate
+        With the held-out error report in :py:attr:`Surrogate.errors`.
+
+    """
+    train = sample_box(box, n_train, method=method, seed=seed)
+    results = run_sweep(inputs, train, max_workers=max_workers)
+    surrogate = Surrogate.fit(box, train, results[QOI_COLUMNS], kind=kind,
+                              degree=degree)
+    if n_test:
+        test_seed = None if seed is None else seed + 1
+        test = sample_box(box, n_test, method='lhs', seed=test_seed)
+        truth = run_sweep(inputs, test, max_workers=max_workers)
+        surrogate.errors = surrogate.error_report(test, truth[QOI_COLUMNS])
+    return surrogate
+
+
+def _poly_terms(n_dims, degree):
+    """Return the exponents of all monomials up to a total degree.
+
+    Each term but the constant is a lower term, its parent, times one input,
+    so the terms can be evaluated with one product each.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        (exponents, parents, dims): exponents of shape (T, n_dims), and the
+        parent and input of each term, -1 for the constant.
+
+    """
+    exponents = [np.zeros(n_dims, dtype=np.int64)]
+    parents, dims = [-1], [-1]
+    last_dims = [0]
+    previous = [0]
+    for _ in range(degree):
+        current = []
+        for parent in previous:
+            for dim in range(last_dims[parent], n_dims):
+                term = exponents[parent].copy()
+                term[dim] += 1
+                current.append(len(exponents))
+                exponents.append(term)
+                parents.append(parent)
+                dims.append(dim)
+                last_dims.append(dim)
+        previous = current
+    return (np.array(exponents), np.array(parents, dtype=np.int64),
+            np.array(dims, dtype=np.int64))
+
+
+def _n_poly_terms(n_dims, degree):
+    """Return the number of monomials up to a total degree."""
+    return comb(n_dims + degree, degree)
+
+
+class Surrogate():
+    """A fitted surrogate of the QoIs over a box of inputs.
+
+    Parameters
+    ----------
+    names : list of str
+        Input names, in the order of the columns of array points.
+    lower, upper : numpy.ndarray
+        Bounds of the box.
+    qoi_names : list of str
+        Names of the QoIs predicted.
+    kind : {'poly', 'rbf'}
+        Kind of surrogate.
+    arrays : dict of numpy.ndarray
+        Fitted arrays: ``exponents``, ``parents``, ``dims`` and ``coeffs``
+        for ``poly``; ``centers``, ``weights`` and ``coeffs`` for ``rbf``.
+    errors : pandas.DataFrame, optional
+        Held-out error report, see :py:meth:`error_report`.
+
+    Use :py:meth:`fit`, :py:func:`build_surrogate` or :py:meth:`load` rather
+    than building one directly.
+
+    """
+
+    def __init__(self, names, lower, upper, qoi_names, kind, arrays,
+                 errors=None):
+        if kind not in SURROGATE_KINDS:
+            raise ValueError(f'kind must be one of {SURROGATE_KINDS}')
+        self.names = list(names)
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.qoi_names = list(qoi_names)
+        self.kind = kind
+        self.arrays = arrays
+        self.errors = errors
+
+    @classmethod
+    def fit(cls, box, design, results, kind='poly', degree=None):
+        """Fit a surrogate to sim results.
+
+        Parameters
+        ----------
+        box : dict
+            (low, high) bounds by input name.
+        design : pandas.DataFrame
+            Samples, with a column per input of the box.
+        results : pandas.DataFrame
+            QoIs of the samples, one column per QoI.
+        kind : {'poly', 'rbf'}, optional
+            Least squares polynomial, or cubic RBF interpolant.
+        degree : int, optional
+            Total degree of a ``poly`` surrogate.  By default the highest one,
+            up to MAX_DEGREE, with at most half as many terms as samples.
+
+        Raises
+        ------
+        ValueError :
+            Raised if there are too few samples for the surrogate.
+
+        """
+        lower, upper = _bounds(box)
+        names = list(box)
+        scaled = _scale(design[names].to_numpy(dtype=float), lower, upper)
+        values = results.to_numpy(dtype=float)
+        n_samples, n_dims = scaled.shape
+
+        if kind == 'poly':
+            if degree is None:
+                degree = 1
+                while (degree < MAX_DEGREE and _n_poly_terms(n_dims, degree + 1)
+                       <= n_samples / 2):
+                    degree += 1
+            if _n_poly_terms(n_dims, degree) > n_samples:
+                raise ValueError(f'a degree {degree} polynomial of {n_dims}'
+                                 f' inputs needs at least'
+                                 f' {_n_poly_terms(n_dims, degree)} samples')
+            exponents, parents, dims = _poly_terms(n_dims, degree)
+            terms = _poly_features(scaled.T, parents, dims)
+            coeffs = np.linalg.lstsq(terms.T, values, rcond=None)[0]
+            arrays = {'exponents': exponents, 'parents': parents,
+                      'dims': dims, 'coeffs': coeffs}
+        elif kind == 'rbf':
+            if n_samples < n_dims + 1:
+                raise ValueError(f'an RBF surrogate of {n_dims} inputs needs'
+                                 f' at least {n_dims + 1} samples')
+            tail = np.hstack([np.ones((n_samples, 1)), scaled])
+            system = np.zeros((n_samples + n_dims + 1,) * 2)
+            system[:n_samples, :n_samples] = _cubic_kernel(scaled, scaled)
+            system[:n_samples, n_samples:] = tail
+            system[n_samples:, :n_samples] = tail.T
+            rhs = np.zeros((n_samples + n_dims + 1, values.shape[1]))
+            rhs[:n_samples] = values
+            solution = np.linalg.solve(system, rhs)
+            arrays = {'centers': scaled, 'weights': solution[:n_samples],
+                      'coeffs': solution[n_samples:]}
+        else:
+            raise ValueError(f'kind must be one of {SURROGATE_KINDS}')
+
+        return cls(names, lower, upper, list(results.columns), kind, arrays)
+
+    def predict(self, points):
+        """Evaluate the surrogate.
+
+        Parameters
+        ----------
+        points : dict or pandas.DataFrame or array_like
+            Input values by name, scalars or arrays of shape (N,), or an
+            array of shape (N, n_inputs) with the columns in the order of
+            :py:attr:`names`.
+
+        Returns
+        -------
+        dict of numpy.ndarray
+            The QoIs, each of shape (N,).
+
+        """
+        if hasattr(points, 'keys'):
+            missing = [name for name in self.names if name not in points]
+            if missing:
+                raise KeyError(f'missing surrogate inputs: {missing}')
+            columns = np.broadcast_arrays(*[np.atleast_1d(
+                np.asarray(points[name], dtype=float)) for name in self.names])
+            points = np.stack(columns, axis=-1)
+        points = np.atleast_2d(np.asarray(points, dtype=float))
+        if points.shape[1] != len(self.names):
+            raise ValueError(f'points need {len(self.names)} columns:'
+                             f' {self.names}')
+
+        scaled = _scale(points, self.lower, self.upper)
+        values = np.empty((len(self.qoi_names), len(scaled)))
+        for start in range(0, len(scaled), PREDICT_BLOCK):
+            block = scaled[start:start + PREDICT_BLOCK]
+            values[:, start:start + len(block)] = self._predict_block(block)
+        return dict(zip(self.qoi_names, values))
+
+    def _predict_block(self, scaled):
+        """Return the QoIs of a block of scaled points, shape (n_qoi, N)."""
+        coeffs = self.arrays['coeffs']
+        if self.kind == 'poly':
+            terms = _poly_features(scaled.T, self.arrays['parents'],
+                                   self.arrays['dims'])
+            return coeffs.T @ terms
+        kernel = _cubic_kernel(scaled, self.arrays['centers'])
+        return ((kernel @ self.arrays['weights']).T + coeffs[0][:, None]
+                + coeffs[1:].T @ scaled.T)
+
+    def error_report(self, design, results):
+        """Return the errors of the surrogate against sim results.
+
+        Parameters
+        ----------
+        design : pandas.DataFrame
+            Samples, with a column per input of the surrogate.
+        results : pandas.DataFrame
+            QoIs of the samples from the sim.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per QoI: the root mean square error (``rmse``), the
+            largest absolute error (``max_abs``), and the RMS error relative
+            to the RMS of the QoI (``rel_rms``).
+
+        """
+        import pandas as pd
+
+        predicted = self.predict(design[self.names])
+        report = {}
+        for name in self.qoi_names:
+            truth = results[name].to_numpy(dtype=float)
+            error = predicted[name] - truth
+            rmse = np.sqrt(np.mean(error**2))
+            report[name] = (rmse, np.abs(error).max(),
+                            rmse / np.sqrt(np.mean(truth**2)))
+        return pd.DataFrame.from_dict(report, orient='index',
+                                      columns=list(ERROR_METRICS))
+
+    def save(self, filename):
+        """Save the surrogate to a compressed npz file."""
+        extra = {}
+        if self.errors is not None:
+            extra['errors'] = self.errors[list(ERROR_METRICS)].to_numpy()
+        np.savez_compressed(filename, names=np.array(self.names),
+                            lower=self.lower, upper=self.upper,
+                            qoi_names=np.array(self.qoi_names),
+                            kind=np.array(self.kind), **extra,
+                            **{f'array_{name}': val
+                               for name, val in self.arrays.items()})
+
+    @classmethod
+    def load(cls, filename):
+        """Load a surrogate saved by :py:meth:`save`."""
+        with np.load(filename) as saved:
+            qoi_names = saved['qoi_names'].tolist()
+            errors = None
+            if 'errors' in saved.files:
+                import pandas as pd
+                errors = pd.DataFrame(saved['errors'], index=qoi_names,
+                                      columns=list(ERROR_METRICS))
+            arrays = {name[len('array_'):]: saved[name]
+                      for name in saved.files if name.startswith('array_')}
+            return cls(saved['names'].tolist(), saved['lower'],
+                       saved['upper'], qoi_names, str(saved['kind']), arrays,
+                       errors=errors)
+
+
+def _scale(points, lower, upper):
+    """Map points of the box to [-1, 1] in every input."""
+    return (2.0 * points - (upper + lower)) / (upper - lower)
+
+
+def _poly_features(scaled_t, parents, dims):
+    """Return the polynomial terms of points given as (n_inputs, N) rows."""
+    terms = np.empty((len(parents), scaled_t.shape[1]))
+    terms[0] = 1.0
+    for i_term in range(1, len(parents)):
+        np.multiply(terms[parents[i_term]], scaled_t[dims[i_term]],
+                    out=terms[i_term])
+    return terms
+
+
+def _cubic_kernel(points, centers):
+    """Return the cubic RBF kernel r**3 between points and centers."""
+    dist2 = ((points**2).sum(axis=1)[:, None]
+             + (centers**2).sum(axis=1)[None, :]
+             - 2.0 * points @ centers.T)
+    np.maximum(dist2, 0.0, out=dist2)
+    return dist2 * np.sqrt(dist2)
@@ -0,0 +1,338 @@
+"""Parameter sweeps over a process pool, one QoI table for the whole design.
+
+A sweep takes a base set of inputs and a design table with one row per run.
+Each column of the design overrides one :py:class:`golfball.sim.Sim` input,
+named as in the input file (``angle``, ``eD``, ``method``, ...).  Single
+entries of the vector inputs are named with an index, e.g. ``wind[0]``.
+
+The runs are sent to a ``ProcessPoolExecutor`` in chunks of rows.  Every
+worker process imports scipy, loads the Cd model and the atmosphere table once
+when it starts, and keeps them for all the chunks it runs, so a run in a sweep
+costs about the same as one ``Sim.run`` in a warm interpreter.  The runs only
+compute the QoIs (see ``qoi_only``), and the results come back as one
+DataFrame, with the design columns followed by one column per QoI and the
+cost of each run, its RHS evaluations and integrator steps.  Given a
+``traj_filename``, the full trajectories go to one
+:py:mod:`golfball.trajstore` file as well.
+"""
+# pylint: disable=C0415
+import sys
+import os
+import argparse
+import copy
+import re
+
+from . import drag
+from .atmosphere import get_atmosphere_table
+from .sim import Sim, default_inputs
+
+QOI_COLUMNS = ['max_height', 'max_range', 'time_of_flight']
+
+# Sim.stats of each run, after the QoIs
+STATS_COLUMNS = ['n_rhs', 'n_steps']
+
+# chunks per worker, so that workers finishing early pick up more work
+CHUNKS_PER_WORKER = 4
+
+_INDEXED_KEY = re.compile(r'^(\w+)\[(\d+)\]$')
+
+# inputs of the current worker process, set by _init_worker
+_WORKER_INPUTS = None
+
+
+def main(arg_list=None):
+    """Run a sweep from the command line and write the QoI table.
+
+    Parameters
+    ----------
+    arg_list : list of str, optional
+        List of individual commandline arguments to invoke main with. If
+        omitted, the actual commandline arguments will be used.
+
+    """
+    if arg_list is None:
+        arg_list = sys.argv[1:]
+    args = _make_parser().parse_args(arg_list)
+    _table_format(args.out_filename)
+
+    results = run_sweep(args.in_filename, read_design(args.design),
+                        max_workers=args.jobs, chunksize=args.chunksize,
+                        traj_filename=args.traj_filename)
+    write_results(results, args.out_filename)
+    if args.verbose:
+        print(results)
+
+
+def _make_parser():
+    """Define command line interface (CLI) argument parser."""
+    parser = argparse.ArgumentParser(
+        prog='gball-sweep',
+        description="run golfball sims for every row of a design table")
+
+    parser.add_argument("--verbose", "-v", action='store_true',
+                        help="print the QoI table to STDOUT")
+    parser.add_argument("--in_filename", '-i', default=None,
+                        help="filename of YAML w/ the base inputs.  default:"
+                        " the default inputs")
+    parser.add_argument("--design", '-d', required=True,
+                        help="design table of input overrides, one run per"
+                        " row (.csv, .parquet or .h5)")
+    parser.add_argument("--out_filename", '-o', default='sweep_qoi.csv',
+                        help="QoI table output file (.csv, .parquet or .h5)."
+                        "  default: sweep_qoi.csv")
+    parser.add_argument("--traj_filename", default=None,
+                        help="also write every trajectory to this single HDF5"
+                        " trajectory store.  default: QoIs only")
+    parser.add_argument("--jobs", '-j', default=None, type=int,
+                        help="number of worker processes.  default: the"
+                        " number of CPUs")
+    parser.add_argument("--chunksize", default=None, type=int,
+                        help="runs sent to a worker at a time.  default:"
+                        f" about {CHUNKS_PER_WORKER} chunks per worker")
+    return parser
+
+
+def _table_format(filename):
+    """Return the table format of a filename from its extension."""
+    ext = os.path.splitext(filename)[1].lower()
+    formats = {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet',
+               '.h5': 'hdf', '.hdf5': 'hdf'}
+    if ext not in formats:
+        raise ValueError(f'{filename}: unknown table format, expected one of'
+                         f' {sorted(formats)}')
+    return formats[ext]
+
+
+def read_design(filename):
+    """Read a design table from a CSV, Parquet or HDF5 file.
+
+    Parquet needs pyarrow, HDF5 needs PyTables; the HDF5 file must hold a
+    single DataFrame.
+    """
+    import pandas as pd
+
+    table_format = _table_format(filename)
+    if table_format == 'csv':
+        return pd.read_csv(filename)
+    if table_format == 'parquet':
+        return pd.read_parquet(filename)
+    return pd.read_hdf(filename)
+
+
+def write_results(results, filename):
+    """Write a QoI table to a CSV, Parquet or HDF5 file."""
+    table_format = _table_format(filename)
+    if table_format == 'csv':
+        results.to_csv(filename, index=False)
+    elif table_format == 'parquet':
+        results.to_parquet(filename, index=False)
+    else:
+        results.to_hdf(filename, key='/sweep_qoi', index=False)
+
+
+def base_inputs(inputs=None):
+    """Return the base inputs of a sweep as plain dicts, with defaults filled.
+
+    Parameters
+    ----------
+    inputs : str or dict, optional
+        Input YAML filename, or input groups.  The default inputs if omitted.
+
+    """
+    if inputs is None:
+        return default_inputs()
+    if isinstance(inputs, dict):
+        return _plain(Sim.from_dict(inputs).inputs)
+    if not os.path.isfile(inputs):
+        raise FileNotFoundError(f'{inputs}')
+    from ruamel.yaml import YAML
+    with open(inputs, 'r', encoding='utf8') as inputfile:
+        return base_inputs(_plain(YAML(typ='safe').load(inputfile)))
+
+
+def _plain(value):
+    """Convert YAML mappings and sequences to dicts and lists, recursively."""
+    if isinstance(value, dict):
+        return {key: _plain(val) for key, val in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(val) for val in value]
+    return value
+
+
+def input_paths(inputs, columns):
+    """Map design columns to (group, name, index) locations in the inputs.
+
+    Raises
+    ------
+    ValueError :
+        Raised if a column doesn't name an input.
+
+    """
+    groups = {name: group for group, values in inputs.items()
+              for name in values}
+    paths = {}
+    unknown = []
+    for column in columns:
+        match = _INDEXED_KEY.match(str(column))
+        name, index = ((match.group(1), int(match.group(2))) if match
+                       else (str(column), None))
+        if name not in groups:
+            unknown.append(column)
+            continue
+        value = inputs[groups[name]][name]
+        if index is not None and (not isinstance(value, list)
+                                  or index >= len(value)):
+            unknown.append(column)
+            continue
+        paths[column] = (groups[name], name, index)
+    if unknown:
+        raise ValueError(f'design columns are not Sim inputs: {unknown}')
+    return paths
+
+
+def apply_overrides(inputs, overrides, paths=None):
+    """Return a copy of the inputs with one design row's overrides applied.
+
+    Parameters
+    ----------
+    inputs : dict
+        Base input groups.
+    overrides : dict
+        Values by design column name.
+    paths : dict, optional
+        Column locations from a previous call, to skip looking them up.
+
+    """
+    if paths is None:
+        paths = input_paths(inputs, overrides)
+    inputs = copy.deepcopy(inputs)
+    for column, value in overrides.items():
+        group, name, index = paths[column]
+        value = value.item() if hasattr(value, 'item') else value
+        if index is None:
+            inputs[group][name] = value
+        else:
+            inputs[group][name][index] = value
+    return inputs
+
+
+def warm_up(inputs):
+    """Import scipy and load the lookups that runs from these inputs share."""
+    import scipy.integrate  # noqa: F401 pylint: disable=W0611
+    drag.get_drag_model(inputs['config']['cd_model'])
+    if inputs['config']['atmosphere'] == 'table':
+        get_atmosphere_table()
+
+
+def _init_worker(inputs, paths, traj_queue=None, writer_stopped=None):
+    """Keep the base inputs and warm up the lookups a worker's runs share."""
+    global _WORKER_INPUTS  # pylint: disable=W0603
+    _WORKER_INPUTS = (inputs, paths, traj_queue, writer_stopped)
+    warm_up(inputs)
+
+
+def _run_rows(first_id, rows):
+    """Run one chunk of design rows and return a list of QoI and stats dicts.
+
+    The rows' run ids start at first_id.  With a trajectory queue, full runs
+    are done and their trajectories are put on the queue.
+    """
+    inputs, paths, traj_queue, writer_stopped = _WORKER_INPUTS
+    results = []
+    for run_id, overrides in enumerate(rows, first_id):
+        sim = Sim.from_dict(apply_overrides(inputs, overrides, paths))
+        sim.run(qoi_only=traj_queue is None)
+        if traj_queue is not None:
+            from .trajstore import put_trajectory
+            put_trajectory(traj_queue,
+                           (run_id, (sim.traj.index.to_numpy(dtype=float),
+                                     sim.traj.to_numpy())), writer_stopped)
+        results.append({**sim.qoi, **sim.stats})
+    return results
+
+
+def run_sweep(inputs, design, max_workers=None, chunksize=None,
+              traj_filename=None):
+    """Run a Sim for every row of a design table, over a process pool.
+
+    Parameters
+    ----------
+    inputs : str or dict or None
+        Base inputs: an input YAML filename, input groups, or None for the
+        default inputs.
+    design : pandas.DataFrame
+        One row per run, one column per overridden input.
+    max_workers : int, optional
+        Number of worker processes; the number of CPUs if omitted.  With 1,
+        the runs are done in this process.
+    chunksize : int, optional
+        Number of rows sent to a worker at a time.  By default the rows are
+        split into about CHUNKS_PER_WORKER chunks per worker.
+    traj_filename : str, optional
+        If given, the full trajectories are written to this
+        :py:class:`golfball.trajstore.TrajectoryStore` file, replacing it,
+        with the row numbers as run ids.  Otherwise only the QoIs are
+        computed.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The design, with the index reset, one column per QoI, the QoI
+        gradients if the ``sensitivities`` config input is set, and the
+        ``n_rhs`` and ``n_steps`` of each run.
+
+    Raises
+    ------
+    ValueError :
+        Raised if a design column doesn't name an input.
+
+    """
+    import pandas as pd
+
+    inputs = base_inputs(inputs)
+    design = design.reset_index(drop=True)
+    paths = input_paths(inputs, design.columns)
+    rows = design.to_dict('records')
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = max(1, min(max_workers, len(rows)))
+    if chunksize is None:
+        chunksize = -(-len(rows) // (max_workers * CHUNKS_PER_WORKER))
+    chunksize = max(1, chunksize)
+    first_ids = range(0, len(rows), chunksize)
+    chunks = [rows[i:i + chunksize] for i in first_ids]
+
+    writer = None
+    if traj_filename is not None:
+        from .trajstore import TrajectoryWriter
+        writer = TrajectoryWriter(traj_filename, mode='w',
+                                  expected_rows=len(rows) * 1000)
+    worker_args = (inputs, paths)
+    if writer is not None:
+        worker_args += (writer.queue, writer.stopped)
+
+    try:
+        if max_workers == 1:
+            _init_worker(*worker_args)
+            qoi = [q for first_id, chunk in zip(first_ids, chunks)
+                   for q in _run_rows(first_id, chunk)]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=max_workers,
+                                     initializer=_init_worker,
+                                     initargs=worker_args) as executor:
+                qoi = [q for chunk_qoi in executor.map(_run_rows, first_ids,
+                                                       chunks)
+                       for q in chunk_qoi]
+    finally:
+        if writer is not None:
+            writer.close()
+
+    columns = QOI_COLUMNS + STATS_COLUMNS
+    if inputs['config'].get('sensitivities'):
+        from .sensitivity import GRADIENT_COLUMNS
+        columns = QOI_COLUMNS + GRADIENT_COLUMNS + STATS_COLUMNS
+    qoi = pd.DataFrame(qoi, columns=columns)
+    return pd.concat([design, qoi], axis=1)
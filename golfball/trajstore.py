@@ -0,0 +1,313 @@
+"""Single-file store of many trajectories, with partial reads.
+
+:py:meth:`golfball.sim.Sim.write_trajectories` writes one HDF5 file per run,
+which has to be read whole.  A :py:class:`TrajectoryStore` keeps the
+trajectories of a whole ensemble in one HDF5 file instead, as one pandas
+``table`` format dataset, ``/traj``, with a ``run_id`` and a ``time`` column
+in front of the state columns.  The dataset is chunked and compressed, and
+``run_id`` is indexed, so reading one member, or a time window or a few
+columns of it, only touches the chunks that hold it.
+
+HDF5 files can't be appended to by several processes at once.  Runs done in
+parallel send their trajectories to a :py:class:`TrajectoryWriter`, a single
+writer process fed by a queue, which appends them to the store in batches.
+:py:func:`load_ensemble_h5` is the reader that goes with
+:py:func:`golfball.sim.load_gball_h5`.
+"""
+# pylint: disable=C0415
+import multiprocessing
+import queue
+
+import numpy as np
+
+from .sim import TRAJ_COLUMNS
+
+STORE_KEY = '/traj'
+
+# runs the writer process gathers into one append
+WRITE_BATCH = 64
+
+# seconds a full queue is waited on before checking the writer is still up
+PUT_TIMEOUT = 1.0
+
+
+class TrajectoryStore():
+    """Ensemble trajectories in one chunked, compressed HDF5 table.
+
+    Parameters
+    ----------
+    filename : str
+        HDF5 file.
+    mode : {'a', 'r', 'w'}, optional
+        Open for appending (the default), read only, or to overwrite.
+    complevel : int, optional
+        Compression level, 0 to 9.
+    complib : str, optional
+        PyTables compression library.
+    expected_rows : int, optional
+        Rough number of rows the store will hold, which PyTables uses to
+        pick the chunk size when the dataset is created.
+
+    """
+
+    def __init__(self, filename, mode='a', complevel=5, complib='blosc:lz4',
+                 expected_rows=1000000):
+        import pandas as pd
+
+        self.filename = filename
+        self.expected_rows = expected_rows
+        self._store = pd.HDFStore(filename, mode=mode, complevel=complevel,
+                                  complib=complib)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the file."""
+        self._store.close()
+
+    def append(self, run_id, traj):
+        """Append the trajectory of one run.
+
+        Parameters
+        ----------
+        run_id : int
+            Id of the run.  Appending an id again adds rows to that run.
+        traj : pandas.DataFrame or tuple of numpy.ndarray
+            Trajectory indexed by time, like :py:attr:`golfball.sim.Sim.traj`,
+            or its (time, states) arrays.
+
+        """
+        self.append_many([(run_id, traj)])
+
+    def append_many(self, runs):
+        """Append the trajectories of several (run_id, traj) pairs at once."""
+        import pandas as pd
+
+        if not runs:
+            return
+        run_ids, times, states = [], [], []
+        for run_id, traj in runs:
+            if isinstance(traj, pd.DataFrame):
+                traj = (traj.index.to_numpy(dtype=float), traj.to_numpy())
+            run_ids.append(np.full(len(traj[0]), run_id, dtype=np.int64))
+            times.append(traj[0])
+            states.append(traj[1])
+        frame = pd.DataFrame(np.concatenate(states), columns=TRAJ_COLUMNS)
+        frame.insert(0, 'time', np.concatenate(times))
+        frame.insert(0, 'run_id', np.concatenate(run_ids))
+        self._store.append(STORE_KEY, frame,
+                           format='table', index=False,
+                           data_columns=['run_id', 'time'],
+                           expectedrows=self.expected_rows)
+
+    def create_index(self):
+        """Index the run_id column for fast selections of members.
+
+        Appends don't update the index; :py:class:`TrajectoryWriter` indexes
+        the store when it closes.
+        """
+        if STORE_KEY in self._store:
+            self._store.create_table_index(STORE_KEY,
+                                           columns=['run_id'],
+                                           optlevel=6, kind='medium')
+
+    def run_ids(self):
+        """Return the sorted ids of the stored runs."""
+        if STORE_KEY not in self._store:
+            return np.array([], dtype=np.int64)
+        return np.unique(self._store.select_column(STORE_KEY, 'run_id'))
+
+    def select(self, run_id=None, t_range=None, columns=None):
+        """Read part of the store.
+
+        Parameters
+        ----------
+        run_id : int or list of int, optional
+            Runs to read; all runs if omitted.
+        t_range : tuple of float, optional
+            (t_min, t_max) time window to read, ends included.
+        columns : list of str, optional
+            State columns to read; all of them if omitted.
+
+        Returns
+        -------
+        pandas.DataFrame
+            For a single run_id, indexed by time like
+            :py:func:`golfball.sim.load_gball_h5`; otherwise indexed by
+            (run_id, time).
+
+        """
+        where = []
+        if run_id is not None:
+            run_ids = np.atleast_1d(run_id).astype(np.int64).tolist()
+            where.append(f'run_id in {run_ids}' if len(run_ids) > 1
+                         else f'run_id == {run_ids[0]}')
+        if t_range is not None:
+            where.append(f'time >= {float(t_range[0])!r}')
+            where.append(f'time <= {float(t_range[1])!r}')
+        if columns is not None:
+            unknown = [name for name in columns if name not in TRAJ_COLUMNS]
+            if unknown:
+                raise KeyError(f'not trajectory columns: {unknown}')
+            columns = ['run_id', 'time'] + list(columns)
+
+        frame = self._store.select(STORE_KEY, where=where or None,
+                                   columns=columns)
+        if np.ndim(run_id) == 0 and run_id is not None:
+            return frame.drop(columns='run_id').set_index('time')
+        return frame.set_index(['run_id', 'time'])
+
+
+def load_ensemble_h5(h5_file, run_id=None, t_range=None, columns=None):
+    """Load part of a trajectory store, see :py:meth:`TrajectoryStore.select`.
+
+    Companion of :py:func:`golfball.sim.load_gball_h5` for files written by
+    :py:class:`TrajectoryStore`.
+    """
+    with TrajectoryStore(h5_file, mode='r') as store:
+        return store.select(run_id=run_id, t_range=t_range, columns=columns)
+
+
+def _write_from_queue(filename, runs, store_kwargs, stopped):
+    """Append (run_id, traj) items from a queue until a None arrives.
+
+    stopped is set when the writer stops, whether it finished or failed.
+    """
+    try:
+        with TrajectoryStore(filename, **store_kwargs) as store:
+            done = False
+            while not done:
+                batch = [runs.get()]
+                while len(batch) < WRITE_BATCH:
+                    try:
+                        batch.append(runs.get_nowait())
+                    except queue.Empty:
+                        break
+                stops = [i for i, item in enumerate(batch) if item is None]
+                if stops:
+                    done = True
+                    batch = batch[:stops[0]]
+                store.append_many(batch)
+            store.create_index()
+    finally:
+        stopped.set()
+
+
+def put_trajectory(runs, item, stopped):
+    """Put a (run_id, (time, states)) item on a TrajectoryWriter's queue.
+
+    Parameters
+    ----------
+    runs : multiprocessing.Queue
+        The writer's :py:attr:`TrajectoryWriter.queue`.
+    item : tuple
+        The item.
+    stopped : multiprocessing.Event
+        The writer's :py:attr:`TrajectoryWriter.stopped`.
+
+    Raises
+    ------
+    RuntimeError :
+        Raised if the writer has stopped, instead of waiting for room on its
+        queue forever.
+
+    """
+    while True:
+        if stopped.is_set():
+            # items nobody will read mustn't hold up this process's exit
+            runs.cancel_join_thread()
+            raise RuntimeError('the trajectory writer has stopped')
+        try:
+            runs.put(item, timeout=PUT_TIMEOUT)
+            return
+        except queue.Full:
+            pass
+
+
+class TrajectoryWriter():
+    """A writer process that appends the trajectories put on its queue.
+
+    Parameters
+    ----------
+    filename : str
+        HDF5 file of the :py:class:`TrajectoryStore`.
+    **store_kwargs
+        Passed on to :py:class:`TrajectoryStore`.
+
+    Any process can call :py:meth:`put`, or :py:func:`put_trajectory` with
+    :py:attr:`queue` and :py:attr:`stopped`; pass both to worker processes
+    when they are started.  :py:meth:`close` waits for everything put so far
+    to be written.  If the writer fails, puts raise instead of blocking on
+    the full queue.
+
+    """
+
+    def __init__(self, filename, **store_kwargs):
+        context = multiprocessing.get_context()
+        self.queue = context.Queue(maxsize=4 * WRITE_BATCH)
+        self.stopped = context.Event()
+        self._process = context.Process(
+            target=_write_from_queue,
+            args=(filename, self.queue, store_kwargs, self.stopped),
+            daemon=True)
+        self._process.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def put(self, run_id, traj):
+        """Queue the trajectory DataFrame of one run for writing.
+
+        Only its arrays are sent to the writer, which is cheaper.
+
+        Raises
+        ------
+        RuntimeError :
+            Raised if the writer process has exited.
+
+        """
+        self._put((run_id, (traj.index.to_numpy(dtype=float),
+                            traj.to_numpy())))
+
+    def _put(self, item):
+        """Put an item on the queue while the writer process is alive."""
+        while True:
+            try:
+                self.queue.put(item, timeout=PUT_TIMEOUT)
+                return
+            except queue.Full:
+                if not self._process.is_alive():
+                    self.queue.cancel_join_thread()
+                    raise RuntimeError('the trajectory writer has exited,'
+                                       f' exit code {self._process.exitcode}'
+                                       ) from None
+
+    def close(self):
+        """Write the queued trajectories, index them, and stop the writer.
+
+        Raises
+        ------
+        RuntimeError :
+            Raised if the writer process failed.
+
+        """
+        if self._process is None:
+            return
+        try:
+            self._put(None)
+        except RuntimeError:
+            pass  # the exit code below tells
+        self._process.join()
+        exitcode = self._process.exitcode
+        self._process = None
+        if exitcode != 0:
+            self.queue.cancel_join_thread()
+            raise RuntimeError(f'trajectory writer failed, exit code'
+                               f' {exitcode}')
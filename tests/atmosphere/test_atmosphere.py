@@ -0,0 +1,58 @@
+"""Test the precomputed standard atmosphere lookup tables."""
+
+import numpy as np
+import pytest
+
+from golfball.atmosphere import AtmosphereTable, QUANTITIES
+from golfball.atmosphere import _exact_properties
+from golfball.sim import Sim, get_args
+
+# documented maximum relative errors, see golfball.atmosphere
+MAX_REL_ERROR = {
+    'linear': {'density': 2e-7, 'temperature': 1e-9, 'viscosity': 1e-8,
+               'speed_of_sound': 1e-8},
+    'cubic': {'density': 1e-13, 'temperature': 1e-13, 'viscosity': 1e-13,
+              'speed_of_sound': 1e-13},
+}
+
+
+@pytest.mark.parametrize('kind', ['linear', 'cubic'])
+def test_table_max_error(kind):
+    """Table error against stdAtm76 stays within the documented bounds."""
+    table = AtmosphereTable(kind=kind)
+    altitudes = np.linspace(table.z_min, table.z_max, 100003)
+    exact = _exact_properties(altitudes)
+
+    for name in QUANTITIES:
+        rel_error = getattr(table, name)(altitudes) / getattr(exact, name) - 1
+        assert np.max(np.abs(rel_error)) < MAX_REL_ERROR[kind][name], name
+
+
+def test_table_scalar_matches_array():
+    """Scalar lookups equal array lookups, and fall back outside the grid."""
+    table = AtmosphereTable()
+    altitudes = np.array([-1000.0, -3.7, 0.0, 12.5, 5005.0, 11000.0,
+                          -2000.0, 20000.0])
+
+    for name in QUANTITIES:
+        from_array = getattr(table, name)(altitudes)
+        from_scalars = [getattr(table, name)(altitude)
+                        for altitude in altitudes]
+        np.testing.assert_array_equal(from_array, from_scalars)
+
+    exact = _exact_properties(altitudes[-2:])
+    np.testing.assert_array_equal(table.density(altitudes[-2:]),
+                                  exact.density)
+
+
+def test_runsim_atmosphere_table():
+    """The table atmosphere reproduces the default regression values."""
+    sim = Sim(get_args(['-i', 'tests/sim/inputs/projectile_inputs_default.yml',
+                        '--atmosphere', 'table']))
+    sim.run()
+
+    np.testing.assert_almost_equal(sim.qoi['max_height'], 50.08844542014751,
+                                   decimal=4)
+    np.testing.assert_almost_equal(sim.qoi['max_range'], 185.2417438617364,
+                                   decimal=4)
+    np.testing.assert_almost_equal(sim.qoi['time_of_flight'], 6.28)
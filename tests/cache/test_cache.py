@@ -0,0 +1,86 @@
+"""Test the on-disk result cache."""
+import numpy as np
+import pandas as pd
+
+from golfball.cache import ResultCache, cache_key, get_cache
+from golfball.sim import Sim, default_inputs, get_args
+from golfball.sweep import STATS_COLUMNS, run_sweep
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+def test_cache_key():
+    """Keys follow the inputs that change results, and nothing else."""
+    inputs = default_inputs()
+    key = cache_key(inputs)
+
+    inputs['state']['angle'] = 38
+    inputs['config']['out_filename'] = 'other.yml'
+    inputs['config']['qoi_only'] = True
+    inputs['config'].update(output_format='npz', traj_dtype='float32',
+                            traj_stride=10)
+    assert cache_key(inputs) == key
+
+    inputs['state']['angle'] = 38.5
+    assert cache_key(inputs) != key
+    inputs['state']['angle'] = 38.0
+    inputs['config']['cd_model'] = 'surface'
+    assert cache_key(inputs) != key
+
+
+def test_cache_eviction(tmp_path):
+    """The least recently used entries go first, and hits are counted."""
+    cache = ResultCache(str(tmp_path / 'cache.db'), max_bytes=400)
+    qoi = {'max_height': 1.0, 'max_range': 2.0, 'time_of_flight': 3.0}
+    for key in 'abc':
+        cache.put(key, qoi)
+    assert cache.get('a').qoi == qoi
+    cache.put('d', qoi)
+    cache.put('e', qoi)
+
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('e') is not None
+    assert cache.info().size <= 400
+    assert (cache.hits, cache.misses) == (3, 1)
+
+    cache.clear()
+    assert tuple(cache.info()) == (0, 0, 0, 0)
+
+
+def test_sim_cache(tmp_path):
+    """Cached runs give the QoIs, impact and trajectory of the first run."""
+    cache_file = str(tmp_path / 'cache.db')
+    args = ['-i', INPUTS, '--cache_filename', cache_file, '--method', 'RK45']
+
+    sim = Sim(get_args(args))
+    sim.run(qoi_only=True)
+    first = Sim(get_args(args))
+    first.run()
+    second = Sim(get_args(args))
+    second.run()
+    third = Sim(get_args(args))
+    third.run(qoi_only=True)
+
+    assert first.qoi == second.qoi == third.qoi
+    assert first.impact == second.impact == third.impact
+    pd.testing.assert_frame_equal(first.traj, second.traj)
+    assert third.traj is None
+    # the qoi_only entry had no trajectory for the first full run
+    assert get_cache(cache_file).info()[:3] == (2, 2, 1)
+
+
+def test_sweep_cache(tmp_path):
+    """Worker processes share one cache file and its counters."""
+    inputs = default_inputs()
+    inputs['config']['cache_filename'] = str(tmp_path / 'cache.db')
+    design = pd.DataFrame({'angle': np.linspace(10.0, 40.0, 6)})
+
+    first = run_sweep(inputs, design, max_workers=2, chunksize=1)
+    second = run_sweep(inputs, design, max_workers=2, chunksize=1)
+
+    pd.testing.assert_frame_equal(first.drop(columns=STATS_COLUMNS),
+                                  second.drop(columns=STATS_COLUMNS))
+    assert (second[STATS_COLUMNS] == 0).all(axis=None)
+    info = ResultCache(inputs['config']['cache_filename']).info()
+    assert (info.hits, info.misses, info.entries) == (6, 6, 6)
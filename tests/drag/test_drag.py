@@ -0,0 +1,141 @@
+"""Tests for the binary Cd table format."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from golfball.drag import (CdTable, DragModel, get_cd_surface, get_drag_model,
+                           read_cd_table, write_cd_table)
+from golfball.ensemble import initial_states, run_ensemble
+from golfball.sim import Sim, get_args
+
+
+def test_cd_table_matches_h5():
+    """The installed binary table holds exactly the HDF5 table."""
+    cd_df = pd.read_hdf('golfball/cd_table.h5', '/cd_table')
+    cd_table = read_cd_table()
+
+    assert isinstance(cd_table.cd, np.memmap)
+    pd.testing.assert_frame_equal(cd_table.to_frame(), cd_df,
+                                  check_exact=True)
+    np.testing.assert_array_equal(cd_table.column(0.0125),
+                                  cd_df.loc[:, 0.0125].values)
+    with pytest.raises(KeyError):
+        cd_table.column(0.01)
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_cd_table_round_trip(tmp_path, mmap):
+    """Written tables read back unchanged, and bad files are rejected."""
+    rng = np.random.default_rng(8)
+    table = CdTable(np.sort(rng.uniform(1e4, 1e6, 7)), np.array([0.0, 0.1]),
+                    rng.uniform(0.1, 0.5, (2, 7)))
+    filename = tmp_path / 'cd_table.bin'
+    write_cd_table(filename, table.re_grid, table.dimple_sizes, table.cd)
+
+    read_back = read_cd_table(filename, mmap=mmap)
+    for name in ('re_grid', 'dimple_sizes', 'cd'):
+        np.testing.assert_array_equal(getattr(read_back, name),
+                                      getattr(table, name))
+
+    with open(filename, 'r+b') as f_out:
+        f_out.truncate(100)
+    with pytest.raises(ValueError):
+        read_cd_table(filename, mmap=mmap)
+    with pytest.raises(ValueError):
+        read_cd_table('golfball/cd_table.h5', mmap=mmap)
+    with pytest.raises(ValueError):
+        write_cd_table(filename, table.re_grid, table.dimple_sizes,
+                       table.cd.T)
+
+
+def test_drag_model_cache():
+    """Curves are extracted once, and the least recently used is dropped."""
+    drag_model = DragModel(maxsize=2)
+    cd_table = drag_model.table
+
+    for dimple_size in (0.0, 0.0015, 0.0, 0.005):
+        np.testing.assert_array_equal(drag_model.column(dimple_size),
+                                      cd_table.column(dimple_size))
+    assert drag_model.cache_info() == (1, 3, 2, 2)
+    assert drag_model.column(0.0) is drag_model.column(0.0)
+    drag_model.column(0.0015)
+    assert drag_model.cache_info().misses == 4
+
+    with pytest.raises(KeyError):
+        drag_model.column(0.01)
+
+
+def test_drag_model_cd():
+    """Vectorized Cd matches scalar lookups, with one model for all Sims."""
+    drag_model = DragModel()
+    reynolds_no = np.geomspace(2e4, 5e5, 50)
+    dimple_size = np.resize([0.0, 0.0015, 0.005, 0.0125], 50)
+
+    drag_coeff = drag_model.cd(reynolds_no, dimple_size)
+    assert drag_coeff.shape == (50,)
+    for re_k, ed_k, cd_k in zip(reynolds_no, dimple_size, drag_coeff):
+        assert drag_model.cd(re_k, ed_k) == cd_k
+    np.testing.assert_array_equal(
+        drag_model.cd(reynolds_no, 0.005),
+        np.interp(reynolds_no, drag_model.re_grid, drag_model.column(0.005)))
+
+    inputs = 'tests/sim/inputs/projectile_inputs_default.yml'
+    sims = [Sim(get_args(['-i', inputs])) for _ in range(2)]
+    sims[0].make_rhs()
+    hits, misses, _, _ = get_drag_model().cache_info()
+    sims[1].make_rhs()
+    assert get_drag_model().cache_info()[0:2] == (hits + 1, misses)
+
+
+def test_cd_surface():
+    """The surface follows the table, and is continuous in eD."""
+    surface = get_cd_surface()
+    cd_table = read_cd_table()
+
+    assert surface.dimple_sizes[-1] == 0.104
+    for dimple_size in cd_table.dimple_sizes:
+        error = (surface.evaluate(cd_table.re_grid, dimple_size)
+                 - cd_table.column(dimple_size))
+        assert np.max(np.abs(error)) < 6e-3
+
+    reynolds_no = np.geomspace(1e4, 5e6, 1000)
+    dimple_size = np.linspace(0.0, 0.104, 1000)
+    drag_coeff = surface.evaluate(reynolds_no, dimple_size)
+    for re_k, ed_k, cd_k in zip(reynolds_no[::37], dimple_size[::37],
+                                drag_coeff[::37]):
+        np.testing.assert_allclose(
+            np.interp(re_k, surface.re_grid, surface.column(ed_k)), cd_k,
+            rtol=1e-14)
+
+    # linear in eD between the measured curves
+    np.testing.assert_allclose(
+        surface.evaluate(reynolds_no, 0.00325),
+        0.5 * (surface.evaluate(reynolds_no, 0.0015)
+               + surface.evaluate(reynolds_no, 0.005)), rtol=1e-14)
+
+    with pytest.raises(ValueError):
+        surface.evaluate(1e5, 0.2)
+
+
+def test_drag_model_surface():
+    """The surface Cd model takes any eD, in the Sim and the ensemble."""
+    drag_model = get_drag_model('surface')
+    np.testing.assert_allclose(drag_model.cd(1.2e5, 0.05),
+                               get_cd_surface().evaluate(1.2e5, 0.05),
+                               rtol=1e-14)
+
+    inputs = 'tests/sim/inputs/projectile_inputs_default.yml'
+    dimple_sizes = [0.0125, 0.03, 0.104]
+    x0 = initial_states(38.0, 0.0, [70.0] * 3)
+    ensemble_qoi = run_ensemble(x0, m=0.0459, D=0.04222, eD=dimple_sizes,
+                                S=0.000005, cd_model='surface')
+    for i_member, dimple_size in enumerate(dimple_sizes):
+        sim = Sim(get_args(['-i', inputs, '--cd_model', 'surface',
+                            '--eD', str(dimple_size)]))
+        sim.run()
+        for key, val in sim.qoi.items():
+            np.testing.assert_allclose(ensemble_qoi[key][i_member], val,
+                                       rtol=1e-4)
+
+    with pytest.raises(KeyError):
+        Sim(get_args(['-i', inputs, '--eD', '0.03'])).run()
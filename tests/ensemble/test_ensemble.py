@@ -0,0 +1,51 @@
+"""Pytest regression tests for the batched ensemble engine."""
+import numpy as np
+
+from golfball.ensemble import initial_states, run_ensemble
+from golfball.sim import Sim, get_args
+
+PARAMS = {'m': 0.0459, 'D': 0.04222, 'S': 0.000005}
+
+
+def test_ensemble_regression():
+    """Run the default and 0 degree regression cases as one ensemble.
+
+    Source of values:  tests/sim/outputs/projectile_outputs_*.yml
+
+    """
+    x0 = initial_states(angle=[38.0, 0.0], azimuth=0.0, vel_mag=70.0)
+    qoi = run_ensemble(x0, eD=0.0125, **PARAMS)
+
+    np.testing.assert_almost_equal(qoi['max_height'],
+                                   [50.08844542014751, 0.0], decimal=4)
+    np.testing.assert_almost_equal(qoi['max_range'],
+                                   [185.2417438617364, 0.0], decimal=4)
+    np.testing.assert_almost_equal(qoi['time_of_flight'], [6.28, 0.0])
+
+
+def test_ensemble_matches_sim():
+    """Compare mixed per-member parameters against individual Sim runs."""
+    angles = np.array([10.0, 25.0, 45.0])
+    azimuths = np.array([0.0, -5.0, 12.0])
+    dimple_sizes = np.array([0.0, 1.5e-3, 5e-3])
+    winds = np.array([[0.0, 0.0, 0.0], [-3.0, 1.0, 0.0], [2.0, 0.0, 0.0]])
+    rho_scales = np.array([1.0, 0.9, 1.1])
+
+    x0 = initial_states(angles, azimuths, 65.0,
+                        w_LL_B_LL=[0.0, -150.0, 0.0])
+    qoi = run_ensemble(x0, eD=dimple_sizes, rho_scale=rho_scales, wind=winds,
+                       **PARAMS)
+
+    for i, angle in enumerate(angles):
+        sim = Sim(get_args(['-i',
+                            'tests/sim/inputs/projectile_inputs_default.yml',
+                            '--angle', str(angle),
+                            '--azimuth', str(azimuths[i]),
+                            '--vel_mag', '65.0',
+                            '--w_LL_B_LL', '0.0', '-150.0', '0.0',
+                            '--eD', str(dimple_sizes[i]),
+                            '--rho_scale', str(rho_scales[i]),
+                            '--wind', *[str(w) for w in winds[i]]]))
+        sim.run()
+        for key, val in sim.qoi.items():
+            np.testing.assert_almost_equal(qoi[key][i], val, decimal=4)
@@ -0,0 +1,111 @@
+"""Test the allocation-free right-hand side kernels."""
+import sys
+
+import numpy as np
+import pytest
+
+from golfball import kernels
+from golfball.kernels import RHSKernel
+from golfball.sim import CD_TABLE, Sim, calc_drag_coeff, get_args
+from golfball.stdAtm76 import getStandardDensity
+
+PARAMS = {'m': 0.0459, 'D': 0.04222, 'eD': 0.0125, 'S': 0.000005,
+          'g_LL': [0.0, 0.0, -9.81], 'rho_scale': 0.95,
+          'wind': [1.0, -2.0, 0.5]}
+
+STATE = np.array([1.0, 2.0, 30.0, 50.0, 3.0, 20.0,
+                  0.0, 0.0, 0.0, 10.0, -200.0, 5.0])
+
+
+def reference_x_dot(x, params):
+    """Straightforward NumPy form of the equations of motion."""
+    area = (params['D'] / 2.0)**2 * np.pi
+    wind_rel_vel = x[3:6] - np.array(params['wind'])
+    wind_vel_mag = np.linalg.norm(wind_rel_vel)
+    rho = getStandardDensity(x[2], units='m') * params['rho_scale']
+    drag_coeff, _ = calc_drag_coeff(x[2], wind_vel_mag, params['D'], rho,
+                                    params['eD'])
+    drag_vec = (-0.5 * rho * wind_vel_mag**2 * drag_coeff * area
+                * wind_rel_vel / wind_vel_mag)
+    magnus_vec = params['S'] * np.cross(x[9:12], wind_rel_vel)
+    accel_vec = (drag_vec + magnus_vec) / params['m'] + params['g_LL']
+    return np.concatenate([x[3:6], accel_vec, x[9:12], np.zeros(3)])
+
+
+def make_kernel(engine='numpy'):
+    """Build a kernel for PARAMS with the default Cd table column."""
+    return RHSKernel(PARAMS, CD_TABLE.index.values,
+                     CD_TABLE.loc[:, PARAMS['eD']].values, engine=engine)
+
+
+def test_kernel_matches_reference():
+    """The kernel reproduces the reference derivatives into one buffer."""
+    rhs = make_kernel()
+    derivs = rhs(STATE, 0.0)
+
+    np.testing.assert_allclose(derivs, reference_x_dot(STATE, PARAMS),
+                               rtol=1e-12)
+    assert rhs(STATE + 1.0, 0.1) is derivs
+
+
+def test_numba_engine_matches_numpy():
+    """The compiled kernel gives the same derivatives as the NumPy one."""
+    pytest.importorskip('numba')
+    np.testing.assert_allclose(make_kernel('numba')(STATE, 0.0),
+                               make_kernel('numpy')(STATE, 0.0), rtol=1e-14)
+
+
+def test_numba_engine_fallback(monkeypatch):
+    """Without numba, the numba engine warns and falls back to NumPy."""
+    monkeypatch.setitem(sys.modules, 'numba', None)
+    with pytest.warns(UserWarning, match='numba is not installed'):
+        kernel = kernels.get_rhs_kernel('numba')
+    assert kernel is kernels.get_rhs_kernel('numpy')
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'numba'])
+def test_runsim_engines(engine):
+    """Both engines reproduce the default regression values."""
+    if engine == 'numba':
+        pytest.importorskip('numba')
+    sim = Sim(get_args(['-i', 'tests/sim/inputs/projectile_inputs_default.yml',
+                        '--engine', engine]))
+    sim.run()
+
+    np.testing.assert_almost_equal(sim.qoi['max_height'], 50.08844542014751,
+                                   decimal=4)
+    np.testing.assert_almost_equal(sim.qoi['max_range'], 185.2417438617364,
+                                   decimal=4)
+    np.testing.assert_almost_equal(sim.qoi['time_of_flight'], 6.28)
+
+
+@pytest.mark.parametrize('engine', ['numpy', 'numba'])
+def test_rk4_qoi_matches_solver(engine):
+    """The compiled RK4 QoIs are those of the RK4 OdeSolver run."""
+    if engine == 'numba':
+        pytest.importorskip('numba')
+    args = ['-i', 'tests/sim/inputs/projectile_inputs_default.yml',
+            '--method', 'RK4', '--step', '0.05', '--w_LL_B_LL', '0', '-200',
+            '30', '--wind', '2', '1', '0']
+    solver = Sim(get_args(args))
+    solver.run(qoi_only=True)
+
+    sim = Sim(get_args(args + ['--engine', engine]))
+    rhs = sim.make_rhs()
+    max_height, max_range, time_of_flight, impact_pos, n_steps = (
+        rhs.rk4_qoi(sim.initial_state(), 0.0, 20.0, 0.05))
+    np.testing.assert_allclose([max_height, max_range, time_of_flight],
+                               [solver.qoi['max_height'],
+                                solver.qoi['max_range'],
+                                solver.qoi['time_of_flight']], rtol=1e-12)
+    np.testing.assert_allclose(impact_pos[0:2], solver.impact['pos_LL'][0:2],
+                               rtol=1e-12)
+    assert (rhs.n_evals, n_steps) == (solver.stats['n_rhs'],
+                                      solver.stats['n_steps'])
+
+
+def test_rk4_qoi_releases_gil():
+    """The numba kernels are compiled to run without the GIL."""
+    pytest.importorskip('numba')
+    assert kernels.get_rhs_kernel('numba').targetoptions['nogil']
+    assert kernels.get_rk4_qoi('numba').targetoptions['nogil']
@@ -0,0 +1,120 @@
+"""Test Monte Carlo dispersion analyses and their streaming statistics."""
+import numpy as np
+import pytest
+
+from golfball.montecarlo import (DispersionStats, QuantileSketch,
+                                 RunningMoments, check_distributions, main,
+                                 run_montecarlo)
+from golfball.sim import Sim, default_inputs, get_args
+
+INPUTS = {'integrator': {'method': 'RK45'}}
+DISTRIBUTIONS = {'vel_mag': {'dist': 'normal', 'std': 1.5},
+                 'angle': {'dist': 'uniform', 'low': 30.0, 'high': 40.0},
+                 'wind[1]': {'dist': 'triangular', 'low': -3.0,
+                             'high': 3.0},
+                 'rho_scale': {'dist': 'lognormal', 'sigma': 0.02}}
+
+
+def test_moments_merge():
+    """Merged batch moments are those of all the values at once."""
+    values = np.random.default_rng(0).normal(3.0, 2.0, (1000, 3))
+    moments = RunningMoments(3)
+    for batch in np.array_split(values, [1, 2, 300, 301, 700]):
+        moments.update(batch)
+    assert moments.count == 1000
+    np.testing.assert_allclose(moments.mean, values.mean(axis=0))
+    np.testing.assert_allclose(moments.covariance, np.cov(values.T))
+    np.testing.assert_array_equal(moments.minimum, values.min(axis=0))
+    np.testing.assert_array_equal(moments.maximum, values.max(axis=0))
+
+
+def test_quantile_sketch():
+    """Quantiles are within the relative accuracy, also after merging."""
+    values = np.random.default_rng(1).normal(1.0, 5.0, 20000)
+    sketch = QuantileSketch(0.01)
+    for batch in np.array_split(values, 7):
+        part = QuantileSketch(0.01)
+        part.update(batch)
+        sketch.merge(part)
+    assert sketch.count == values.size
+    for q in (0.0, 0.01, 0.25, 0.5, 0.9, 1.0):
+        exact = np.quantile(values, q, method='lower')
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.01)
+    assert len(sketch.positive) + len(sketch.negative) < 2000
+
+
+def test_workers_and_save(tmp_path):
+    """Results don't depend on the workers, and save and load exactly."""
+    stats = run_montecarlo(INPUTS, DISTRIBUTIONS, 50, seed=3, chunk_size=20,
+                           max_workers=1)
+    pooled = run_montecarlo(INPUTS, DISTRIBUTIONS, 50, seed=3, chunk_size=20,
+                            max_workers=2)
+    assert stats.count == 50
+    assert stats.names[-2:] == ['impact_x', 'impact_y']
+    assert stats.landing_counts.sum() == 50
+    pd_summary = stats.summary()
+    assert pd_summary.equals(pooled.summary())
+    np.testing.assert_array_equal(stats.moments.comoment,
+                                  pooled.moments.comoment)
+    np.testing.assert_array_equal(stats.landing_counts,
+                                  pooled.landing_counts)
+
+    assert pd_summary.loc['angle', 'min'] >= 30.0
+    nominal = Sim.from_kwargs(method='RK45').run(qoi_only=True)
+    assert pd_summary.loc['max_range', 'mean'] == pytest.approx(
+        nominal['max_range'], rel=0.05)
+
+    stats.save(tmp_path / 'stats.npz')
+    loaded = DispersionStats.load(tmp_path / 'stats.npz')
+    assert loaded.seed == 3
+    assert loaded.summary().equals(pd_summary)
+    np.testing.assert_array_equal(loaded.landing_counts,
+                                  stats.landing_counts)
+
+
+def test_invalid_distributions():
+    """Unknown inputs, distributions and parameters raise a ValueError."""
+    inputs = default_inputs()
+    with pytest.raises(ValueError, match='not Sim inputs'):
+        check_distributions({'spin': {'dist': 'normal', 'std': 1.0}}, inputs)
+    with pytest.raises(ValueError, match='dist must be one of'):
+        check_distributions({'angle': {'dist': 'cauchy'}}, inputs)
+    with pytest.raises(ValueError, match="uniform takes"):
+        check_distributions({'angle': {'dist': 'uniform', 'low': 1.0}},
+                            inputs)
+    checked = check_distributions({'angle': {'dist': 'normal', 'std': 2.0}},
+                                  inputs)
+    assert checked == {'angle': ('normal', (38.0, 2.0))}
+
+
+def test_cli(tmp_path, capsys, monkeypatch):
+    """gball-mc reads the montecarlo group, which gball ignores."""
+    in_filename = tmp_path / 'mc_inputs.yml'
+    in_filename.write_text(
+        'integrator:\n  method: RK45\n'
+        'montecarlo:\n  samples: 1000\n  seed: 5\n  chunk_size: 8\n'
+        '  distributions:\n    angle: {dist: normal, std: 2.0}\n',
+        encoding='utf8')
+    main(['-i', str(in_filename), '-n', '16', '-j', '1',
+          '-o', str(tmp_path / 'stats.npz')])
+    out = capsys.readouterr().out
+    assert out.startswith('16 samples, seed 5')
+    assert 'impact_y' in out
+    assert DispersionStats.load(tmp_path / 'stats.npz').count == 16
+
+    # a new seed is 128-bit entropy, saved without pickling
+    stats = run_montecarlo(INPUTS, {'angle': {'dist': 'normal', 'std': 2.0}},
+                           4, max_workers=1)
+    stats.save(tmp_path / 'entropy.npz')
+    assert DispersionStats.load(tmp_path / 'entropy.npz').seed == stats.seed
+
+    monkeypatch.chdir(tmp_path)
+    sim = Sim(get_args(['-i', str(in_filename), '--qoi_only']))
+    sim.run()
+    assert sim.inputs['integrator']['method'] == 'RK45'
+
+    # unknown names in the sim's own groups are still errors
+    typo_filename = tmp_path / 'typo_inputs.yml'
+    typo_filename.write_text('state:\n  angel: 10.0\n', encoding='utf8')
+    with pytest.raises(AttributeError, match='angel'):
+        Sim(get_args(['-i', str(typo_filename)]))
@@ -0,0 +1,68 @@
+"""Test multilevel Monte Carlo estimates."""
+import numpy as np
+import pytest
+
+from golfball.multilevel import allocate, level_inputs, run_multilevel
+
+INPUTS = {'integrator': {'method': 'RK4', 'step': 0.1}}
+LEVELS = [{'integrator': {'step': 0.5}}]
+DISTRIBUTIONS = {'vel_mag': {'dist': 'normal', 'std': 1.5},
+                 'angle': {'dist': 'uniform', 'low': 30.0, 'high': 40.0}}
+
+
+def test_allocate():
+    """Samples go where the variance is high and the cost is low."""
+    variances, costs = np.array([16.0, 0.01]), np.array([1.0, 4.0])
+    counts = allocate(variances, costs, 0.1)
+    np.testing.assert_array_equal(counts, [1680, 21])
+    assert np.sum(variances / counts) <= 0.1**2
+    np.testing.assert_array_equal(allocate([0.0, 0.0], costs, 0.1), [0, 0])
+
+
+def test_level_inputs():
+    """Coarse levels are applied over the base inputs, the finest level."""
+    all_inputs = level_inputs(INPUTS, LEVELS)
+    assert [inputs['integrator']['step'] for inputs in all_inputs] == [0.5,
+                                                                       0.1]
+    assert all_inputs[0]['integrator']['method'] == 'RK4'
+    with pytest.raises(ValueError):
+        level_inputs(INPUTS, [{'integrator': {'method': 'euler'}}])
+
+
+def test_pilot_workers():
+    """The pilot's estimate doesn't depend on the workers.
+
+    Only the pilot is reproducible: later samples follow measured costs.
+    """
+    estimates = [run_multilevel(INPUTS, DISTRIBUTIONS, 1e3, levels=LEVELS,
+                                n_pilot=12, chunk_size=5, seed=2,
+                                max_workers=max_workers)
+                 for max_workers in (1, 2)]
+    assert estimates[0].levels['n_samples'].tolist() == [12, 12]
+    assert estimates[0].levels[['mean', 'var']].equals(
+        estimates[1].levels[['mean', 'var']])
+    assert estimates[0].estimate == pytest.approx(
+        estimates[0].levels['mean'].sum())
+    # the correction is small next to the spread of the QoI
+    assert estimates[0].levels['var'][1] < 1e-3 * estimates[0].levels['var'][0]
+
+
+def test_target_std():
+    """Samples are added until the target standard error is reached."""
+    estimate = run_multilevel(INPUTS, DISTRIBUTIONS, 0.5, levels=LEVELS,
+                              n_pilot=16, seed=3, max_workers=1)
+    assert estimate.std_error <= 0.5
+    assert estimate.levels['n_samples'][0] > 16
+    assert estimate.levels['n_samples'][1] == 16
+    low, high = estimate.confidence_interval()
+    assert 170.0 < low < estimate.estimate < high < 200.0
+    assert estimate.mc_cpu_time > estimate.cpu_time
+
+    probability = run_multilevel(INPUTS, DISTRIBUTIONS, 0.1, threshold=180.0,
+                                 levels=LEVELS, n_pilot=16, seed=3,
+                                 max_workers=1)
+    assert 0.0 < probability.estimate < 1.0
+    with pytest.raises(ValueError, match='qoi must be one of'):
+        run_multilevel(INPUTS, DISTRIBUTIONS, 0.5, qoi='carry')
+    with pytest.raises(ValueError, match='n_pilot must be at least 2'):
+        run_multilevel(INPUTS, DISTRIBUTIONS, 0.5, n_pilot=0)
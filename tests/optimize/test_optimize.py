@@ -0,0 +1,91 @@
+"""Test the QoI optimizer."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from golfball.optimize import BatchObjective, main, optimize
+from golfball.sim import Sim, default_inputs, get_args
+from golfball.sweep import run_sweep
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+def lsoda_inputs():
+    """Return the default inputs with a smooth, event based integrator."""
+    inputs = default_inputs()
+    inputs['integrator'].update(method='LSODA', rtol=1e-8, atol=1e-8)
+    return inputs
+
+
+def test_batch_objective():
+    """Candidates are snapped, memoized, and run like a Sim."""
+    with BatchObjective(INPUTS, ['angle', 'vel_mag'],
+                        resolution={'angle': 0.5},
+                        max_workers=1) as objective:
+        values = objective(np.array([[30.1, 30.2, 44.0],
+                                     [65.0, 65.0, 70.0]]))
+        assert (objective.n_evals, objective.n_runs) == (3, 2)
+        assert values[0] == values[1]
+
+        sim = Sim(get_args(['-i', INPUTS, '--angle', '44', '--vel_mag', '70']))
+        sim.run(qoi_only=True)
+        assert values[2] == -sim.qoi['max_range']
+
+        assert objective([44.0, 70.0]) == values[2]
+        assert (objective.n_evals, objective.n_runs) == (4, 2)
+
+    with pytest.raises(ValueError):
+        BatchObjective(INPUTS, ['angle'], qoi='not_a_qoi', max_workers=1)
+    with pytest.raises(ValueError):
+        BatchObjective(INPUTS, ['angle'], resolution={'eD': 0.001},
+                       max_workers=1)
+
+
+def test_objectives_keep_their_inputs():
+    """Objectives run from their own inputs, whatever ran in between."""
+    with BatchObjective(INPUTS, ['angle'], max_workers=1) as objective:
+        expected = objective.evaluate([[31.0]])[0]['max_range']
+        objective.memo.clear()
+        run_sweep({'params': {'eD': 0.0}}, pd.DataFrame({'angle': [10.0]}),
+                  max_workers=1)
+        with BatchObjective({'params': {'eD': 0.0}}, ['angle'],
+                            max_workers=1) as other:
+            assert other.evaluate([[31.0]])[0]['max_range'] != expected
+        assert objective.evaluate([[31.0]])[0]['max_range'] == expected
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_optimize_angle(max_workers):
+    """The best launch angle beats every angle of a grid."""
+    inputs = lsoda_inputs()
+    result = optimize(inputs, {'angle': (10.0, 50.0)}, popsize=8,
+                      tol=1e-4, seed=0, max_workers=max_workers)
+
+    with BatchObjective(inputs, ['angle'], max_workers=1) as objective:
+        grid = -objective(np.linspace(10.0, 50.0, 41)[None, :])
+    assert result.value >= grid.max()
+    assert result.value == result.qoi['max_range']
+    assert 10.0 <= result.x['angle'] <= 50.0
+
+    history = result.history
+    assert list(history['generation']) == list(range(1, len(history) + 1))
+    assert np.all(np.diff(history['max_range']) >= 0.0)
+    assert np.all(np.diff(history['n_evals']) > 0)
+    assert result.n_runs <= result.n_evals
+
+
+def test_optimize_cli(tmp_path, capsys):
+    """gball-optimize prints the optimum and writes the history."""
+    history = tmp_path / 'history.csv'
+    main(['-i', INPUTS, '--vary', 'angle', '20', '40', '0.5', '--minimize',
+          '--qoi', 'time_of_flight', '--popsize', '5', '--seed', '1',
+          '-j', '1', '--history', str(history)])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith('Minimum time_of_flight: ')
+    # the flight is shortest at the lowest angle
+    assert lines[1].startswith('-- angle  : ')
+    assert float(lines[1].split(':')[1]) < 25.0
+    assert history.read_text().startswith('generation,time_of_flight,')
+
+    with pytest.raises(SystemExit):
+        main(['--vary', 'angle', '20'])
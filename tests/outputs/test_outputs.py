@@ -0,0 +1,57 @@
+"""Test the columnar output formats."""
+import numpy as np
+import pytest
+
+from golfball.outputs import read_columns, study_dataset
+from golfball.sim import Sim, get_args, main
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+def run_outputs(tmp_path, output_format, *args):
+    """Run main with columnar outputs in tmp_path; return the QoI and traj."""
+    main(['-i', INPUTS, '--write_traj', '--output_format', output_format,
+          '-o', str(tmp_path / 'projectile_outputs.yml'),
+          '--traj_filename', str(tmp_path / 'traj.h5')] + list(args))
+    ext = {'npz': '.npz', 'parquet': '.parquet', 'arrow': '.arrow'}
+    return (read_columns(str(tmp_path / f'projectile_outputs{ext[output_format]}')),
+            read_columns(str(tmp_path / f'traj{ext[output_format]}')))
+
+
+def test_npz_outputs(tmp_path):
+    """The QoIs are one row with the inputs; the trajectory is columnar."""
+    sim = Sim(get_args(['-i', INPUTS]))
+    sim.run()
+
+    qoi, traj = run_outputs(tmp_path, 'npz')
+    assert len(qoi) == 1
+    for key, val in sim.qoi.items():
+        assert qoi[key].iloc[0] == val
+    assert qoi['angle'].iloc[0] == 38.0
+    assert qoi['wind[2]'].iloc[0] == 0.0
+    assert list(traj.columns) == ['time'] + list(sim.traj.columns)
+    np.testing.assert_array_equal(traj['time'], sim.traj.index)
+    np.testing.assert_array_equal(traj.iloc[:, 1:], sim.traj)
+    assert not (tmp_path / 'projectile_outputs.yml').exists()
+
+    _, traj = run_outputs(tmp_path, 'npz', '--traj_dtype', 'float32',
+                          '--traj_stride', '10')
+    assert traj['p_LL_x'].dtype == np.float32
+    assert traj['time'].dtype == np.float64
+    np.testing.assert_array_equal(
+        traj['time'], np.append(sim.traj.index[::10], sim.traj.index[-1]))
+
+
+@pytest.mark.parametrize('output_format', ['parquet', 'arrow'])
+def test_arrow_outputs(tmp_path, output_format):
+    """Parquet and Arrow files of a study read back as one dataset."""
+    pytest.importorskip('pyarrow')
+    for angle in (20.0, 30.0):
+        run_dir = tmp_path / f'run{angle:.0f}'
+        run_dir.mkdir()
+        qoi, traj = run_outputs(run_dir, output_format, '--angle', str(angle))
+        assert qoi['angle'].iloc[0] == angle
+        assert traj['time'].iloc[-1] == qoi['time_of_flight'].iloc[0]
+
+    table = study_dataset(str(tmp_path), output_format).to_table()
+    assert sorted(table.column('angle').to_pylist()) == [20.0, 30.0]
@@ -0,0 +1,50 @@
+"""Test running many sims over threads and processes."""
+import numpy as np
+import pytest
+
+from golfball import Sim, run_many
+
+ANGLES = np.linspace(10.0, 50.0, 6)
+
+
+def inputs_list(engine='numpy', method='RK4'):
+    """Return input groups of shots at a range of launch angles."""
+    return [{'state': {'angle': float(angle)},
+             'integrator': {'method': method, 'step': 0.05},
+             'config': {'engine': engine}} for angle in ANGLES]
+
+
+@pytest.mark.parametrize('executor, engine', [('thread', 'numpy'),
+                                              ('thread', 'numba'),
+                                              ('process', 'numpy')])
+def test_run_many_matches_runs(executor, engine):
+    """Concurrent runs give the QoIs and stats of one-by-one runs, in order."""
+    if engine == 'numba':
+        pytest.importorskip('numba')
+    inputs = inputs_list(engine)
+    expected = []
+    for run_inputs in inputs:
+        sim = Sim.from_dict(run_inputs)
+        expected.append({**sim.run(qoi_only=True), **sim.stats})
+
+    results = run_many(inputs, executor=executor, max_workers=3)
+    assert results == expected
+    assert run_many(inputs, executor=executor, max_workers=1) == expected
+
+
+def test_run_many_numba_matches_numpy():
+    """The compiled RK4 runs of the numba engine match the numpy engine."""
+    pytest.importorskip('numba')
+    numpy_qoi = run_many(inputs_list('numpy'), max_workers=2)
+    numba_qoi = run_many(inputs_list('numba'), max_workers=2)
+    for expected, result in zip(numpy_qoi, numba_qoi):
+        assert result == pytest.approx(expected, rel=1e-12)
+
+
+def test_run_many_invalid():
+    """Bad inputs or executors fail before any run."""
+    assert not run_many([])
+    with pytest.raises(ValueError, match='executor'):
+        run_many(inputs_list(), executor='fiber')
+    with pytest.raises(ValueError, match='integrator.method'):
+        run_many(inputs_list(method='euler'))
@@ -0,0 +1,166 @@
+"""Test the evaluation server and its Dakota client."""
+import io
+import json
+import threading
+
+import pytest
+
+from golfball import dakota
+from golfball.server import EvaluationServer, request
+from golfball.sim import Sim, get_args
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+PARAMS_FILE = """\
+                     2 variables
+                      2.4000000000000000e+01 angle
+                      5.0000000000000001e-03 eD
+                     3 functions
+                     1 ASV_1:max_range
+                     0 ASV_2:max_height
+                     1 ASV_3:time_of_flight
+                     0 derivative_variables
+                     0 analysis_components
+                     1 eval_id
+                     2 variables
+                      3.0000000000000000e+01 angle
+                      2.0000000000000000e-02 eD
+                     3 functions
+                     1 ASV_1:max_range
+                     0 ASV_2:max_height
+                     1 ASV_3:time_of_flight
+                     0 derivative_variables
+                     0 analysis_components
+                     2 eval_id
+"""
+
+APREPRO_FILE = """\
+                    { DAKOTA_VARS     =                      1 }
+                    { angle           =  2.400000000000000e+01 }
+                    { DAKOTA_FNS      =                      2 }
+                    { ASV_1:response_fn_1 =                  1 }
+                    { ASV_2:response_fn_2 =                  1 }
+                    { DAKOTA_DER_VARS =                      0 }
+                    { DAKOTA_AN_COMPS =                      0 }
+                    { DAKOTA_EVAL_ID  =                      3 }
+"""
+
+
+def sim_qoi(*args):
+    """Return the QoIs of a Sim run with extra arguments."""
+    sim = Sim(get_args(['-i', INPUTS] + list(args)))
+    sim.run()
+    return sim.qoi
+
+
+def test_serve_stdio():
+    """Requests and answers are JSON lines; failures don't stop the server."""
+    requests = [{'id': 1, 'params': {'angle': 24.0}},
+                {'id': 2, 'batch': [{'vel_mag': 60.0}, {'eD': 0.03}]},
+                {'id': 3, 'params': {'not_an_input': 1.0}},
+                {'command': 'ping'},
+                {'command': 'shutdown'},
+                {'id': 4, 'params': {}}]
+    infile = io.StringIO(''.join(json.dumps(message) + '\n'
+                                 for message in requests) + 'not json\n')
+    outfile = io.StringIO()
+    with EvaluationServer(INPUTS) as server:
+        server.serve_stdio(infile, outfile)
+    responses = [json.loads(line) for line in outfile.getvalue().splitlines()]
+
+    assert len(responses) == 5
+    assert responses[0]['id'] == 1
+    assert responses[0]['qoi'] == sim_qoi('--angle', '24')
+    assert set(responses[0]['stats']) == {'n_rhs', 'n_steps'}
+    assert responses[1]['results'][0]['qoi'] == sim_qoi('--vel_mag', '60')
+    assert 'KeyError' in responses[1]['results'][1]['error']
+    assert 'not_an_input' in responses[2]['error']
+    assert responses[3] == responses[4] == {'status': 'ok'}
+
+
+def test_evaluate_batch_workers():
+    """A batch spread over worker processes gives the in-process results."""
+    batch = [{'angle': angle} for angle in (10.0, 20.0, 30.0)]
+    with EvaluationServer(INPUTS, max_workers=2) as server:
+        results = server.evaluate_batch(batch)
+    with EvaluationServer(INPUTS) as server:
+        assert results == server.evaluate_batch(batch)
+
+
+@pytest.fixture(name='socket_path')
+def fixture_socket_path(tmp_path):
+    """Run a server on a Unix socket for the duration of a test."""
+    path = str(tmp_path / 'gball.sock')
+    ready = threading.Event()
+    with EvaluationServer(INPUTS) as server:
+        thread = threading.Thread(target=server.serve_socket,
+                                  args=(path, ready))
+        thread.start()
+        ready.wait(10.0)
+        yield path
+        request({'command': 'shutdown'}, path)
+        thread.join()
+
+
+def test_dakota_client(socket_path, tmp_path):
+    """gball-dakota answers batch and APREPRO parameters files."""
+    params_file = tmp_path / 'params.in'
+    results_file = tmp_path / 'results.out'
+    params_file.write_text(PARAMS_FILE)
+    dakota.main([str(params_file), str(results_file), '-s', socket_path])
+
+    blocks = results_file.read_text().split('#\n')
+    assert len(blocks) == 2
+    qoi = sim_qoi('--angle', '24', '--eD', '0.005')
+    assert blocks[0] == (f"{qoi['max_range']:.17e} max_range\n"
+                         f"{qoi['time_of_flight']:.17e} time_of_flight\n")
+    assert blocks[1] == 'FAIL\n'  # eD 0.02 is not in the Cd table
+
+    params_file.write_text(APREPRO_FILE)
+    dakota.main([str(params_file), str(results_file), '-s', socket_path])
+    qoi = sim_qoi('--angle', '24')
+    assert results_file.read_text() == (
+        f"{qoi['max_height']:.17e} response_fn_1\n"
+        f"{qoi['max_range']:.17e} response_fn_2\n")
+
+
+def test_bad_requests():
+    """Malformed params and batches are answered, not fatal."""
+    requests = [{'id': 1, 'batch': 5},
+                {'id': 2, 'params': [1.0]},
+                {'id': 3, 'batch': [{'angle': 20.0}, 7]},
+                {'command': 'ping'}]
+    infile = io.StringIO(''.join(json.dumps(message) + '\n'
+                                 for message in requests))
+    outfile = io.StringIO()
+    with EvaluationServer(INPUTS) as server:
+        server.serve_stdio(infile, outfile)
+    responses = [json.loads(line) for line in outfile.getvalue().splitlines()]
+
+    assert [response.get('id') for response in responses] == [1, 2, 3, None]
+    assert responses[0]['error'].startswith('bad request: "batch"')
+    assert responses[1]['error'].startswith('bad request: "params"')
+    assert responses[2]['error'].startswith('bad request: "batch"')
+    assert responses[3] == {'status': 'ok'}
+
+
+def test_socket_path_in_use(socket_path, tmp_path):
+    """A regular file or a live server's socket is never replaced."""
+    with EvaluationServer(INPUTS) as server:
+        with pytest.raises(FileExistsError, match='already listening'):
+            server.serve_socket(socket_path)
+        regular_file = tmp_path / 'not_a_socket'
+        regular_file.write_text('keep me')
+        with pytest.raises(FileExistsError, match='not a socket'):
+            server.serve_socket(str(regular_file))
+    assert regular_file.read_text() == 'keep me'
+    assert request({'command': 'ping'}, socket_path) == {'status': 'ok'}
+
+
+def test_dakota_unnamed_responses(tmp_path):
+    """More unnamed responses than QoIs are a clear error."""
+    evaluation = {'functions': [(f'response_fn_{i}', 1) for i in range(1, 5)]}
+    result = {'qoi': sim_qoi()}
+    with pytest.raises(ValueError, match='response_fn_4: not a QoI'):
+        dakota.write_results_file(tmp_path / 'results.out', [evaluation],
+                                  [result])
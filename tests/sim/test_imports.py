@@ -0,0 +1,29 @@
+"""Tests that importing golfball leaves the heavy dependencies unloaded."""
+import subprocess
+import sys
+
+
+def test_lazy_imports():
+    """``gball --help`` loads neither pandas, scipy, ruamel.yaml nor tables."""
+    code = '\n'.join([
+        'import sys',
+        'from golfball.sim import main',
+        'try:',
+        '    main(["--help"])',
+        'except SystemExit:',
+        '    pass',
+        'print(sorted({name.split(".")[0] for name in sys.modules}))',
+    ])
+    result = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True)
+    loaded = result.stdout.splitlines()[-1]
+    for module in ('pandas', 'scipy', 'ruamel', 'tables'):
+        assert f"'{module}'" not in loaded
+
+
+def test_cd_table_attribute():
+    """CD_TABLE is still available as a module attribute."""
+    from golfball import sim  # pylint: disable=C0415
+
+    assert sim.CD_TABLE is sim.get_cd_table()
+    assert 0.0125 in sim.CD_TABLE.columns
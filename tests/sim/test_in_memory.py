@@ -0,0 +1,81 @@
+"""Test Sims built from inputs in memory."""
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from golfball.sim import Sim, default_inputs, get_args
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+def test_from_kwargs_no_io(tmp_path, monkeypatch):
+    """No file is read or written, and sys.argv is ignored."""
+    expected = Sim(get_args(['-i', INPUTS, '--angle', '24']))
+    expected.run()
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'argv', ['gball', '--not-an-option'])
+    sim = Sim.from_kwargs(angle=24)
+    qoi = sim.run()
+    assert qoi == expected.qoi
+    assert sim.traj.equals(expected.traj)
+    assert not list(tmp_path.iterdir())
+
+
+def test_from_dict_copies_inputs():
+    """The inputs are copied, and missing ones are defaults."""
+    inputs = {'state': {'angle': 30.0}, 'integrator': {'method': 'LSODA'}}
+    sim = Sim.from_dict(inputs)
+    sim.inputs['state']['angle'] = 40.0
+    assert inputs == {'state': {'angle': 30.0},
+                      'integrator': {'method': 'LSODA'}}
+    defaults = default_inputs()
+    assert sim.inputs['params'] == defaults['params']
+    assert sim.inputs['integrator']['method'] == 'LSODA'
+
+
+def test_run_returns_values():
+    """Returned QoIs are values, not updated by later runs or streams."""
+    sim = Sim.from_kwargs(method='LSODA')
+    first = sim.run()
+    expected = dict(first)
+    sim.inputs['state']['angle'] = 10.0
+    second = sim.run()
+    assert first is not second
+    assert first == expected
+    assert second['max_range'] < first['max_range']
+
+    stream = sim.iter_trajectory()
+    next(stream)
+    stream.close()
+    assert not sim.qoi
+
+
+@pytest.mark.parametrize('kwargs, message', [
+    ({'spin': 3.0}, "unknown inputs: ['spin']"),
+    ({'method': 'euler'}, 'integrator.method must be one of'),
+    ({'dt': -0.01}, 'time.dt must be > 0'),
+    ({'wind': [1.0, 0.0]}, 'params.wind'),
+    ({'angle': True}, 'state.angle'),
+    ({'rtol': 'tight'}, 'integrator.rtol'),
+    ({'t_stop': -1.0}, 'time.t_stop must be after time.t_init'),
+])
+def test_invalid_inputs(kwargs, message):
+    """Invalid inputs raise a ValueError naming them."""
+    with pytest.raises(ValueError, match=message.replace('[', r'\[')):
+        Sim.from_kwargs(**kwargs)
+    with pytest.raises(ValueError):
+        Sim.from_dict({'unknown_group': {}})
+
+
+def test_concurrent_sims():
+    """Sims running in threads give the results of sequential runs."""
+    angles = [20.0, 30.0, 40.0, 50.0]
+
+    def run(angle):
+        return Sim.from_kwargs(angle=angle, method='LSODA').run(qoi_only=True)
+
+    expected = [run(angle) for angle in angles]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(executor.map(run, angles)) == expected
@@ -0,0 +1,70 @@
+"""Test the integrator methods and tolerances against the regression QoIs."""
+import numpy as np
+import pytest
+
+from golfball.sim import Sim, get_args
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+# QoIs of tests/sim/outputs/projectile_outputs_default.yml: odeint samples on
+# the dt grid, so the time of flight is the last grid time before impact
+REGRESSION_QOI = {'max_height': 50.08844542014751,
+                  'max_range': 185.2417438617364,
+                  'time_of_flight': 6.28}
+
+
+def run_qoi(*args):
+    """Return the QoIs and stats of a QoI-only run with extra arguments."""
+    sim = Sim(get_args(['-i', INPUTS] + list(args)))
+    sim.run(qoi_only=True)
+    return sim.qoi, sim.stats
+
+
+@pytest.mark.parametrize('args, rtol', [
+    ([], 1e-6),
+    (['--rtol', '1e-6', '--atol', '1e-6'], 1e-5),
+    (['--method', 'LSODA'], 2e-4),
+    (['--method', 'LSODA', '--rtol', '1e-9', '--atol', '1e-9'], 2e-4),
+    (['--method', 'RK45'], 1e-2),
+    (['--method', 'RK45', '--rtol', '1e-9', '--atol', '1e-9'], 2e-4),
+    (['--method', 'DOP853'], 2e-3),
+    (['--method', 'DOP853', '--rtol', '1e-9', '--atol', '1e-9'], 2e-4),
+    (['--method', 'RK4', '--step', '0.2'], 2e-4),
+])
+def test_error_vs_regression(args, rtol):
+    """Each method and tolerance stays within its error of the regression.
+
+    The solve_ivp methods end at the impact itself, up to one dt after the
+    last grid sample, which puts their range about 1.3e-4 above the
+    regression value even when exact.
+    """
+    qoi, _ = run_qoi(*args)
+    np.testing.assert_allclose(qoi['max_height'],
+                               REGRESSION_QOI['max_height'], rtol=rtol)
+    np.testing.assert_allclose(qoi['max_range'],
+                               REGRESSION_QOI['max_range'], rtol=rtol)
+    assert abs(qoi['time_of_flight'] - REGRESSION_QOI['time_of_flight']) \
+        < 0.01
+
+
+@pytest.mark.parametrize('method', ['LSODA', 'RK45', 'DOP853'])
+def test_tolerance_cost(method):
+    """Looser tolerances take fewer RHS evaluations and steps."""
+    stats = [run_qoi('--method', method, '--rtol', tol, '--atol', tol)[1]
+             for tol in ('1e-9', '1e-6', '1e-3')]
+    assert stats[0]['n_rhs'] > stats[1]['n_rhs'] > stats[2]['n_rhs']
+    assert stats[0]['n_steps'] > stats[1]['n_steps'] > stats[2]['n_steps']
+
+
+def test_rk4_fixed_step():
+    """RK4 takes fixed steps, four RHS evaluations each, the same each run."""
+    qoi, stats = run_qoi('--method', 'RK4', '--step', '0.05')
+    assert stats['n_steps'] == np.ceil(qoi['time_of_flight'] / 0.05)
+    assert stats['n_rhs'] == 1 + 4 * stats['n_steps']
+    assert run_qoi('--method', 'RK4', '--step', '0.05') == (qoi, stats)
+
+    sim = Sim(get_args(['-i', INPUTS, '--method', 'RK4', '--step', '0.05']))
+    sim.run()
+    assert sim.qoi == qoi
+    assert sim.stats == stats
+    np.testing.assert_allclose(np.diff(sim.traj.index[:-1]), 0.01)
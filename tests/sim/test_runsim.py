@@ -3,10 +3,11 @@ import os
 import filecmp
 import numpy as np
 import pandas as pd
+import pytest
 from ruamel.yaml import YAML
 
 
-from golfball.sim import main, load_gball_h5
+from golfball.sim import Sim, get_args, main, load_gball_h5
 
 
 def test_runsim_noargs():
@@ -75,3 +76,43 @@ def test_output_traj():
 
     os.remove('projectile_outputs.yml')
     os.remove('projectile_trajectory.h5')
+
+
+def test_runsim_impact_event():
+    """Stop at the ground crossing event and resample only on request."""
+    sim = Sim(get_args(['-i', 'tests/sim/inputs/projectile_inputs_default.yml',
+                        '--method', 'LSODA']))
+    sim.run()
+    assert sim._traj is None  # pylint: disable=W0212
+
+    # the impact lies between the last two odeint samples above the ground
+    assert 6.28 < sim.qoi['time_of_flight'] < 6.29
+    assert sim.impact['time'] == sim.qoi['time_of_flight']
+    np.testing.assert_allclose(sim.impact['pos_LL'][2], 0.0, atol=1e-9)
+    np.testing.assert_allclose(sim.qoi['max_range'], 185.2417438617364,
+                               rtol=1e-3)
+    np.testing.assert_allclose(sim.qoi['max_height'], 50.08844542014751,
+                               rtol=1e-3)
+
+    traj = sim.traj
+    assert traj.index[-1] == sim.impact['time']
+    np.testing.assert_allclose(np.diff(traj.index[:-1]), 0.01)
+    np.testing.assert_array_equal(traj.iloc[-1, 0:3], sim.impact['pos_LL'])
+
+
+@pytest.mark.parametrize('method', ['odeint', 'LSODA', 'DOP853'])
+def test_runsim_qoi_only(method):
+    """The QoI-only run reproduces the QoIs without keeping a trajectory."""
+    sim = Sim(get_args(['-i', 'tests/sim/inputs/projectile_inputs_default.yml',
+                        '--method', method]))
+    sim.run()
+    qoi, impact = dict(sim.qoi), sim.impact
+
+    sim.run(qoi_only=True)
+    assert sim.traj is None
+    assert sim.impact == impact
+    for key, val in qoi.items():
+        np.testing.assert_allclose(sim.qoi[key], val, rtol=1e-12)
+
+    with pytest.raises(ValueError):
+        sim.write_trajectories('projectile_trajectory.h5')
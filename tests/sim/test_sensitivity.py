@@ -0,0 +1,118 @@
+"""Test the forward sensitivity QoI gradients against central differences."""
+import copy
+
+import numpy as np
+import pytest
+
+from golfball.sensitivity import GRADIENT_COLUMNS, gradient_name
+from golfball.sim import Sim, get_args
+from golfball.sweep import run_sweep
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+# backspin, sidespin and a cross wind, so that no gradient is trivially zero
+SHOT = ['--w_LL_B_LL', '0', '-200', '30', '--wind', '2', '1', '0']
+
+# central difference step of each parameter checked
+STEPS = {'vel_mag': 1e-3, 'angle': 1e-3, 'azimuth': 1e-3,
+         'w_LL_B_LL[0]': 1e-1, 'w_LL_B_LL[1]': 1e-1, 'w_LL_B_LL[2]': 1e-1,
+         'm': 1e-6, 'D': 1e-6, 'S': 1e-9, 'rho_scale': 1e-4, 'wind[0]': 1e-2,
+         'wind[1]': 1e-2, 'wind[2]': 1e-2}
+
+QOIS = ('max_height', 'max_range', 'time_of_flight')
+
+
+def make_sim(method, *args):
+    """Return a Sim of the shot with tight integrator tolerances."""
+    return Sim(get_args(['-i', INPUTS, '--method', method, '--rtol', '1e-10',
+                         '--atol', '1e-10'] + SHOT + list(args)))
+
+
+def perturbed_qoi(inputs, param, delta, qoi_only):
+    """Return the QoIs of a run with one parameter moved by delta."""
+    inputs = copy.deepcopy(inputs)
+    inputs['config']['sensitivities'] = False
+    if param.endswith(']'):
+        name, index = param[:-3], int(param[-2])
+        group = 'state' if name == 'w_LL_B_LL' else 'params'
+        inputs[group][name] = list(inputs[group][name])
+        inputs[group][name][index] += delta
+    elif param in inputs['state']:
+        inputs['state'][param] += delta
+    else:
+        inputs['params'][param] += delta
+    sim = Sim(inputs=inputs)
+    sim.run(qoi_only=qoi_only)
+    return sim.qoi
+
+
+@pytest.mark.parametrize('method, qoi_only', [('LSODA', True),
+                                              ('odeint', True),
+                                              ('LSODA', False)])
+def test_gradients_vs_central_differences(method, qoi_only):
+    """Gradients match central differences of the QoIs."""
+    sim = make_sim(method, '--sensitivities')
+    sim.run(qoi_only=qoi_only)
+    assert list(sim.qoi)[:3] == list(QOIS)
+    assert list(sim.qoi)[3:] == GRADIENT_COLUMNS
+
+    for param, step in STEPS.items():
+        upper = perturbed_qoi(sim.inputs, param, step, qoi_only)
+        lower = perturbed_qoi(sim.inputs, param, -step, qoi_only)
+        for qoi in QOIS:
+            grad = sim.qoi[gradient_name(qoi, param)]
+            if method == 'odeint' and qoi == 'time_of_flight':
+                # a grid time
+                assert grad == 0.0
+                continue
+            if (method == 'odeint' and qoi == 'max_range'
+                    and upper['time_of_flight'] != lower['time_of_flight']):
+                # the last grid sample moved, and max_range jumped with it
+                continue
+            central = (upper[qoi] - lower[qoi]) / (2.0 * step)
+            np.testing.assert_allclose(grad, central, rtol=5e-3, atol=1e-6,
+                                       err_msg=f'{qoi}/{param}')
+
+
+def test_sensitivities_leave_run_unchanged():
+    """The QoIs, impact and trajectory don't depend on the gradients."""
+    plain = make_sim('LSODA')
+    plain.run()
+    sim = make_sim('LSODA', '--sensitivities')
+    sim.run()
+    for qoi in QOIS:
+        assert sim.qoi[qoi] == pytest.approx(plain.qoi[qoi], rel=1e-7)
+    assert list(sim.traj.columns) == list(plain.traj.columns)
+    np.testing.assert_allclose(sim.traj.to_numpy(), plain.traj.to_numpy(),
+                               rtol=1e-7, atol=1e-7)
+
+    qoi_only = make_sim('LSODA', '--sensitivities')
+    qoi_only.run(qoi_only=True)
+    for name in GRADIENT_COLUMNS:
+        assert qoi_only.qoi[name] == pytest.approx(sim.qoi[name], rel=1e-6,
+                                                   abs=1e-9)
+
+
+def test_no_stale_gradients(tmp_path):
+    """A run without sensitivities, and its cache entry, have no gradients."""
+    sim = make_sim('LSODA', '--sensitivities', '--cache_filename',
+                   str(tmp_path / 'cache.sqlite'))
+    sim.run(qoi_only=True)
+    sim.inputs['config']['sensitivities'] = False
+    assert list(sim.run(qoi_only=True)) == list(QOIS)
+
+    cached = make_sim('LSODA', '--cache_filename',
+                      str(tmp_path / 'cache.sqlite'))
+    assert list(cached.run(qoi_only=True)) == list(QOIS)
+    assert cached.stats['n_rhs'] == 0
+
+
+def test_sweep_gradient_columns():
+    """Sweeps of runs with sensitivities have a column per gradient."""
+    import pandas as pd
+
+    inputs = make_sim('LSODA', '--sensitivities').inputs
+    results = run_sweep(inputs, pd.DataFrame({'angle': [30.0, 40.0]}),
+                        max_workers=1)
+    assert list(results.columns[4:-2]) == GRADIENT_COLUMNS
+    assert (results['dmax_height/dangle'] > 0.0).all()
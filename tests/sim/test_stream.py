@@ -0,0 +1,74 @@
+"""Test the streaming trajectory API."""
+import asyncio
+
+import matplotlib
+import numpy as np
+import pytest
+
+from golfball.sim import Sim, get_args
+
+matplotlib.use('Agg')
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+@pytest.mark.parametrize('method', ['odeint', 'LSODA', 'RK45'])
+def test_iter_trajectory(method):
+    """The stream gives the trajectory and QoIs of a full run."""
+    full = Sim(get_args(['-i', INPUTS, '--method', method]))
+    full.run()
+    stream = Sim(get_args(['-i', INPUTS, '--method', method]))
+
+    samples = list(stream.iter_trajectory())
+    np.testing.assert_array_equal([time for time, _ in samples],
+                                  full.traj.index)
+    np.testing.assert_allclose([state for _, state in samples], full.traj,
+                               rtol=1e-13, atol=1e-12)
+    assert stream.qoi == full.qoi
+    assert stream.impact == full.impact
+    assert stream.traj is None
+
+    blocks = list(stream.iter_trajectory(block_size=100))
+    assert [len(time) for time, _ in blocks[:-1]] == [100] * (len(blocks) - 1)
+    np.testing.assert_array_equal(np.vstack([states for _, states in blocks]),
+                                  [state for _, state in samples])
+
+
+def test_stream_backpressure():
+    """The integrator only advances as far as the consumer has asked."""
+    sim = Sim(get_args(['-i', INPUTS, '--t_stop', '1e6']))
+    stream = sim.iter_trajectory(block_size=10)
+    for _ in range(3):
+        time, _ = next(stream)
+    assert time[-1] == pytest.approx(0.29)
+    stream.close()
+    assert not sim.qoi
+
+
+def test_aiter_trajectory():
+    """The async stream gives the same blocks as the synchronous one."""
+    sim = Sim(get_args(['-i', INPUTS]))
+
+    async def consume():
+        return [block async for block in sim.aiter_trajectory(block_size=64)]
+
+    blocks = asyncio.run(consume())
+    expected = list(sim.iter_trajectory(block_size=64))
+    assert len(blocks) == len(expected)
+    for (time, states), (exp_time, exp_states) in zip(blocks, expected):
+        np.testing.assert_array_equal(time, exp_time)
+        np.testing.assert_array_equal(states, exp_states)
+
+
+def test_plot_stream():
+    """plot_traj draws a stream as it comes in."""
+    from golfball.analysis import plot_traj
+
+    sim = Sim(get_args(['-i', INPUTS]))
+    sim.run()
+    _, ax = plot_traj(Sim(get_args(['-i', INPUTS])).iter_trajectory(32))
+    x_data, _, z_data = ax.lines[0].get_data_3d()
+    np.testing.assert_array_equal(x_data, sim.traj['p_LL_x'])
+    np.testing.assert_array_equal(z_data, sim.traj['p_LL_z'])
+    assert ax.get_xlim()[1] >= sim.traj['p_LL_x'].max()
+    assert ax.get_zlim()[1] >= sim.traj['p_LL_z'].max()
@@ -2,8 +2,13 @@
 
 import pickle
 import numpy as np
+import pytest
 
 from golfball.stdAtm76 import getStandardPressure, getSpeedOfSound
+from golfball.stdAtm76 import getStandardDensity, getStandardTemperature
+from golfball.stdAtm76 import getGeopotential, getStandardTemperatureArray
+from golfball.stdAtm76 import getStandardPressureArray, getSpeedOfSoundArray
+from golfball.stdAtm76 import getStandardDensityArray
 
 PRECISION = 11
 
@@ -39,4 +44,42 @@ def test_speed_of_sound():
                                    decimal=PRECISION)
 
 
+def test_array_versions_bit_compatible():
+    """Array versions match the scalar functions exactly, layer tops too."""
+
+    heights = np.concatenate([np.linspace(-500, 86000, 20001),
+                              [11000.0, 20000.0, 84850.0]])
+    heights = heights[getGeopotential(heights, units='m') <= 84.85]
+
+    for scalar_func, array_func in [
+            (getStandardPressure, getStandardPressureArray),
+            (getStandardDensity, getStandardDensityArray),
+            (getSpeedOfSound, getSpeedOfSoundArray)]:
+        expected = np.array([scalar_func(h, units='m') for h in heights])
+        np.testing.assert_array_equal(array_func(heights, units='m'),
+                                      expected)
+
+    geopot_heights = np.array([0.0, 11.0, 15.0, 20.0, 32.0, 47.0, 51.0, 71.0,
+                               84.85])
+    expected = np.array([getStandardTemperature(h) for h in geopot_heights])
+    np.testing.assert_array_equal(getStandardTemperatureArray(geopot_heights),
+                                  expected)
+
+    assert np.ndim(getStandardDensityArray(1.0)) == 0
+    assert getStandardDensityArray(1.0) == getStandardDensity(1.0)
+
+
+def test_array_versions_above_84km():
+    """Array versions raise ValueError above 84.85 km like the scalars."""
+
+    with pytest.raises(ValueError):
+        getStandardTemperature(84.86)
+    with pytest.raises(ValueError):
+        getStandardTemperatureArray([1.0, 84.86])
+    with pytest.raises(ValueError):
+        getStandardPressureArray(np.array([0.0, 90.0]))
+    with pytest.raises(ValueError):
+        getSpeedOfSoundArray(np.nan)
+
+
 # [1]  https://ntrs.nasa.gov/api/citations/19770009539/downloads/19770009539.pdf?attachment=true
@@ -0,0 +1,99 @@
+"""Test the surrogate models of the QoIs."""
+from math import comb
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from golfball.sim import Sim, default_inputs, get_args
+from golfball.surrogate import (Surrogate, _poly_terms, build_surrogate,
+                                sample_box)
+
+BOX = {'angle': (20.0, 40.0), 'vel_mag': (60.0, 70.0), 'wind[0]': (-3.0, 3.0)}
+
+
+def synthetic(design):
+    """Return a cubic of the design columns as QoI results."""
+    x, y, z = design['angle'], design['vel_mag'], design['wind[0]']
+    return pd.DataFrame({'a': 1.0 + x * y - 0.5 * z**3,
+                         'b': x**2 * z + y})
+
+
+def test_poly_terms():
+    """Every monomial up to the degree appears once, after its parent."""
+    exponents, parents, dims = _poly_terms(4, 3)
+    assert len(exponents) == comb(4 + 3, 3)
+    assert len({tuple(term) for term in exponents}) == len(exponents)
+    for i_term in range(1, len(exponents)):
+        assert parents[i_term] < i_term
+        step = exponents[i_term] - exponents[parents[i_term]]
+        assert step.sum() == 1 and step[dims[i_term]] == 1
+
+
+@pytest.mark.parametrize('method', ['sobol', 'lhs'])
+def test_sample_box(method):
+    """Designs fill the box, repeatably for a seed."""
+    design = sample_box(BOX, 64, method=method, seed=5)
+    assert list(design.columns) == list(BOX)
+    for name, (low, high) in BOX.items():
+        assert low <= design[name].min() < design[name].max() <= high
+    pd.testing.assert_frame_equal(design,
+                                  sample_box(BOX, 64, method=method, seed=5))
+    with pytest.raises(ValueError):
+        sample_box({'angle': (40.0, 20.0)}, 8)
+
+
+@pytest.mark.parametrize('kind', ['poly', 'rbf'])
+def test_fit_predict_save(kind, tmp_path):
+    """Fits reproduce their samples, and survive a save and load."""
+    design = sample_box(BOX, 64, seed=1)
+    results = synthetic(design)
+    surrogate = Surrogate.fit(BOX, design, results, kind=kind)
+
+    predicted = surrogate.predict(design)
+    for name in results.columns:
+        np.testing.assert_allclose(predicted[name], results[name], rtol=1e-9)
+
+    test = sample_box(BOX, 16, method='lhs', seed=2)
+    surrogate.errors = surrogate.error_report(test, synthetic(test))
+    assert list(surrogate.errors.index) == ['a', 'b']
+    if kind == 'poly':
+        # a cubic is in the span of the degree 3 terms
+        assert (surrogate.errors['rel_rms'] < 1e-12).all()
+
+    surrogate.save(tmp_path / 'surrogate.npz')
+    loaded = Surrogate.load(tmp_path / 'surrogate.npz')
+    pd.testing.assert_frame_equal(loaded.errors, surrogate.errors)
+    points = test[list(BOX)].to_numpy()
+    for name, val in surrogate.predict(points).items():
+        np.testing.assert_array_equal(loaded.predict(points)[name], val)
+
+    single = loaded.predict({'angle': 30.0, 'vel_mag': 65.0, 'wind[0]': 0.0})
+    assert single['a'].shape == (1,)
+    with pytest.raises(KeyError):
+        loaded.predict({'angle': 30.0})
+
+
+def test_build_surrogate():
+    """The held-out errors are those of the surrogate against Sim runs."""
+    inputs = default_inputs()
+    inputs['integrator']['method'] = 'LSODA'
+    inputs['integrator']['rtol'] = 1e-8
+    inputs['integrator']['atol'] = 1e-8
+    surrogate = build_surrogate(BOX, inputs, n_train=32, n_test=8, degree=2,
+                                seed=0, max_workers=1)
+    assert (surrogate.errors['rel_rms'] < 1e-2).all()
+
+    test = sample_box(BOX, 8, method='lhs', seed=1)
+    predicted = surrogate.predict(test)
+    errors = []
+    for i_row, row in test.iterrows():
+        sim = Sim(get_args(['-i', 'tests/sim/inputs/projectile_inputs_default.yml',
+                            '--method', 'LSODA', '--rtol', '1e-8',
+                            '--atol', '1e-8', '--angle', str(row['angle']),
+                            '--vel_mag', str(row['vel_mag']),
+                            '--wind', str(row['wind[0]']), '0', '0']))
+        sim.run(qoi_only=True)
+        errors.append(predicted['max_range'][i_row] - sim.qoi['max_range'])
+    np.testing.assert_allclose(surrogate.errors.loc['max_range', 'max_abs'],
+                               np.abs(errors).max(), rtol=1e-6)
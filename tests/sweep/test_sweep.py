@@ -0,0 +1,63 @@
+"""Test the parameter sweep runner."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from golfball.sim import Sim, get_args
+from golfball.sweep import apply_overrides, base_inputs, main, run_sweep
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+def test_apply_overrides():
+    """Design columns override scalar inputs and entries of vectors."""
+    inputs = base_inputs(INPUTS)
+    overrides = {'angle': np.float64(24.0), 'wind[0]': np.float64(-3.0),
+                 'method': 'LSODA'}
+    new_inputs = apply_overrides(inputs, overrides)
+    assert new_inputs['state']['angle'] == 24.0
+    assert isinstance(new_inputs['state']['angle'], float)
+    assert new_inputs['params']['wind'] == [-3.0, 0.0, 0.0]
+    assert new_inputs['integrator']['method'] == 'LSODA'
+    assert inputs['params']['wind'] == [0.0, 0.0, 0.0]
+
+    for column in ('not_an_input', 'angle[0]', 'wind[3]'):
+        with pytest.raises(ValueError):
+            apply_overrides(inputs, {column: 1.0})
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_run_sweep(max_workers):
+    """Every row gives the QoIs of a Sim run with the same inputs."""
+    design = pd.DataFrame({'angle': [10.0, 24.0, 38.0, 45.0, 30.0],
+                           'eD': [0.0, 0.0125, 0.005, 0.0015, 0.0125],
+                           'wind[0]': [0.0, -5.0, 2.0, 0.0, 0.0]},
+                          index=[3, 1, 4, 1, 5])
+    results = run_sweep(INPUTS, design, max_workers=max_workers, chunksize=2)
+
+    assert list(results.columns) == ['angle', 'eD', 'wind[0]', 'max_height',
+                                     'max_range', 'time_of_flight',
+                                     'n_rhs', 'n_steps']
+    for i_row, row in results.iterrows():
+        sim = Sim(get_args(['-i', INPUTS, '--angle', str(row['angle']),
+                            '--eD', str(row['eD']),
+                            '--wind', str(row['wind[0]']), '0', '0']))
+        sim.run()
+        for key, val in sim.qoi.items():
+            assert results.loc[i_row, key] == val
+
+
+def test_sweep_cli(tmp_path):
+    """gball-sweep reads the design and writes the QoI table."""
+    design_file = tmp_path / 'design.csv'
+    out_file = tmp_path / 'qoi.csv'
+    pd.DataFrame({'vel_mag': [60.0, 70.0]}).to_csv(design_file, index=False)
+    main(['-i', INPUTS, '-d', str(design_file), '-o', str(out_file),
+          '-j', '1'])
+
+    results = pd.read_csv(out_file)
+    assert results['vel_mag'].tolist() == [60.0, 70.0]
+    assert results['max_range'].iloc[0] < results['max_range'].iloc[1]
+
+    with pytest.raises(ValueError):
+        main(['-d', str(design_file), '-o', str(tmp_path / 'qoi.txt')])
@@ -0,0 +1,100 @@
+"""Test the ensemble trajectory store."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from golfball.sim import Sim, get_args
+from golfball.sweep import run_sweep
+from golfball.trajstore import (WRITE_BATCH, TrajectoryStore,
+                                TrajectoryWriter, load_ensemble_h5,
+                                put_trajectory)
+
+INPUTS = 'tests/sim/inputs/projectile_inputs_default.yml'
+
+
+def sim_traj(angle):
+    """Return the trajectory of a default run at a launch angle."""
+    sim = Sim(get_args(['-i', INPUTS, '--angle', str(angle)]))
+    sim.run()
+    return sim.traj
+
+
+def test_store_select(tmp_path):
+    """Members, time windows and columns are read back exactly."""
+    filename = str(tmp_path / 'store.h5')
+    trajs = {run_id: sim_traj(angle)
+             for run_id, angle in enumerate([10.0, 20.0, 30.0])}
+    with TrajectoryStore(filename, mode='w') as store:
+        store.append(0, trajs[0])
+        store.append_many([(1, trajs[1]), (2, trajs[2])])
+        store.create_index()
+        assert store.run_ids().tolist() == [0, 1, 2]
+
+    pd.testing.assert_frame_equal(load_ensemble_h5(filename, run_id=1),
+                                  trajs[1], check_freq=False)
+
+    part = load_ensemble_h5(filename, run_id=[0, 2], t_range=(1.0, 1.5),
+                            columns=['p_LL_x', 'p_LL_z'])
+    assert list(part.columns) == ['p_LL_x', 'p_LL_z']
+    assert part.index.get_level_values('run_id').unique().tolist() == [0, 2]
+    for run_id in (0, 2):
+        expected = trajs[run_id].loc[1.0:1.5, ['p_LL_x', 'p_LL_z']]
+        np.testing.assert_array_equal(part.loc[run_id].to_numpy(),
+                                      expected.to_numpy())
+
+    with pytest.raises(KeyError):
+        load_ensemble_h5(filename, columns=['not_a_column'])
+
+
+def test_writer_process(tmp_path):
+    """Trajectories put on the writer's queue all end up in the store."""
+    filename = str(tmp_path / 'store.h5')
+    traj = sim_traj(38.0)
+    with TrajectoryWriter(filename, mode='w') as writer:
+        for run_id in range(100):
+            writer.put(run_id, traj)
+
+    everything = load_ensemble_h5(filename)
+    assert everything.shape == (100 * len(traj), len(traj.columns))
+    np.testing.assert_array_equal(
+        load_ensemble_h5(filename, run_id=57).to_numpy(), traj.to_numpy())
+
+
+def test_writer_failure(tmp_path):
+    """Puts raise instead of blocking once the writer process has failed."""
+    filename = str(tmp_path / 'no_such_dir' / 'store.h5')
+    traj = sim_traj(38.0)
+    writer = TrajectoryWriter(filename, mode='w')
+    assert writer.stopped.wait(30.0)
+    item = (0, (traj.index.to_numpy(dtype=float), traj.to_numpy()))
+    with pytest.raises(RuntimeError, match='writer has stopped'):
+        put_trajectory(writer.queue, item, writer.stopped)
+    with pytest.raises(RuntimeError, match='writer has exited'):
+        for run_id in range(8 * WRITE_BATCH):
+            writer.put(run_id, traj)
+    with pytest.raises(RuntimeError, match='writer failed'):
+        writer.close()
+
+
+def test_sweep_trajectories(tmp_path):
+    """A sweep over worker processes writes every row's trajectory."""
+    filename = str(tmp_path / 'sweep.h5')
+    design = pd.DataFrame({'angle': [10.0, 20.0, 30.0, 40.0]})
+    results = run_sweep(INPUTS, design, max_workers=2, chunksize=1,
+                        traj_filename=filename)
+
+    with TrajectoryStore(filename, mode='r') as store:
+        assert store.run_ids().tolist() == [0, 1, 2, 3]
+        for run_id, angle in enumerate(design['angle']):
+            traj = store.select(run_id=run_id)
+            np.testing.assert_array_equal(traj.to_numpy(),
+                                          sim_traj(angle).to_numpy())
+            assert traj.index[-1] == results.loc[run_id, 'time_of_flight']
+
+
+def test_sweep_writer_failure(tmp_path):
+    """A sweep whose trajectory writer fails raises instead of hanging."""
+    design = pd.DataFrame({'angle': np.linspace(10.0, 40.0, 8)})
+    with pytest.raises(RuntimeError, match='trajectory writer'):
+        run_sweep(INPUTS, design, max_workers=2, chunksize=1,
+                  traj_filename=str(tmp_path / 'no_such_dir' / 'sweep.h5'))